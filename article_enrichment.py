@@ -879,32 +879,34 @@ def resolve_pontos_chave_links(
     if categorias:
         placeholders = ",".join("?" * len(categorias))
         try:
-            latest = _soft_execute(
+            stats = _soft_execute(
                 client,
                 f"""
-                SELECT tag, MAX(id) AS max_id
-                FROM news
-                WHERE tag IN ({placeholders}) AND id != ?
+                SELECT tag, MAX(max_id), SUM(count)
+                FROM news_tag_stats
+                WHERE tag IN ({placeholders}) AND count > 0
                 GROUP BY tag
                 """,
-                [*categorias, exclude_id],
+                categorias,
             )
-            latest_by_tag = {str(row[0]): row[1] for row in latest.rows if row and row[0]}
         except Exception:
-            latest_by_tag = {}
-
-        missing = [c for c in categorias if c not in latest_by_tag]
-        if missing:
-            miss_ph = ",".join("?" * len(missing))
-            try:
-                counts = _soft_execute(
-                    client,
-                    f"SELECT tag, COUNT(*) FROM news WHERE tag IN ({miss_ph}) GROUP BY tag",
-                    missing,
-                )
-                tag_counts = {str(row[0]): int(row[1]) for row in counts.rows if row and row[0]}
-            except Exception:
-                tag_counts = {}
+            stats = None
+        for tag, max_id, count in stats.rows if stats else []:
+            tag_counts[str(tag)] = int(count or 0)
+            if max_id and int(max_id) != int(exclude_id):
+                latest_by_tag[str(tag)] = int(max_id)
+            elif max_id and int(count or 0) > 1:
+                # A mais recente da tag é a própria matéria: pega a anterior pelo índice.
+                try:
+                    prev = _soft_execute(
+                        client,
+                        "SELECT id FROM news WHERE tag = ? AND id < ? ORDER BY id DESC LIMIT 1",
+                        [tag, int(exclude_id)],
+                    )
+                    if prev.rows:
+                        latest_by_tag[str(tag)] = int(prev.rows[0][0])
+                except Exception:
+                    pass
 
     for ponto in pontos or []:
         item = dict(ponto)
@@ -952,7 +954,7 @@ def get_acervo_stats(client, tag: str) -> dict[str, Any]:
     try:
         result = _soft_execute(
             client,
-            "SELECT sentimento, COUNT(*) FROM news WHERE tag = ? GROUP BY sentimento",
+            "SELECT sentimento, count FROM news_tag_stats WHERE tag = ? AND count > 0",
             [tag],
         )
     except Exception:
@@ -960,7 +962,8 @@ def get_acervo_stats(client, tag: str) -> dict[str, Any]:
 
     by_sentiment: dict[str, int] = {}
     for sentimento, count in result.rows:
-        by_sentiment[sentimento or "Neutro"] = count
+        key = sentimento or "Neutro"
+        by_sentiment[key] = by_sentiment.get(key, 0) + int(count or 0)
 
     total = sum(by_sentiment.values())
     positivo = by_sentiment.get("Positivo", 0)
@@ -1147,6 +1150,7 @@ def build_article_enrichment(
         published_at=published_at,
         created_at=created_at,
         blocking_hist=False,
+        client=client,
     )
 
     refs = market_data.get("referencias_internas") or []
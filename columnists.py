@@ -8,14 +8,25 @@ import json
 import os
 import re
 import secrets
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import quote
 
 import requests
 
 import community_auth as community
-from db import upsert_news_fts
+from db import (
+    article_timestamp,
+    fts_change_statements,
+    fts_insert_statements,
+    get_db,
+    note_news_links,
+    run_batch,
+    sync_news_fts_changes,
+    tag_stats_change_statements,
+    tag_stats_insert_statements,
+)
 from profanity_filter import find_blocked_terms
 
 ROLE_USER = "user"
@@ -173,6 +184,7 @@ def enrich_user_role(client, user: dict[str, Any] | None) -> dict[str, Any] | No
 def set_user_role(client, user_id: int, role: str) -> None:
     role = role if role in (ROLE_USER, ROLE_COLUMNIST, ROLE_ADMIN) else ROLE_USER
     client.execute("UPDATE users SET role = ? WHERE id = ?", [role, int(user_id)])
+    community.invalidate_user_cache(user_id)
 
 
 def set_user_pix_key(client, user_id: int, pix_key: str | None) -> None:
@@ -180,6 +192,7 @@ def set_user_pix_key(client, user_id: int, pix_key: str | None) -> None:
         "UPDATE users SET pix_key = ? WHERE id = ?",
         [(pix_key or "").strip() or None, int(user_id)],
     )
+    community.invalidate_user_cache(user_id)
 
 
 # --- Candidaturas ---
@@ -332,8 +345,8 @@ def create_article(
         INSERT INTO news (
             titulo, resumo, impacto, link, tag, sentimento, published_at, fonte,
             created_at, updated_at, conteudo_extra, home_priority, imagem_url,
-            author_id, content_origin, moderation_status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            author_id, content_origin, moderation_status, published_ts
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         [
             titulo,
@@ -352,13 +365,20 @@ def create_article(
             int(user_id),
             ORIGIN_COLUMNIST,
             status,
+            article_timestamp(now),
         ],
     )
     result = client.execute("SELECT id FROM news WHERE link = ? LIMIT 1", [link])
     if not result.rows:
         raise RuntimeError("Falha ao criar artigo.")
     news_id = int(result.rows[0][0])
-    upsert_news_fts(client, news_id, titulo, resumo)
+    note_news_links([link])
+    run_batch(
+        client,
+        [*fts_insert_statements(news_id=news_id), *tag_stats_insert_statements(news_id=news_id)],
+    )
+    # Só o próprio artigo: o resto do log (robô) fica para o cron.
+    sync_news_fts_changes(client, news_ids=[news_id])
     return news_id
 
 
@@ -390,29 +410,42 @@ def update_article(
     elif status == STATUS_REJECTED:
         status = STATUS_DRAFT
     cover = (imagem_url or "").strip() or article.get("imagem_url")
-    client.execute(
-        """
+    # Turso (sem triggers): log do FTS e contadores por tag no mesmo lote do UPDATE —
+    # antes dele o índice/contador ainda refletem a versão antiga.
+    update_sql = """
         UPDATE news SET
             titulo = ?, resumo = ?, impacto = ?, tag = ?, conteudo_extra = ?,
             updated_at = ?, moderation_status = ?, imagem_url = ?,
+            published_ts = CASE WHEN ? = 'pending' AND NULLIF(published_at, '') IS NULL
+                               THEN ? ELSE published_ts END,
             published_at = CASE WHEN ? = 'pending' THEN COALESCE(published_at, ?) ELSE published_at END
         WHERE id = ?
-        """,
+    """
+    params = [
+        titulo,
+        resumo,
+        body[:4000],
+        tag,
+        body,
+        now,
+        status,
+        cover,
+        status,
+        article_timestamp(now),
+        status,
+        now,
+        int(news_id),
+    ]
+    run_batch(
+        client,
         [
-            titulo,
-            resumo,
-            body[:4000],
-            tag,
-            body,
-            now,
-            status,
-            cover,
-            status,
-            now,
-            int(news_id),
+            *fts_change_statements(int(news_id)),
+            *tag_stats_change_statements(int(news_id)),
+            (update_sql, params),
+            *tag_stats_insert_statements(news_id=int(news_id)),
         ],
     )
-    upsert_news_fts(client, int(news_id), titulo, resumo)
+    sync_news_fts_changes(client, news_ids=[int(news_id)])
 
 
 def get_article_for_author(client, news_id: int, user_id: int | None) -> dict[str, Any] | None:
@@ -506,11 +539,13 @@ def review_article(client, news_id: int, *, approve: bool, admin_note: str = "")
         client.execute(
             """
             UPDATE news SET moderation_status = ?, published_at = COALESCE(published_at, ?),
+                   published_ts = CASE WHEN NULLIF(published_at, '') IS NULL
+                                       THEN ? ELSE published_ts END,
                    updated_at = ?, home_priority = CASE
                        WHEN COALESCE(home_priority, 0) < 20 THEN 50 ELSE home_priority END
             WHERE id = ?
             """,
-            [STATUS_PUBLISHED, now, now, int(news_id)],
+            [STATUS_PUBLISHED, now, article_timestamp(now), now, int(news_id)],
         )
     else:
         note = (admin_note or "").strip()[:500]
@@ -546,6 +581,91 @@ def _viewer_hash(ip: str | None, ua: str | None) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:40]
 
 
+def _page_view_flush_rows() -> int:
+    try:
+        return max(1, int(_env("PAGE_VIEW_FLUSH_ROWS", "50")))
+    except ValueError:
+        return 50
+
+
+def _page_view_flush_sec() -> float:
+    try:
+        return max(0.5, float(_env("PAGE_VIEW_FLUSH_SEC", "10")))
+    except ValueError:
+        return 10.0
+
+
+_PAGE_VIEW_INSERT_SQL = """
+    INSERT OR IGNORE INTO page_views (news_id, author_id, viewer_hash, viewer_user_id, day, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+# Recontagem do (matéria, dia) a partir das linhas brutas: idempotente e
+# correta mesmo com INSERT OR IGNORE descartando views já gravadas.
+_PAGE_VIEW_ROLLUP_SQL = """
+    INSERT INTO page_views_daily (news_id, author_id, day, views)
+    SELECT ?, ?, ?, COUNT(*) FROM page_views WHERE news_id = ? AND day = ?
+    ON CONFLICT(news_id, day) DO UPDATE SET views = excluded.views
+"""
+# Teto do dedupe em memória; passou disso o UNIQUE da tabela segura o resto do dia.
+_PAGE_VIEW_SEEN_MAX = 200_000
+_PAGE_VIEW_PENDING_MAX = 20_000
+
+
+class _PageViewBuffer:
+    """Views de artigos de colunista em memória até o flush (N linhas ou T segundos).
+
+    O render da matéria só enfileira; uma thread daemon grava o lote com um
+    ``run_batch`` (1 commit local / 1 pipeline Turso).
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending: list[list[Any]] = []
+        self.seen: set[tuple[int, str, str]] = set()
+        self.day = ""
+        self.client: Any = None
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def add(self, client, key: tuple[int, str, str], row: list[Any]) -> bool:
+        with self.lock:
+            if key[2] != self.day:
+                self.day = key[2]
+                self.seen.clear()
+            if key in self.seen:
+                return False
+            if len(self.seen) >= _PAGE_VIEW_SEEN_MAX:
+                self.seen.clear()
+            self.seen.add(key)
+            self.pending.append(row)
+            self.client = client
+            full = len(self.pending) >= _page_view_flush_rows()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True, name="page-view-flush")
+                self.thread.start()
+        if full:
+            self.wake.set()
+        return True
+
+    def take(self) -> tuple[list[list[Any]], Any]:
+        with self.lock:
+            rows, self.pending = self.pending, []
+            return rows, self.client
+
+    def give_back(self, rows: list[list[Any]]) -> None:
+        with self.lock:
+            self.pending = (rows + self.pending)[-_PAGE_VIEW_PENDING_MAX:]
+
+    def _run(self) -> None:
+        while True:
+            self.wake.wait(_page_view_flush_sec())
+            self.wake.clear()
+            flush_page_views()
+
+
+_PAGE_VIEWS = _PageViewBuffer()
+
+
 def record_page_view(
     client,
     news_id: int,
@@ -555,40 +675,86 @@ def record_page_view(
     user_agent: str | None,
     viewer_user_id: int | None = None,
 ) -> bool:
-    """Registra 1 view por visitante/dia. Retorna True se creditou."""
+    """Enfileira 1 view por visitante/dia (sem I/O no request). True se for nova."""
     if not author_id:
         return False
     day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     vhash = _viewer_hash(ip, user_agent)
+    row = [
+        int(news_id),
+        int(author_id),
+        vhash,
+        int(viewer_user_id) if viewer_user_id else None,
+        day,
+        utc_now_iso(),
+    ]
+    return _PAGE_VIEWS.add(client, (int(news_id), vhash, day), row)
+
+
+def flush_page_views(client=None) -> int:
+    """Grava as views enfileiradas e atualiza ``page_views_daily`` num lote só.
+
+    Em falha, devolve as linhas ao buffer.
+    """
+    rows, buffered_client = _PAGE_VIEWS.take()
+    if not rows:
+        return 0
+    target = client if client is not None else buffered_client
+    statements: list[tuple[str, list[Any]]] = [(_PAGE_VIEW_INSERT_SQL, row) for row in rows]
+    touched = {(row[0], row[4]): row[1] for row in rows}
+    for (news_id, day), author_id in touched.items():
+        statements.append((_PAGE_VIEW_ROLLUP_SQL, [news_id, author_id, day, news_id, day]))
     try:
-        client.execute(
-            """
-            INSERT INTO page_views (news_id, author_id, viewer_hash, viewer_user_id, day, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            [
-                int(news_id),
-                int(author_id),
-                vhash,
-                int(viewer_user_id) if viewer_user_id else None,
-                day,
-                utc_now_iso(),
-            ],
+        run_batch(target, statements)
+    except Exception as exc:
+        print(f"Aviso: flush de page_views ({len(rows)}) falhou: {exc}", flush=True)
+        _PAGE_VIEWS.give_back(rows)
+        return 0
+    return len(rows)
+
+
+def page_views_retention_days() -> int:
+    """Dias de ``page_views`` brutas mantidos (mínimo 2: o dedupe do dia precisa delas)."""
+    try:
+        return max(2, int(_env("PAGE_VIEWS_RETENTION_DAYS", "35")))
+    except ValueError:
+        return 35
+
+
+def prune_page_views(client, *, keep_days: int | None = None, batch_size: int = 5000) -> int:
+    """Apaga views brutas fora da janela de retenção; o total fica em ``page_views_daily``."""
+    days = max(2, int(keep_days)) if keep_days is not None else page_views_retention_days()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    size = max(1, int(batch_size))
+    removed = 0
+    while True:
+        # Lotes por id: não segura o writer com um DELETE gigante.
+        result = client.execute(
+            "SELECT id FROM page_views WHERE day < ? ORDER BY day LIMIT ?",
+            [cutoff, size],
         )
-        return True
-    except Exception:
-        return False
+        ids = [int(r[0]) for r in (result.rows or [])]
+        if not ids:
+            break
+        _ = client.execute(
+            f"DELETE FROM page_views WHERE id IN ({','.join('?' * len(ids))})",
+            ids,
+        )
+        removed += len(ids)
+        if len(ids) < size:
+            break
+    return removed
 
 
 def count_views(client, news_id: int | None = None, author_id: int | None = None) -> int:
     if news_id is not None:
         result = client.execute(
-            "SELECT COUNT(*) FROM page_views WHERE news_id = ?",
+            "SELECT COALESCE(SUM(views), 0) FROM page_views_daily WHERE news_id = ?",
             [int(news_id)],
         )
     elif author_id is not None:
         result = client.execute(
-            "SELECT COUNT(*) FROM page_views WHERE author_id = ?",
+            "SELECT COALESCE(SUM(views), 0) FROM page_views_daily WHERE author_id = ?",
             [int(author_id)],
         )
     else:
@@ -596,12 +762,79 @@ def count_views(client, news_id: int | None = None, author_id: int | None = None
     return int(result.rows[0][0]) if result.rows else 0
 
 
+_LEDGER_INSERT_SQL = """
+    INSERT INTO wallet_ledger (user_id, kind, amount_brl, news_id, meta_json, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_BALANCE_ADD_SQL = """
+    INSERT INTO wallet_balances (user_id, balance_brl, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        balance_brl = balance_brl + excluded.balance_brl,
+        updated_at = excluded.updated_at
+"""
+# Recalcula do ledger num statement só (não perde lançamento concorrente).
+_BALANCE_RESET_SQL = """
+    INSERT INTO wallet_balances (user_id, balance_brl, updated_at)
+    SELECT ?, COALESCE(SUM(amount_brl), 0), ? FROM wallet_ledger WHERE user_id = ?
+    ON CONFLICT(user_id) DO UPDATE SET
+        balance_brl = excluded.balance_brl,
+        updated_at = excluded.updated_at
+"""
+
+
+def _ledger_statements(
+    user_id: int,
+    kind: str,
+    amount: float,
+    *,
+    news_id: int | None = None,
+    meta: dict[str, Any] | None = None,
+    now: str,
+) -> list[tuple[str, list[Any]]]:
+    """Lançamento no ledger + ajuste de ``wallet_balances`` — sempre no mesmo ``run_batch``."""
+    meta_json = json.dumps(meta, ensure_ascii=False) if meta is not None else None
+    return [
+        (_LEDGER_INSERT_SQL, [int(user_id), kind, amount, news_id, meta_json, now]),
+        (_BALANCE_ADD_SQL, [int(user_id), amount, now]),
+    ]
+
+
 def wallet_balance(client, user_id: int) -> float:
     result = client.execute(
-        "SELECT COALESCE(SUM(amount_brl), 0) FROM wallet_ledger WHERE user_id = ?",
+        "SELECT balance_brl FROM wallet_balances WHERE user_id = ?",
         [int(user_id)],
     )
-    return float(result.rows[0][0]) if result.rows else 0.0
+    return float(result.rows[0][0] or 0) if result.rows else 0.0
+
+
+def reconcile_wallet_balances(client, *, fix: bool = True) -> dict[str, Any]:
+    """Confere ``wallet_balances`` contra ``SUM(wallet_ledger)``; com ``fix`` corrige as divergentes."""
+    result = client.execute(
+        """
+        SELECT t.user_id, t.total, b.balance_brl
+        FROM (
+            SELECT user_id, SUM(amount_brl) AS total FROM wallet_ledger GROUP BY user_id
+        ) t
+        LEFT JOIN wallet_balances b ON b.user_id = t.user_id
+        UNION ALL
+        SELECT b.user_id, 0, b.balance_brl
+        FROM wallet_balances b
+        WHERE NOT EXISTS (SELECT 1 FROM wallet_ledger l WHERE l.user_id = b.user_id)
+        """
+    )
+    rows = result.rows or []
+    mismatches: list[dict[str, Any]] = []
+    for row in rows:
+        total = round(float(row[1] or 0), 4)
+        balance = None if row[2] is None else round(float(row[2]), 4)
+        if balance is None or abs(total - balance) > 0.0001:
+            mismatches.append({"user_id": int(row[0]), "ledger": total, "balance": balance})
+    if mismatches:
+        print(f"Aviso: wallet_balances divergente para {len(mismatches)} colunista(s)", flush=True)
+    if fix and mismatches:
+        now = utc_now_iso()
+        run_batch(client, [(_BALANCE_RESET_SQL, [m["user_id"], now, m["user_id"]]) for m in mismatches])
+    return {"ok": True, "checked": len(rows), "mismatches": mismatches, "fixed": len(mismatches) if fix else 0}
 
 
 def list_ledger(client, user_id: int, limit: int = 40) -> list[dict[str, Any]]:
@@ -625,31 +858,51 @@ def list_ledger(client, user_id: int, limit: int = 40) -> list[dict[str, Any]]:
     ]
 
 
+# Só a execução dona do registro (started_at) grava: um run concorrente ou
+# retomado reivindica o dia com outro started_at e os statements do antigo viram no-op.
+_CREDIT_RUN_CLAIM_SQL = """
+    INSERT INTO credit_runs (day, status, started_at) VALUES (?, 'running', ?)
+    ON CONFLICT(day) DO UPDATE SET status = 'running', started_at = excluded.started_at
+    WHERE credit_runs.status != 'done'
+"""
+_CREDIT_RUN_OWNED = "EXISTS (SELECT 1 FROM credit_runs WHERE day = ? AND started_at = ? AND status = 'done')"
+
+
+def _credit_run(client, day: str) -> tuple[str, str] | None:
+    result = client.execute("SELECT status, started_at FROM credit_runs WHERE day = ?", [day])
+    return (str(result.rows[0][0]), str(result.rows[0][1])) if result.rows else None
+
+
 def credit_daily_shares(client, day: str | None = None) -> dict[str, Any]:
-    """Credita participação estimada: views do dia × RPM × share / 1000."""
+    """Credita participação estimada: views do dia × RPM × share / 1000.
+
+    ``credit_runs`` guarda um registro por dia. Lançamentos, saldos e o
+    ``done`` do registro vão num lote só: run que caiu no meio fica em
+    ``running`` sem lançamento nenhum e a próxima chamada refaz o dia.
+    """
     day = day or datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    # Evita crédito duplicado no mesmo dia.
-    marker = client.execute(
-        "SELECT id FROM wallet_ledger WHERE kind = ? AND meta_json LIKE ? LIMIT 1",
-        ["daily_share", f'%"day": "{day}"%'],
-    )
-    if marker.rows:
+    flush_page_views(client)
+    run = _credit_run(client, day)
+    if run and run[0] == "done":
+        return {"ok": True, "skipped": True, "day": day, "credited": 0}
+    started_at = datetime.now(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+    client.execute(_CREDIT_RUN_CLAIM_SQL, [day, started_at])
+    run = _credit_run(client, day)
+    if not run or run != ("running", started_at):
         return {"ok": True, "skipped": True, "day": day, "credited": 0}
 
     share = columnist_share_rate()
     rpm = site_rpm_brl()
     result = client.execute(
-        """
-        SELECT author_id, news_id, COUNT(*) AS views
-        FROM page_views
-        WHERE day = ?
-        GROUP BY author_id, news_id
-        """,
+        "SELECT author_id, news_id, views FROM page_views_daily WHERE day = ?",
         [day],
     )
     credited = 0.0
     entries = 0
     now = utc_now_iso()
+    owned = [day, started_at]
+    inserts: list[tuple[str, list[Any]]] = []
+    per_author: dict[int, float] = {}
     for row in result.rows or []:
         author_id = int(row[0])
         news_id = int(row[1])
@@ -663,16 +916,44 @@ def credit_daily_shares(client, day: str | None = None) -> dict[str, Any]:
             {"day": day, "views": views, "rpm": rpm, "share": share, "news_id": news_id},
             ensure_ascii=False,
         )
-        client.execute(
-            """
-            INSERT INTO wallet_ledger (user_id, kind, amount_brl, news_id, meta_json, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            [author_id, "daily_share", amount, news_id, meta, now],
+        inserts.append(
+            (
+                """
+                INSERT INTO wallet_ledger (user_id, kind, amount_brl, news_id, meta_json, created_at)
+                SELECT ?, ?, ?, ?, ?, ? WHERE """ + _CREDIT_RUN_OWNED,
+                [author_id, "daily_share", amount, news_id, meta, now, *owned],
+            )
         )
+        per_author[author_id] = per_author.get(author_id, 0.0) + amount
         credited += amount
         entries += 1
-    return {"ok": True, "day": day, "credited": round(credited, 2), "entries": entries, "share": share, "rpm": rpm}
+    # Saldo: um ajuste por colunista, no mesmo lote dos lançamentos.
+    for author_id, total in per_author.items():
+        inserts.append(
+            (
+                """
+                INSERT INTO wallet_balances (user_id, balance_brl, updated_at)
+                SELECT ?, ?, ? WHERE """ + _CREDIT_RUN_OWNED + """
+                ON CONFLICT(user_id) DO UPDATE SET
+                    balance_brl = balance_brl + excluded.balance_brl,
+                    updated_at = excluded.updated_at
+                """,
+                [author_id, round(total, 4), now, *owned],
+            )
+        )
+    totals = {"credited": round(credited, 2), "entries": entries, "share": share, "rpm": rpm}
+    finish = (
+        """
+        UPDATE credit_runs SET status = 'done', finished_at = ?, totals = ?
+        WHERE day = ? AND started_at = ? AND status = 'running'
+        """,
+        [now, json.dumps(totals, ensure_ascii=False), *owned],
+    )
+    # Um commit (local) / um pipeline (Turso) para o dia inteiro.
+    run_batch(client, [finish, *inserts])
+    if _credit_run(client, day) != ("done", started_at):
+        return {"ok": True, "skipped": True, "day": day, "credited": 0}
+    return {"ok": True, "day": day, **totals}
 
 
 def request_payout(client, user_id: int, amount: float | None = None) -> dict[str, Any]:
@@ -690,19 +971,18 @@ def request_payout(client, user_id: int, amount: float | None = None) -> dict[st
     if not pix:
         raise ValueError("Cadastre sua chave PIX no painel do colunista.")
     now = utc_now_iso()
-    client.execute(
-        """
-        INSERT INTO payout_requests (user_id, amount_brl, pix_key, status, created_at)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        [int(user_id), amount, str(pix), "pending", now],
-    )
-    client.execute(
-        """
-        INSERT INTO wallet_ledger (user_id, kind, amount_brl, news_id, meta_json, created_at)
-        VALUES (?, ?, ?, NULL, ?, ?)
-        """,
-        [int(user_id), "payout_hold", -amount, json.dumps({"pix_key": pix}, ensure_ascii=False), now],
+    run_batch(
+        client,
+        [
+            (
+                """
+                INSERT INTO payout_requests (user_id, amount_brl, pix_key, status, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [int(user_id), amount, str(pix), "pending", now],
+            ),
+            *_ledger_statements(user_id, "payout_hold", -amount, meta={"pix_key": pix}, now=now),
+        ],
     )
     return {"ok": True, "amount_brl": amount, "status": "pending"}
 
@@ -747,27 +1027,20 @@ def settle_payout(client, payout_id: int, *, paid: bool, admin_note: str = "") -
     amount = float(row[2] or 0)
     now = utc_now_iso()
     status = "paid" if paid else "rejected"
-    client.execute(
-        """
-        UPDATE payout_requests SET status = ?, admin_note = ?, reviewed_at = ? WHERE id = ?
-        """,
-        [status, (admin_note or "").strip()[:500], now, int(payout_id)],
-    )
-    if not paid:
-        # Devolve hold.
-        client.execute(
+    statements: list[tuple[str, list[Any]]] = [
+        (
             """
-            INSERT INTO wallet_ledger (user_id, kind, amount_brl, news_id, meta_json, created_at)
-            VALUES (?, ?, ?, NULL, ?, ?)
+            UPDATE payout_requests SET status = ?, admin_note = ?, reviewed_at = ? WHERE id = ?
             """,
-            [
-                user_id,
-                "payout_refund",
-                amount,
-                json.dumps({"payout_id": int(payout_id)}, ensure_ascii=False),
-                now,
-            ],
+            [status, (admin_note or "").strip()[:500], now, int(payout_id)],
+        )
+    ]
+    if not paid:
+        # Devolve hold.
+        statements += _ledger_statements(
+            user_id, "payout_refund", amount, meta={"payout_id": int(payout_id)}, now=now
         )
+    run_batch(client, statements)
 
 
 # --- Boost / destaque pago ---
@@ -880,6 +1153,7 @@ def activate_boost(client, order_id: int) -> None:
         """,
         [now, until_iso, int(order_id)],
     )
+    _BOOST_EXPIRY.schedule(until_iso)
 
 
 def find_boost_by_external_ref(client, external_ref: str) -> dict[str, Any] | None:
@@ -904,33 +1178,139 @@ def find_boost_by_external_ref(client, external_ref: str) -> dict[str, Any] | No
     }
 
 
+# O predicado repete o do índice parcial idx_news_boost_until (senão o SQLite não o usa).
+_BOOST_ACTIVE_WHERE = "boost_until IS NOT NULL AND boost_until != ''"
+
+
+def _boost_expiry_recheck_sec() -> float:
+    try:
+        return max(30.0, float(_env("BOOST_EXPIRY_RECHECK_SEC", "600")))
+    except ValueError:
+        return 600.0
+
+
+_BOOST_EXPIRE_SQL = """
+    UPDATE news SET boost_until = NULL,
+           home_priority = CASE
+               WHEN COALESCE(home_priority, 0) > 50 THEN 50
+               ELSE COALESCE(home_priority, 20)
+           END
+    WHERE id = ?
+"""
+
+
+def _parse_boost_until(value: str) -> datetime | None:
+    try:
+        due = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return due if due.tzinfo is not None else due.replace(tzinfo=timezone.utc)
+
+
+def next_boost_expiry(client) -> str | None:
+    """``boost_until`` mais próximo entre os destaques ativos (None = nenhum).
+
+    Valor ilegível nunca fica ``< agora`` e travaria o agendamento: o destaque
+    é encerrado na hora, como um vencido.
+    """
+    while True:
+        result = client.execute(
+            f"SELECT id, boost_until FROM news WHERE {_BOOST_ACTIVE_WHERE} ORDER BY boost_until LIMIT 1"
+        )
+        if not result.rows:
+            return None
+        news_id, value = result.rows[0][0], str(result.rows[0][1])
+        if _parse_boost_until(value) is not None:
+            return value
+        print(f"Aviso: boost_until ilegível na notícia {news_id}: {value!r}", flush=True)
+        _ = client.execute(_BOOST_EXPIRE_SQL, [int(news_id)])
+
+
+class _BoostExpirySchedule:
+    """Próximo vencimento de destaque em memória; uma thread daemon expira na hora certa.
+
+    ``activate_boost`` antecipa o agendamento; o MIN(boost_until) é relido
+    após cada expiração e a cada ``BOOST_EXPIRY_RECHECK_SEC`` (boosts ativados
+    por outro processo). O client vem de ``get_db()`` a cada volta: um
+    restore/``reset_db_client()`` fecha o client antigo.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.next_at: str | None = None
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def schedule(self, until_iso: str | None) -> None:
+        if not until_iso:
+            return
+        with self.lock:
+            if self.next_at is None or until_iso < self.next_at:
+                self.next_at = until_iso
+        self.wake.set()
+
+    def start(self, on_expire: Callable[[int], None] | None = None) -> None:
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(
+                target=self._run, args=(on_expire,), daemon=True, name="boost-expiry"
+            )
+            self.thread.start()
+
+    def _seconds_until_next(self) -> float:
+        with self.lock:
+            next_at = self.next_at
+        recheck = _boost_expiry_recheck_sec()
+        due = _parse_boost_until(next_at) if next_at is not None else None
+        if due is None:
+            return recheck
+        return max(0.0, min(recheck, (due - datetime.now(timezone.utc)).total_seconds()))
+
+    def tick(self, on_expire: Callable[[int], None] | None = None) -> int:
+        """Uma volta do worker: expira o que venceu no client atual."""
+        try:
+            n = expire_boosts(get_db())
+            if n and on_expire is not None:
+                on_expire(n)
+            return n
+        except Exception as exc:
+            print(f"Aviso: expiração de destaques falhou: {exc}", flush=True)
+            return 0
+
+    def _run(self, on_expire: Callable[[int], None] | None) -> None:
+        while True:
+            _ = self.tick(on_expire)
+            self.wake.wait(self._seconds_until_next())
+            self.wake.clear()
+
+
+_BOOST_EXPIRY = _BoostExpirySchedule()
+
+
+def start_boost_expiry_worker(on_expire: Callable[[int], None] | None = None) -> None:
+    """Liga a thread de expiração (idempotente). ``on_expire(n)`` roda quando algo venceu."""
+    _BOOST_EXPIRY.start(on_expire)
+
+
 def expire_boosts(client) -> int:
-    """Remove prioridade de boosts vencidos. Retorna quantidade afetada."""
+    """Remove prioridade de boosts vencidos e reagenda o próximo. Retorna quantidade afetada."""
     now = utc_now_iso()
     result = client.execute(
-        """
+        f"""
         SELECT id, home_priority FROM news
-        WHERE boost_until IS NOT NULL AND boost_until != '' AND boost_until < ?
+        WHERE {_BOOST_ACTIVE_WHERE} AND boost_until < ?
+        ORDER BY boost_until
         LIMIT 200
         """,
         [now],
     )
-    n = 0
-    for row in result.rows or []:
-        nid = int(row[0])
-        client.execute(
-            """
-            UPDATE news SET boost_until = NULL,
-                   home_priority = CASE
-                       WHEN COALESCE(home_priority, 0) > 50 THEN 50
-                       ELSE COALESCE(home_priority, 20)
-                   END
-            WHERE id = ?
-            """,
-            [nid],
-        )
-        n += 1
-    return n
+    updates = [(_BOOST_EXPIRE_SQL, [int(row[0])]) for row in result.rows or []]
+    run_batch(client, updates)
+    next_at = next_boost_expiry(client)
+    with _BOOST_EXPIRY.lock:
+        _BOOST_EXPIRY.next_at = next_at
+    return len(updates)
 
 
 # --- Mercado Pago (PIX) ---
@@ -1,18 +1,23 @@
 """Auth de comunidade (usuários, sessão, OAuth Google) e comentários."""
 from __future__ import annotations
 
+import base64
 import hashlib
 import hmac
 import os
 import re
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import urlencode
 
 import requests
 
+from db import run_batch, run_returning
 from profanity_filter import moderate_comment
 
 DEFAULT_AVATAR = "/static/avatars/default.svg?v=2"
@@ -340,6 +345,56 @@ def find_user_by_id(client, user_id: int) -> dict[str, Any] | None:
     return _user_dict(result.rows[0], include_verify=True, include_role=True)
 
 
+# Usuário da sessão (já com role) por id: _current_user roda em toda página logada.
+USER_CACHE_MAX = 2048
+_USER_CACHE: OrderedDict[int, tuple[float, dict[str, Any] | None]] = OrderedDict()
+_USER_CACHE_LOCK = threading.Lock()
+_user_cache_gen = 0
+
+
+def _user_cache_ttl() -> float:
+    try:
+        return max(0.0, float(_env("USER_CACHE_TTL") or "60"))
+    except ValueError:
+        return 60.0
+
+
+def cached_session_user(
+    user_id: int,
+    load: Callable[[int], dict[str, Any] | None],
+) -> dict[str, Any] | None:
+    """Usuário por id via ``load`` com cache LRU+TTL (``USER_CACHE_TTL``). Devolve cópia."""
+    uid = int(user_id)
+    now = time.monotonic()
+    with _USER_CACHE_LOCK:
+        hit = _USER_CACHE.get(uid)
+        if hit is not None and hit[0] > now:
+            _USER_CACHE.move_to_end(uid)
+            return dict(hit[1]) if hit[1] else None
+        gen = _user_cache_gen
+    user = load(uid)
+    ttl = _user_cache_ttl()
+    with _USER_CACHE_LOCK:
+        # Invalidação durante o load: a leitura pode ser anterior à escrita.
+        if ttl > 0 and gen == _user_cache_gen:
+            _USER_CACHE[uid] = (now + ttl, dict(user) if user else None)
+            _USER_CACHE.move_to_end(uid)
+            while len(_USER_CACHE) > USER_CACHE_MAX:
+                _USER_CACHE.popitem(last=False)
+    return dict(user) if user else None
+
+
+def invalidate_user_cache(user_id: int | None = None) -> None:
+    """Descarta o usuário (ou todos) após UPDATE em ``users``."""
+    global _user_cache_gen
+    with _USER_CACHE_LOCK:
+        _user_cache_gen += 1
+        if user_id is None:
+            _USER_CACHE.clear()
+        else:
+            _USER_CACHE.pop(int(user_id), None)
+
+
 def find_user_by_google_id(client, google_id: str) -> dict[str, Any] | None:
     result = client.execute(
         """
@@ -460,6 +515,7 @@ def issue_email_verification(client, user_id: int, *, force: bool = False) -> di
         """,
         [token, agora, int(user_id)],
     )
+    invalidate_user_cache(user_id)
     return {
         "ok": True,
         "token": token,
@@ -496,6 +552,7 @@ def verify_email_token(client, token: str) -> dict[str, Any]:
         """,
         [int(user["id"])],
     )
+    invalidate_user_cache(int(user["id"]))
     user["email_verified"] = True
     user["email_verify_token"] = None
     user["email_verify_sent_at"] = None
@@ -511,6 +568,7 @@ def mark_email_verified(client, user_id: int) -> None:
         """,
         [int(user_id)],
     )
+    invalidate_user_cache(user_id)
 
 
 def authenticate_local(client, email: str, password: str) -> dict[str, Any] | None:
@@ -553,6 +611,7 @@ def link_or_create_google_user(
             """,
             [google_id, picture or "", name or "", by_email["id"]],
         )
+        invalidate_user_cache(int(by_email["id"]))
         return find_user_by_id(client, int(by_email["id"])) or by_email
     return create_user(
         client,
@@ -637,8 +696,15 @@ def delete_own_comment(client, comment_id: int, user_id: int) -> dict[str, Any]:
             client.execute("DELETE FROM comment_votes WHERE comment_id = ?", [cid])
         except Exception:
             pass
-    client.execute("DELETE FROM comments WHERE parent_id = ?", [cid])
-    client.execute("DELETE FROM comments WHERE id = ?", [cid])
+    run_batch(
+        client,
+        [
+            ("DELETE FROM comments WHERE parent_id = ?", [cid]),
+            ("DELETE FROM comments WHERE id = ?", [cid]),
+            (_COMMENT_COUNT_SQL, [news_id, news_id]),
+        ],
+    )
+    invalidate_comment_cache(news_id)
     return {"ok": True, "id": cid, "news_id": news_id}
 
 
@@ -665,22 +731,197 @@ def save_avatar_upload(user_id: int, filename: str, data: bytes) -> str:
     return f"{avatar_public_prefix()}/{safe_name}"
 
 
-def list_comments(client, news_id: int, *, include_pending_for_user: int | None = None) -> list[dict[str, Any]]:
-    result = client.execute(
-        """
-        SELECT c.id, c.news_id, c.user_id, c.parent_id, c.body, c.status, c.created_at,
-               c.geo_country, c.upvotes, u.name, u.avatar_url
-        FROM comments c
-        JOIN users u ON u.id = c.user_id
-        WHERE c.news_id = ?
-          AND (c.status = 'published' OR (c.user_id = ? AND c.status IN ('pending', 'blocked')))
-        ORDER BY COALESCE(c.parent_id, c.id) ASC, c.id ASC
-        LIMIT 200
-        """,
-        [int(news_id), int(include_pending_for_user or 0)],
-    )
+# news.comment_count = linhas em comments (qualquer status) — 0 pula a listagem.
+_COMMENT_COUNT_SQL = "UPDATE news SET comment_count = (SELECT COUNT(*) FROM comments WHERE news_id = ?) WHERE id = ?"
+
+# Página de comentários, em ordem de thread: (raiz, id). Replies vêm logo após a raiz.
+# A página compartilhada (e cacheada) só tem publicados; pendentes/bloqueados do
+# visitante vêm de uma consulta por usuário e entram na faixa de keyset da página.
+COMMENT_PAGE_SIZE = 40
+_COMMENT_FROM = """
+    SELECT c.id, c.news_id, c.user_id, c.parent_id, c.body, c.status, c.created_at,
+           c.geo_country, c.upvotes, u.name, u.avatar_url
+    FROM comments c
+    JOIN users u ON u.id = c.user_id
+    WHERE c.news_id = ?
+"""
+_COMMENT_SELECT = _COMMENT_FROM + " AND c.status = 'published'"
+_OWN_PENDING_SELECT = _COMMENT_FROM + " AND c.user_id = ? AND c.status IN ('pending', 'blocked')"
+_COMMENT_ORDER = " ORDER BY COALESCE(c.parent_id, c.id) ASC, c.id ASC LIMIT ?"
+
+# 1ª página de publicados por matéria e o total de publicados. Escritas invalidam.
+COMMENT_CACHE_MAX = 512
+_COMMENT_CACHE: OrderedDict[int, tuple[float, tuple[list[tuple[Any, ...]], int]]] = OrderedDict()
+_COMMENT_CACHE_LOCK = threading.Lock()
+_comment_cache_gen = 0
+
+
+def _comment_cache_ttl() -> float:
+    try:
+        return max(0.0, float(_env("COMMENT_CACHE_TTL") or "300"))
+    except ValueError:
+        return 300.0
+
+
+def invalidate_comment_cache(news_id: int | None = None) -> None:
+    global _comment_cache_gen
+    with _COMMENT_CACHE_LOCK:
+        _comment_cache_gen += 1
+        if news_id is None:
+            _COMMENT_CACHE.clear()
+        else:
+            _COMMENT_CACHE.pop(int(news_id), None)
+
+
+def encode_comment_cursor(root_id: int, comment_id: int) -> str:
+    """Cursor opaco da página de comentários (keyset em ``(raiz, id)``)."""
+    raw = f"c{int(root_id)}.{int(comment_id)}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_comment_cursor(raw: str | None) -> tuple[int, int] | None:
+    value = (raw or "").strip()
+    if not value or len(value) > 48:
+        return None
+    try:
+        decoded = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("ascii")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    root, _, cid = decoded[1:].partition(".")
+    if not decoded.startswith("c") or not root.isdigit() or not cid.isdigit():
+        return None
+    return int(root), int(cid)
+
+
+def _first_comment_page(client, news_id: int) -> tuple[list[tuple[Any, ...]], int]:
+    """(publicados da 1ª página + 1 sentinela, total de publicados) — com cache."""
+    nid = int(news_id)
+    now = time.monotonic()
+    with _COMMENT_CACHE_LOCK:
+        hit = _COMMENT_CACHE.get(nid)
+        if hit is not None and hit[0] > now:
+            _COMMENT_CACHE.move_to_end(nid)
+            return hit[1]
+        gen = _comment_cache_gen
+    result = client.execute(_COMMENT_SELECT + _COMMENT_ORDER, [nid, COMMENT_PAGE_SIZE + 1])
+    rows = [tuple(r) for r in (result.rows or [])]
+    if len(rows) > COMMENT_PAGE_SIZE:
+        # Thread movimentada: contagem à parte (só aqui; o resto conta da própria página).
+        counted = client.execute(
+            "SELECT COUNT(*) FROM comments WHERE news_id = ? AND status = 'published'",
+            [nid],
+        )
+        published = int(counted.rows[0][0]) if counted.rows else 0
+    else:
+        published = len(rows)
+    entry = (rows, published)
+    ttl = _comment_cache_ttl()
+    with _COMMENT_CACHE_LOCK:
+        if ttl > 0 and gen == _comment_cache_gen:
+            _COMMENT_CACHE[nid] = (now + ttl, entry)
+            _COMMENT_CACHE.move_to_end(nid)
+            while len(_COMMENT_CACHE) > COMMENT_CACHE_MAX:
+                _COMMENT_CACHE.popitem(last=False)
+    return entry
+
+
+def _thread_key(row: tuple[Any, ...]) -> tuple[int, int]:
+    return (int(row[3] if row[3] is not None else row[0]), int(row[0]))
+
+
+def _own_pending_comments(
+    client,
+    news_id: int,
+    user_id: int,
+    after: tuple[int, int] | None,
+    upper: tuple[int, int] | None,
+) -> list[tuple[Any, ...]]:
+    """Pendentes/bloqueados do próprio autor na faixa ``(after, upper]`` do keyset."""
+    sql = _OWN_PENDING_SELECT
+    args: list[Any] = [int(news_id), int(user_id)]
+    if after is not None:
+        sql += " AND (COALESCE(c.parent_id, c.id), c.id) > (?, ?)"
+        args += [int(after[0]), int(after[1])]
+    if upper is not None:
+        sql += " AND (COALESCE(c.parent_id, c.id), c.id) <= (?, ?)"
+        args += [upper[0], upper[1]]
+    result = client.execute(sql + _COMMENT_ORDER, [*args, COMMENT_PAGE_SIZE])
+    return [tuple(r) for r in (result.rows or [])]
+
+
+def list_comments_page(
+    client,
+    news_id: int,
+    *,
+    after: tuple[int, int] | None = None,
+    include_pending_for_user: int | None = None,
+    comment_count: int | None = None,
+) -> dict[str, Any]:
+    """Uma página da thread: ``{"comments", "next_cursor", "total"}``.
+
+    O keyset ``(raiz, id)`` anda só sobre publicados, então a página vem cheia
+    para qualquer visitante. Sem ``after`` é a 1ª página (cacheada; ``total`` =
+    publicados + pendentes do visitante); com ``after`` (de
+    ``decode_comment_cursor``) ``total`` vem None. Pendentes do visitante
+    entram na página cuja faixa de keyset os contém (até ``COMMENT_PAGE_SIZE``
+    por página). ``comment_count`` (de ``news``) igual a 0 dispensa a consulta.
+    """
+    empty: dict[str, Any] = {"comments": [], "next_cursor": None, "total": 0 if after is None else None}
+    if comment_count is not None and int(comment_count) <= 0:
+        return empty
+    published: int | None = None
+    if after is None:
+        rows, published = _first_comment_page(client, news_id)
+    else:
+        result = client.execute(
+            _COMMENT_SELECT + " AND (COALESCE(c.parent_id, c.id), c.id) > (?, ?)" + _COMMENT_ORDER,
+            [int(news_id), int(after[0]), int(after[1]), COMMENT_PAGE_SIZE + 1],
+        )
+        rows = [tuple(r) for r in (result.rows or [])]
+    next_cursor = None
+    if len(rows) > COMMENT_PAGE_SIZE:
+        rows = rows[:COMMENT_PAGE_SIZE]
+        next_cursor = encode_comment_cursor(*_thread_key(rows[-1]))
+    own: list[tuple[Any, ...]] = []
+    upper = _thread_key(rows[-1]) if next_cursor else None
+    if include_pending_for_user:
+        own = _own_pending_comments(client, news_id, int(include_pending_for_user), after, upper)
+        rows = sorted(rows + own, key=_thread_key)
+    total = None
+    if published is not None:
+        own_total = len(own)
+        if include_pending_for_user and upper is not None:
+            # Pendentes do visitante em páginas seguintes também contam no total.
+            counted = client.execute(
+                "SELECT COUNT(*) FROM comments WHERE news_id = ? AND user_id = ?"
+                " AND status IN ('pending', 'blocked')",
+                [int(news_id), int(include_pending_for_user)],
+            )
+            own_total = int(counted.rows[0][0]) if counted.rows else own_total
+        total = published + own_total
+    return {"comments": _comment_items(rows), "next_cursor": next_cursor, "total": total}
+
+
+def list_comments(
+    client,
+    news_id: int,
+    *,
+    include_pending_for_user: int | None = None,
+    comment_count: int | None = None,
+) -> list[dict[str, Any]]:
+    """1ª página de comentários visíveis: publicados + pendentes/bloqueados do próprio visitante."""
+    return list_comments_page(
+        client,
+        news_id,
+        include_pending_for_user=include_pending_for_user,
+        comment_count=comment_count,
+    )["comments"]
+
+
+def _comment_items(rows: list[tuple[Any, ...]]) -> list[dict[str, Any]]:
     items: list[dict[str, Any]] = []
-    for row in result.rows or []:
+    for row in rows:
+        status = str(row[5] or "")
         items.append(
             {
                 "id": int(row[0]),
@@ -688,7 +929,7 @@ def list_comments(client, news_id: int, *, include_pending_for_user: int | None
                 "user_id": int(row[2]),
                 "parent_id": int(row[3]) if row[3] is not None else None,
                 "body": str(row[4] or ""),
-                "status": str(row[5] or ""),
+                "status": status,
                 "created_at": str(row[6] or ""),
                 "created_at_label": format_comment_time(str(row[6] or "")),
                 "geo_country": row[7],
@@ -731,34 +972,35 @@ def create_comment(
     agora = now_iso()
     final_status = "published" if status == "published" else "blocked"
     body_clean = body.strip()
-    client.execute(
-        """
-        INSERT INTO comments (
-            news_id, user_id, parent_id, body, status, created_at,
-            consent_at, ip_hash, geo_country, upvotes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
-        """,
+    # INSERT … RETURNING + recontagem num lote só: sem re-SELECT para achar o id.
+    inserted, _ = run_returning(
+        client,
         [
-            int(news_id),
-            int(user_id),
-            int(parent_id) if parent_id is not None else None,
-            body_clean,
-            final_status,
-            agora,
-            consent_at,
-            ip_h,
-            geo,
+            (
+                """
+                INSERT INTO comments (
+                    news_id, user_id, parent_id, body, status, created_at,
+                    consent_at, ip_hash, geo_country, upvotes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                RETURNING id
+                """,
+                [
+                    int(news_id),
+                    int(user_id),
+                    int(parent_id) if parent_id is not None else None,
+                    body_clean,
+                    final_status,
+                    agora,
+                    consent_at,
+                    ip_h,
+                    geo,
+                ],
+            ),
+            (_COMMENT_COUNT_SQL, [int(news_id), int(news_id)]),
         ],
     )
-    row = client.execute(
-        """
-        SELECT id FROM comments
-        WHERE news_id = ? AND user_id = ? AND created_at = ? AND body = ?
-        ORDER BY id DESC LIMIT 1
-        """,
-        [int(news_id), int(user_id), agora, body_clean],
-    ).rows
-    cid = int(row[0][0]) if row else 0
+    invalidate_comment_cache(news_id)
+    cid = int(inserted[0][0]) if inserted else 0
     return {
         "id": cid,
         "news_id": int(news_id),
@@ -776,22 +1018,35 @@ def create_comment(
 
 
 def upvote_comment(client, comment_id: int, user_id: int) -> bool:
-    """Upvote simples (idempotente via tabela auxiliar se existir; senão +1 limitado)."""
+    """Upvote idempotente: 1 voto por usuário, garantido pela PK de ``comment_votes``.
+
+    INSERT OR IGNORE + UPDATE condicionado a ``changes() = 1`` no mesmo lote:
+    um voto repetido (mesmo concorrente) não insere linha e não soma upvote.
+    """
     try:
-        existing = client.execute(
-            "SELECT 1 FROM comment_votes WHERE comment_id = ? AND user_id = ? LIMIT 1",
-            [int(comment_id), int(user_id)],
-        ).rows
-        if existing:
-            return False
-        client.execute(
-            "INSERT INTO comment_votes (comment_id, user_id, created_at) VALUES (?, ?, ?)",
-            [int(comment_id), int(user_id), now_iso()],
-        )
-        client.execute(
-            "UPDATE comments SET upvotes = COALESCE(upvotes, 0) + 1 WHERE id = ?",
-            [int(comment_id)],
+        _, updated = run_returning(
+            client,
+            [
+                (
+                    """
+                    INSERT OR IGNORE INTO comment_votes (comment_id, user_id, created_at)
+                    SELECT id, ?, ? FROM comments WHERE id = ?
+                    """,
+                    [int(user_id), now_iso(), int(comment_id)],
+                ),
+                (
+                    """
+                    UPDATE comments SET upvotes = COALESCE(upvotes, 0) + 1
+                    WHERE id = ? AND changes() = 1
+                    RETURNING news_id
+                    """,
+                    [int(comment_id)],
+                ),
+            ],
         )
+        if not updated:
+            return False
+        invalidate_comment_cache(int(updated[0][0]))
         return True
     except Exception:
         return False
@@ -0,0 +1,20 @@
+"""Fixtures compartilhadas dos testes."""
+from __future__ import annotations
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """SQLite isolado com o schema completo; é também o client de ``db.get_db()``."""
+    monkeypatch.setenv("USE_LOCAL_DB", "1")
+    monkeypatch.setenv("LOCAL_DATABASE_PATH", str(tmp_path / "test.db"))
+    db.reset_db_client()
+    client = db.get_db()
+    db.ensure_schema(client, force=True)
+    try:
+        yield client
+    finally:
+        db.reset_db_client()
@@ -20,7 +20,13 @@ import requests
 import urllib3
 from urllib3.exceptions import InsecureRequestWarning
 
-from db import existing_news_links, get_db, get_editorial_context
+from db import (
+    existing_news_links,
+    get_db,
+    get_editorial_context,
+    pack_market_snapshots,
+    unpack_market_snapshots,
+)
 
 _ = load_dotenv()
 
@@ -1215,9 +1221,13 @@ def resolve_article_market_data(
     published_at: object = None,
     created_at: object = None,
     blocking_hist: bool = False,
+    client=None,
 ) -> dict[str, Any]:
-    """Garante cotacoes/bcb/historico do período da análise — nunca substitui por 'hoje'."""
-    market_data = dict(dados_mercado or {})
+    """Garante cotacoes/bcb/historico do período da análise — nunca substitui por 'hoje'.
+
+    Payload compactado (``snapshot_refs``) é remontado a partir de market_snapshots.
+    """
+    market_data = unpack_market_snapshots(client, dict(dados_mercado or {}))
 
     # Snapshot original preservado tem prioridade sobre refresh posterior.
     if _has_market_payload(market_data.get("cotacoes_publicacao")):
@@ -3344,12 +3354,14 @@ def refresh_article_market_data(article_id: int, add_update_note: bool = True) -
             pass
 
     # Garante snapshot do período da análise antes de qualquer comparação.
-    as_of = parse_article_datetime(data_ref, (old_dados.get("cotacoes") or {}).get("coletado_em"))
     base = resolve_article_market_data(
         old_dados,
         published_at=data_ref,
         blocking_hist=True,
+        client=client,
     )
+    # Depois de remontar: compactado, dados_mercado só tem snapshot_refs.
+    as_of = parse_article_datetime(data_ref, (base.get("cotacoes") or {}).get("coletado_em"))
 
     market_now = fetch_market_snapshot(blocking=True)
     bcb_now = fetch_bcb_snapshot(blocking=True)
@@ -3401,7 +3413,12 @@ def refresh_article_market_data(article_id: int, add_update_note: bool = True) -
         SET dados_mercado = ?, updated_at = ?, versao_analise = ?
         WHERE id = ?
         """,
-        [json.dumps(base, ensure_ascii=False), agora, versao + 1, noticia_id],
+        [
+            json.dumps(pack_market_snapshots(client, base), ensure_ascii=False),
+            agora,
+            versao + 1,
+            noticia_id,
+        ],
     )
     client.close()
     return {
@@ -3498,18 +3515,26 @@ def count_own_analyses_today() -> int:
         return 0
 
 
-def _fetch_recent_source_news(limit: int = 40) -> list[tuple]:
-    """Notícias externas recentes do acervo (exclui guias e análises próprias)."""
+def _fetch_recent_source_news(limit: int = 40, *, since_days: int | None = None) -> list[tuple]:
+    """Notícias externas recentes do acervo (exclui guias e análises próprias).
+
+    ``since_days`` restringe à janela via ``published_ts`` (range no índice).
+    """
     client = get_db()
+    window = ""
+    params: list[Any] = []
+    if since_days:
+        window = "AND published_ts >= ?"
+        params.append(int(time.time()) - int(since_days) * 86400)
     result = client.execute(
-        """
+        f"""
         SELECT id, titulo, tag, sentimento, impacto, resumo, fonte, published_at
         FROM news
-        WHERE link NOT LIKE 'internal://%'
+        WHERE link NOT LIKE 'internal://%' {window}
         ORDER BY id DESC
         LIMIT ?
         """,
-        [max(8, limit)],
+        [*params, max(8, limit)],
     )
     return list(result.rows)
 
@@ -3930,7 +3955,10 @@ def generate_weekly_radar(*, force: bool = False) -> list[dict[str, Any]]:
         print("   [radar] Sem GOOGLE_API_KEY — abortando.")
         return []
 
-    source_rows = _fetch_recent_source_news(limit=40)
+    # Radar é da semana: só o que saiu nos últimos 7 dias; acervo curto cai no recente.
+    source_rows = _fetch_recent_source_news(limit=40, since_days=7)
+    if len(source_rows) < 4:
+        source_rows = _fetch_recent_source_news(limit=40)
     if len(source_rows) < 4:
         print("   [radar] Acervo insuficiente (<4 matérias).")
         return []
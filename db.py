@@ -1,14 +1,27 @@
+import contextvars
+import functools
 import gzip
+import hashlib
+import io
+import json
+import math
 import os
+import queue
 import random
 import re
 import sqlite3
+import shutil
 import ssl
 import threading
 import time
 import unicodedata
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Protocol
+from typing import Any, Callable, ContextManager, Protocol, TypeVar
 
 import requests
 
@@ -18,8 +31,15 @@ class QueryResult:
     rows: list[Any]
 
 
+Statement = tuple[str, list[Any] | None]
+_T = TypeVar("_T")
+
+
 class DbClient(Protocol):
     def execute(self, sql: str, args: list[Any] | None = None) -> QueryResult: ...
+    def batch(self, statements: list[Statement]) -> list[QueryResult]: ...
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]: ...
+    def transaction(self) -> ContextManager[Any]: ...
     def close(self) -> None: ...
 
 
@@ -32,35 +52,331 @@ def _as_query_result(result: object) -> QueryResult:
     return QueryResult(list(rows))
 
 
+_FP_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_FP_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_FP_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_FP_VALUES_RE = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+", re.IGNORECASE)
+_FP_SPACE_RE = re.compile(r"\s+")
+_STATS_MAX_FINGERPRINTS = 500
+_STATS_SAMPLES = 256
+
+
+@functools.lru_cache(maxsize=2048)
+def sql_fingerprint(sql: str) -> str:
+    """Normaliza o SQL para agrupar estatísticas: literais → ``?``, ``IN (?,?,…)`` → ``IN (?+)``."""
+    text = _FP_SPACE_RE.sub(" ", sql or "").strip()
+    text = _FP_STRING_RE.sub("?", text)
+    text = _FP_NUMBER_RE.sub("?", text)
+    text = _FP_IN_LIST_RE.sub("IN (?+)", text)
+    text = _FP_VALUES_RE.sub(r"VALUES \1, …", text)
+    return text
+
+
+def _slow_query_ms() -> float:
+    try:
+        return float(os.getenv("DB_SLOW_QUERY_MS", "250"))
+    except ValueError:
+        return 250.0
+
+
+def _query_stats_enabled() -> bool:
+    return os.getenv("DB_QUERY_STATS", "true").strip().lower() not in ("0", "false", "no")
+
+
+class _QueryStats:
+    """Contadores por fingerprint (em memória, por processo) + log de queries lentas."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._since = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._since = time.time()
+
+    def record(self, sql: str, elapsed_sec: float, rows: int, *, error: bool = False) -> None:
+        fingerprint = sql_fingerprint(sql)
+        elapsed_ms = elapsed_sec * 1000.0
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= _STATS_MAX_FINGERPRINTS:
+                    fingerprint = "<outros>"
+                    entry = self._entries.get(fingerprint)
+                if entry is None:
+                    entry = {
+                        "count": 0,
+                        "errors": 0,
+                        "rows": 0,
+                        "total_ms": 0.0,
+                        "max_ms": 0.0,
+                        "samples": deque(maxlen=_STATS_SAMPLES),
+                    }
+                    self._entries[fingerprint] = entry
+            entry["count"] += 1
+            entry["rows"] += int(rows)
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["samples"].append(elapsed_ms)
+            if error:
+                entry["errors"] += 1
+        threshold = _slow_query_ms()
+        if threshold > 0 and elapsed_ms >= threshold:
+            print(
+                f"   [db] query lenta {elapsed_ms:.0f}ms rows={rows}"
+                + (" (erro)" if error else "")
+                + f": {fingerprint[:240]}",
+                flush=True,
+            )
+
+    def snapshot(self, *, sort: str = "total_ms", limit: int = 50) -> dict[str, Any]:
+        with self._lock:
+            items = [
+                (fp, dict(entry, samples=sorted(entry["samples"])))
+                for fp, entry in self._entries.items()
+            ]
+            since = self._since
+        queries: list[dict[str, Any]] = []
+        for fp, entry in items:
+            samples = entry["samples"]
+            count = int(entry["count"])
+            queries.append(
+                {
+                    "fingerprint": fp,
+                    "count": count,
+                    "errors": int(entry["errors"]),
+                    "rows": int(entry["rows"]),
+                    "total_ms": round(entry["total_ms"], 2),
+                    "avg_ms": round(entry["total_ms"] / count, 2) if count else 0.0,
+                    "max_ms": round(entry["max_ms"], 2),
+                    "p50_ms": _percentile(samples, 50),
+                    "p95_ms": _percentile(samples, 95),
+                    "p99_ms": _percentile(samples, 99),
+                }
+            )
+        key = sort if queries and sort in queries[0] and sort != "fingerprint" else "total_ms"
+        queries.sort(key=lambda q: q[key], reverse=True)
+        return {
+            "since": since,
+            "fingerprints": len(queries),
+            "slow_query_ms": _slow_query_ms(),
+            "queries": queries[: max(1, int(limit))],
+        }
+
+
+def _percentile(sorted_samples: list[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    # Nearest-rank: menor amostra com pelo menos pct% das observações abaixo.
+    idx = min(len(sorted_samples) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_samples)) - 1))
+    return round(sorted_samples[idx], 2)
+
+
+_query_stats = _QueryStats()
+
+
+def query_stats(*, sort: str = "total_ms", limit: int = 50) -> dict[str, Any]:
+    """Top fingerprints por tempo total (ou ``count``/``p95_ms``/``rows``…)."""
+    return _query_stats.snapshot(sort=sort, limit=limit)
+
+
+def reset_query_stats() -> None:
+    _query_stats.reset()
+
+
+@contextmanager
+def _timed_query(sql: str) -> Iterator[list[int]]:
+    """Mede o bloco e registra em ``_query_stats``; o chamador preenche ``rows[0]``."""
+    if not _query_stats_enabled():
+        yield [0]
+        return
+    rows = [0]
+    started = time.perf_counter()
+    try:
+        yield rows
+    except BaseException:
+        _query_stats.record(sql, time.perf_counter() - started, rows[0], error=True)
+        raise
+    _query_stats.record(sql, time.perf_counter() - started, rows[0])
+
+
+_READ_PREFIXES = ("SELECT", "WITH")
+_CTE_WRITE_RE = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+def _is_read_statement(sql: str) -> bool:
+    head = sql.lstrip().upper()
+    if not head.startswith(_READ_PREFIXES):
+        return False
+    # ``WITH … INSERT/UPDATE/DELETE`` é escrita: vai ao escritor (e ao Turso na réplica).
+    if head.startswith("WITH") and _CTE_WRITE_RE.search(_FP_STRING_RE.sub("''", sql)):
+        return False
+    return True
+
+
+def _local_reader_count() -> int:
+    try:
+        return max(0, int(os.getenv("LOCAL_DB_READERS", "4")))
+    except ValueError:
+        return 4
+
+
 class LocalDbClient:
-    """Wrapper SQLite local com a mesma interface do libsql_client sync."""
+    """Wrapper SQLite local com a mesma interface do libsql_client sync.
 
-    def __init__(self, path: str):
-        self._conn = sqlite3.connect(path, check_same_thread=False)
+    Em WAL, leitores não bloqueiam o escritor nem uns aos outros: SELECTs vão
+    para um pool de ``LOCAL_DB_READERS`` conexões ``query_only`` e o resto
+    (INSERT/UPDATE/DDL) passa pela conexão única de escrita, serializada.
+    """
+
+    def __init__(self, path: str, *, readers: int | None = None):
+        self._path = path
+        self._conn = self._connect()
         _ = self._conn.execute("PRAGMA journal_mode=WAL")
-        _ = self._conn.execute("PRAGMA synchronous=NORMAL")
-        _ = self._conn.execute("PRAGMA temp_store=MEMORY")
-        # Conexão única compartilhada entre threads — serializa o acesso.
+        # Escritor compartilhado entre threads — serializa só as escritas.
         self._lock = threading.Lock()
+        max_readers = _local_reader_count() if readers is None else max(0, int(readers))
+        if path == ":memory:" or path.startswith("file::memory:"):
+            # Banco em memória é por conexão: leitores não enxergariam os dados.
+            max_readers = 0
+        self._max_readers = max_readers
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all_readers: list[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        # Thread dona da transação aberta: suas queries vão direto ao escritor.
+        self._tx_owner: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, check_same_thread=False)
+        _ = conn.execute("PRAGMA synchronous=NORMAL")
+        _ = conn.execute("PRAGMA temp_store=MEMORY")
+        _ = conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection | None:
+        if self._closed:
+            return None
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._all_readers) < self._max_readers:
+                conn = self._connect()
+                _ = conn.execute("PRAGMA query_only=1")
+                self._all_readers.append(conn)
+                return conn
+        if not self._all_readers:
+            return None
+        return self._readers.get()
+
+    def _release_reader(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+        self._readers.put(conn)
+
+    def _execute_read(self, sql: str, args: list[Any] | None) -> QueryResult | None:
+        conn = self._acquire_reader()
+        if conn is None:
+            return None
+        try:
+            cursor = conn.execute(sql, args) if args else conn.execute(sql)
+            return QueryResult(cursor.fetchall())
+        finally:
+            self._release_reader(conn)
+
+    def _execute_on_writer(self, sql: str, args: list[Any] | None, *, commit: bool) -> QueryResult:
+        cursor = self._conn.cursor()
+        if args:
+            _ = cursor.execute(sql, args)
+        else:
+            _ = cursor.execute(sql)
+        if _is_read_statement(sql):
+            return QueryResult(cursor.fetchall())
+        rows = cursor.fetchall() if cursor.description else []
+        if commit:
+            self._conn.commit()
+        return QueryResult(rows)
 
     def execute(self, sql: str, args: list[Any] | None = None, **_kwargs: Any) -> QueryResult:
+        with _timed_query(sql) as rows:
+            result = self._execute(sql, args)
+            rows[0] = len(result.rows)
+        return result
+
+    def _execute(self, sql: str, args: list[Any] | None) -> QueryResult:
+        if self._tx_owner == threading.get_ident():
+            return self._execute_on_writer(sql, args, commit=False)
+        if self._max_readers and _is_read_statement(sql):
+            result = self._execute_read(sql, args)
+            if result is not None:
+                return result
         with self._lock:
-            cursor = self._conn.cursor()
-            if args:
-                _ = cursor.execute(sql, args)
-            else:
-                _ = cursor.execute(sql)
-            if sql.strip().upper().startswith("SELECT"):
-                return QueryResult(cursor.fetchall())
-            self._conn.commit()
-            return QueryResult([])
+            return self._execute_on_writer(sql, args, commit=True)
+
+    @contextmanager
+    def transaction(self) -> Iterator["LocalDbClient"]:
+        """BEGIN IMMEDIATE … COMMIT na conexão de escrita (ROLLBACK em exceção).
+
+        Dentro do bloco, ``execute`` na mesma thread enxerga as escritas ainda
+        não confirmadas; transações aninhadas juntam-se à externa.
+        """
+        if self._tx_owner == threading.get_ident():
+            yield self
+            return
+        with self._lock:
+            self._tx_owner = threading.get_ident()
+            try:
+                _ = self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield self
+                except BaseException:
+                    self._conn.rollback()
+                    raise
+                self._conn.commit()
+            finally:
+                self._tx_owner = None
+
+    def batch(self, statements: list[Statement], **_kwargs: Any) -> list[QueryResult]:
+        """Executa tudo numa transação só (1 commit / 1 fsync)."""
+        with self.transaction():
+            return [self.execute(sql, args) for sql, args in statements]
+
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]:
+        return self.batch([(sql, args) for args in args_list])
 
     def close(self) -> None:
         # Conexão reutilizada via pool — close() é no-op seguro.
         pass
 
     def close_hard(self) -> None:
-        self._conn.close()
+        self._closed = True
+        # Só fecha leitores ociosos; os emprestados fecham no _release_reader.
+        # Fechar conexão em uso noutra thread derruba o processo (segfault).
+        with self._readers_lock:
+            self._all_readers.clear()
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        if self._tx_owner == threading.get_ident():
+            self._conn.close()
+            return
+        # Espera a escrita em curso (ex.: migração do boot) terminar.
+        with self._lock:
+            self._conn.close()
 
 
 _client: Any = None
@@ -68,6 +384,7 @@ _client_lock = threading.Lock()
 _schema_ready = False
 _schema_lock = threading.Lock()
 _fts_ready = False
+_fts_trigram_ready = False
 _ssl_x509_relaxed = False
 _sentiment_cache: dict[str, tuple[float, str]] = {}
 _sentiment_cache_lock = threading.Lock()
@@ -92,6 +409,7 @@ class TursoProtocolError(RuntimeError):
 
 
 RESTORE_MAX_BYTES = 150 * 1024 * 1024
+_BACKUP_CHUNK = 256 * 1024
 _COPY_BATCH_SIZE = 200
 _SKIP_IMPORT_TABLES = frozenset(
     {
@@ -135,6 +453,8 @@ def using_local_sqlite() -> bool:
 def db_backend_label() -> str:
     if _use_local_db():
         return f"sqlite:{default_local_database_path()}"
+    if _read_replica_enabled():
+        return f"turso+replica:{default_replica_path()}"
     return "turso"
 
 
@@ -483,6 +803,15 @@ def _pipeline_result_to_query(result: dict[str, Any]) -> QueryResult:
     return QueryResult(rows)
 
 
+def _turso_stmt(sql: str, args: list[Any] | None) -> dict[str, Any]:
+    from libsql_client.hrana.convert import _stmt_to_proto
+
+    stmt = _stmt_to_proto(sql, args)
+    if not stmt.get("named_args"):
+        stmt.pop("named_args", None)
+    return stmt
+
+
 def _raise_pipeline_error(payload: Any) -> None:
     err = payload
     if isinstance(payload, dict):
@@ -503,6 +832,89 @@ def _raise_pipeline_error(payload: Any) -> None:
     raise wrapped
 
 
+class _HranaStream:
+    """Baton de um stream Hrana reaproveitado entre statements (request/job)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.baton: str | None = None
+        self.base_url: str | None = None
+        self.client: "TursoPipelineClient | None" = None
+        self.last_used = 0.0
+
+    def take(self, client: "TursoPipelineClient") -> tuple[str | None, str | None]:
+        """Baton atual, descartando-o se ficou ocioso ou é de outro cliente."""
+        if self.baton and (
+            self.client is not client or time.time() - self.last_used > _stream_idle_sec()
+        ):
+            _close_stream_async(self.client, self.baton, self.base_url)
+            self.reset()
+        return self.baton, self.base_url
+
+    def update(self, client: "TursoPipelineClient", baton: Any, base_url: Any) -> None:
+        # O baton só vale no cliente (URL/token) que abriu o stream.
+        self.client = client
+        self.baton = str(baton) if baton else None
+        if base_url:
+            self.base_url = str(base_url).rstrip("/")
+        self.last_used = time.time()
+
+    def reset(self) -> None:
+        self.baton = None
+        self.base_url = None
+        self.client = None
+
+
+_current_stream: contextvars.ContextVar[_HranaStream | None] = contextvars.ContextVar(
+    "turso_stream", default=None
+)
+_stream_closer: ThreadPoolExecutor | None = None
+_stream_closer_lock = threading.Lock()
+
+
+def _stream_reuse_enabled() -> bool:
+    return os.getenv("TURSO_STREAM_REUSE", "true").strip().lower() not in ("0", "false", "no")
+
+
+def _stream_idle_sec() -> float:
+    # O Turso expira streams ociosos em ~10s; renovar antes evita o erro + retry.
+    try:
+        return float(os.getenv("TURSO_STREAM_IDLE_SEC", "5"))
+    except ValueError:
+        return 5.0
+
+
+def _close_stream_async(
+    client: "TursoPipelineClient | None", baton: str | None, base_url: str | None
+) -> None:
+    """Fecha o stream fora do caminho da resposta (best-effort)."""
+    if not baton or client is None:
+        return
+    global _stream_closer
+    with _stream_closer_lock:
+        if _stream_closer is None:
+            _stream_closer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="turso-close")
+        executor = _stream_closer
+    _ = executor.submit(client.close_stream, baton, base_url)
+
+
+# Códigos Hrana de baton/stream expirado ou inválido (corpo 200 com ``error``
+# ou HTTP 400). Erro de SQL/validação não entra: refazer só repetiria a falha.
+_STREAM_ERROR_RE = re.compile(
+    r"\b(?:STREAM_EXPIRED|STREAM_CLOSED|STREAM_NOT_FOUND|BATON_[A-Z_]+)\b"
+    r"|invalid baton|baton (?:is )?invalid|stream (?:has )?expired",
+    re.IGNORECASE,
+)
+
+
+def _is_stream_error(exc: BaseException) -> bool:
+    # ``_raise_pipeline_error`` pode reembrulhar o erro; o código fica na causa.
+    return any(
+        e is not None and _STREAM_ERROR_RE.search(str(e)) is not None
+        for e in (exc, exc.__cause__)
+    )
+
+
 class TursoPipelineClient:
     """Cliente HTTP síncrono via Hrana ``/v2/pipeline``.
 
@@ -525,20 +937,47 @@ class TursoPipelineClient:
         verify = os.getenv("SSL_VERIFY", "true").strip().lower() not in ("0", "false", "no")
         self._session.verify = verify
 
-    def execute(self, sql: str, args: list[Any] | None = None, **_kwargs: Any) -> QueryResult:
-        from libsql_client.hrana.convert import _stmt_to_proto
-
-        stmt = _stmt_to_proto(sql, args)
-        if not stmt.get("named_args"):
-            stmt.pop("named_args", None)
-        body = {
-            "requests": [
-                {"type": "execute", "stmt": stmt},
-                {"type": "close"},
-            ]
-        }
+    def close_stream(self, baton: str, base_url: str | None = None) -> None:
+        url = f"{base_url}/v2/pipeline" if base_url else self._url
+        try:
+            _ = self._session.post(
+                url,
+                json={"baton": baton, "requests": [{"type": "close"}]},
+                timeout=self._timeout,
+            )
+        except Exception:
+            pass
+
+    def _post(self, requests_body: list[dict[str, Any]]) -> dict[str, Any]:
+        """Envia o pipeline e devolve a resposta do 1º request (erros → exceção).
+
+        Dentro de ``turso_session()`` o stream fica aberto e o baton devolvido
+        pelo servidor é reaproveitado no próximo statement; baton expirado ou
+        inválido cai para um stream novo, uma vez.
+        """
+        stream = _current_stream.get()
+        if stream is None:
+            return self._post_once({"requests": [*requests_body, {"type": "close"}]}, self._url)
+        with stream.lock:
+            baton, base_url = stream.take(self)
+            url = f"{base_url}/v2/pipeline" if base_url else self._url
+            body: dict[str, Any] = {"baton": baton, "requests": requests_body}
+            try:
+                return self._post_once(body, url, stream)
+            except Exception as exc:
+                if baton is None or not _is_stream_error(exc):
+                    raise
+                stream.reset()
+                return self._post_once({"baton": None, "requests": requests_body}, self._url, stream)
+
+    def _post_once(
+        self,
+        body: dict[str, Any],
+        url: str,
+        stream: _HranaStream | None = None,
+    ) -> dict[str, Any]:
         try:
-            resp = self._session.post(self._url, json=body, timeout=self._timeout)
+            resp = self._session.post(url, json=body, timeout=self._timeout)
         except requests.RequestException as exc:
             raise TursoProtocolError(f"falha de rede no pipeline: {exc}") from exc
 
@@ -556,6 +995,8 @@ class TursoPipelineClient:
         except ValueError as exc:
             raise TursoProtocolError("resposta Turso não-JSON") from exc
 
+        if stream is not None and isinstance(data, dict):
+            stream.update(self, data.get("baton"), data.get("base_url"))
         results = data.get("results") if isinstance(data, dict) else None
         if not isinstance(results, list) or not results:
             _raise_pipeline_error(data)
@@ -570,7 +1011,11 @@ class TursoPipelineClient:
         response = first.get("response") or first.get("result")
         if not isinstance(response, dict):
             _raise_pipeline_error(first)
+            raise TursoProtocolError("item de pipeline inválido")
+        return response
 
+    def execute(self, sql: str, args: list[Any] | None = None, **_kwargs: Any) -> QueryResult:
+        response = self._post([{"type": "execute", "stmt": _turso_stmt(sql, args)}])
         result = response.get("result") if response.get("type") in {None, "execute"} else None
         if result is None and "cols" in response:
             result = response
@@ -578,6 +1023,50 @@ class TursoPipelineClient:
             _raise_pipeline_error(response)
         return _pipeline_result_to_query(result)
 
+    def batch(self, statements: list[Statement], **_kwargs: Any) -> list[QueryResult]:
+        """Todos os statements num único ``batch`` Hrana, entre BEGIN/COMMIT.
+
+        Cada passo só roda se o anterior deu certo; se algo falhar o ROLLBACK
+        final desfaz o lote inteiro — 1 round trip, tudo ou nada.
+        """
+        if not statements:
+            return []
+        steps: list[dict[str, Any]] = [{"stmt": {"sql": "BEGIN"}}]
+        for sql, args in statements:
+            steps.append(
+                {
+                    "stmt": _turso_stmt(sql, args),
+                    "condition": {"type": "ok", "step": len(steps) - 1},
+                }
+            )
+        commit_step = len(steps)
+        steps.append(
+            {"stmt": {"sql": "COMMIT"}, "condition": {"type": "ok", "step": commit_step - 1}}
+        )
+        steps.append(
+            {
+                "stmt": {"sql": "ROLLBACK"},
+                "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+            }
+        )
+        response = self._post([{"type": "batch", "batch": {"steps": steps}}])
+        result = response.get("result") if isinstance(response.get("result"), dict) else response
+        step_errors = result.get("step_errors") or []
+        for err in step_errors[:commit_step + 1]:
+            if err:
+                _raise_pipeline_error({"error": err})
+        step_results = result.get("step_results") or []
+        out: list[QueryResult] = []
+        for idx in range(1, commit_step):
+            item = step_results[idx] if idx < len(step_results) else None
+            if not isinstance(item, dict):
+                raise TursoProtocolError("batch sem resultado de passo")
+            out.append(_pipeline_result_to_query(item))
+        return out
+
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]:
+        return self.batch([(sql, args) for args in args_list])
+
     def close(self) -> None:
         try:
             self._session.close()
@@ -630,23 +1119,60 @@ def _atomic_replace_sqlite(tmp_path: str, dest: str) -> None:
     os.replace(tmp_path, dest)
 
 
-def apply_sql_dump_to_sqlite(sql_text: str, dest_path: str) -> dict[str, Any]:
-    """Aplica dump SQL (Turso/SQLite) num arquivo novo, sem FTS legado."""
-    cleaned = _strip_fts_from_dump(sql_text)
+def _iter_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Quebra um dump em statements completos lendo linha a linha (sem carregar o arquivo)."""
+    buf: list[str] = []
+    for line in lines:
+        buf.append(line)
+        if not line.rstrip().endswith(";"):
+            continue
+        statement = "".join(buf)
+        # Trigger/string com ';' no meio: só fecha quando o SQLite diz que está completo.
+        if sqlite3.complete_statement(statement):
+            buf.clear()
+            yield statement
+    rest = "".join(buf).strip()
+    if rest:
+        yield rest
+
+
+_DUMP_TX_RE = re.compile(r"^(?:BEGIN(?:\s+\w+)?(?:\s+TRANSACTION)?|COMMIT(?:\s+TRANSACTION)?|END(?:\s+TRANSACTION)?)\s*;?$", re.IGNORECASE)
+
+
+def apply_sql_dump_lines(lines: Iterable[str], dest_path: str) -> dict[str, Any]:
+    """Aplica dump SQL statement a statement num arquivo novo, sem FTS legado.
+
+    Memória proporcional ao maior statement, não ao dump.
+    """
     dest_dir = os.path.dirname(dest_path) or "."
     os.makedirs(dest_dir, exist_ok=True)
     tmp = dest_path + ".importing"
     if os.path.exists(tmp):
         os.remove(tmp)
-    conn = sqlite3.connect(tmp)
+    conn = sqlite3.connect(tmp, isolation_level=None)
+    statements = 0
     try:
         _ = conn.execute("PRAGMA foreign_keys=OFF")
-        conn.executescript(cleaned)
+        # Uma transação só (1 sync no fim), com ou sem BEGIN/COMMIT no dump.
+        _ = conn.execute("BEGIN")
+        for raw in _iter_sql_statements(lines):
+            statement = _strip_fts_from_dump(raw).strip()
+            if not statement or statement == ";" or _DUMP_TX_RE.match(statement):
+                continue
+            try:
+                _ = conn.execute(statement)
+            except sqlite3.ProgrammingError:
+                # Mais de um statement na mesma linha (executescript faz COMMIT antes).
+                conn.executescript(statement)
+                if not conn.in_transaction:
+                    _ = conn.execute("BEGIN")
+            statements += 1
+        if conn.in_transaction:
+            conn.commit()
         try:
             _ = conn.execute("DROP TABLE IF EXISTS news_fts")
         except sqlite3.Error:
             pass
-        conn.commit()
     except sqlite3.Error as exc:
         conn.close()
         try:
@@ -656,41 +1182,191 @@ def apply_sql_dump_to_sqlite(sql_text: str, dest_path: str) -> dict[str, Any]:
         raise RuntimeError(f"dump SQL invalido: {exc}") from exc
     conn.close()
     _atomic_replace_sqlite(tmp, dest_path)
-    return {"bytes": os.path.getsize(dest_path)}
+    return {"bytes": os.path.getsize(dest_path), "statements": statements}
 
 
-def install_sqlite_bytes(data: bytes, dest_path: str) -> dict[str, Any]:
-    if not data.startswith(b"SQLite format 3"):
-        raise ValueError("arquivo nao e um banco SQLite")
-    dest_dir = os.path.dirname(dest_path) or "."
-    os.makedirs(dest_dir, exist_ok=True)
-    tmp = dest_path + ".importing"
-    with open(tmp, "wb") as handle:
-        handle.write(data)
-    _atomic_replace_sqlite(tmp, dest_path)
-    return {"bytes": len(data)}
+def apply_sql_dump_to_sqlite(sql_text: str, dest_path: str) -> dict[str, Any]:
+    """Aplica dump SQL (Turso/SQLite) num arquivo novo, sem FTS legado."""
+    return apply_sql_dump_lines(io.StringIO(sql_text), dest_path)
 
 
-def _maybe_gunzip(data: bytes) -> bytes:
-    if data[:2] == b"\x1f\x8b":
-        data = gzip.decompress(data)
-    if len(data) > RESTORE_MAX_BYTES:
-        raise ValueError("arquivo restaurado excede o limite")
-    return data
+class _LimitedReader(io.RawIOBase):
+    """Lê de ``raw`` e falha ao passar de ``limit`` bytes (vale para o gzip já expandido)."""
 
+    def __init__(self, raw: Any, limit: int):
+        self._raw = raw
+        self._limit = limit
+        self.total = 0
 
-def restore_sqlite_payload(data: bytes, dest_path: str) -> dict[str, Any]:
-    payload = _maybe_gunzip(data)
-    if payload.startswith(b"SQLite format 3"):
-        result = install_sqlite_bytes(payload, dest_path)
-        result["format"] = "sqlite"
-        return result
-    text = payload.decode("utf-8-sig")
-    result = apply_sql_dump_to_sqlite(text, dest_path)
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        n = self._raw.readinto(buffer) or 0
+        self.total += n
+        if self.total > self._limit:
+            raise ValueError("arquivo restaurado excede o limite")
+        return n
+
+
+def _restore_from_stream(stream: io.BufferedReader, dest_path: str) -> dict[str, Any]:
+    if stream.peek(16)[:15] == b"SQLite format 3":
+        dest_dir = os.path.dirname(dest_path) or "."
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp = dest_path + ".importing"
+        try:
+            with open(tmp, "wb") as handle:
+                shutil.copyfileobj(stream, handle, _BACKUP_CHUNK)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        _atomic_replace_sqlite(tmp, dest_path)
+        return {"bytes": os.path.getsize(dest_path), "format": "sqlite"}
+    if not stream.peek(1):
+        raise ValueError("arquivo vazio")
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    result = apply_sql_dump_lines(text, dest_path)
     result["format"] = "sql"
     return result
 
 
+def _open_restore_stream(raw: Any) -> io.BufferedReader:
+    """gzip (detectado pelo magic) é expandido aos poucos; o limite vale para o conteúdo."""
+    buffered = io.BufferedReader(raw, _BACKUP_CHUNK) if not hasattr(raw, "peek") else raw
+    source = gzip.GzipFile(fileobj=buffered) if buffered.peek(2)[:2] == b"\x1f\x8b" else buffered
+    return io.BufferedReader(_LimitedReader(source, RESTORE_MAX_BYTES), _BACKUP_CHUNK)
+
+
+def restore_sqlite_file(src_path: str, dest_path: str) -> dict[str, Any]:
+    """Restaura um upload já gravado em disco (.db/.sql, opcionalmente gzip) em memória constante."""
+    with open(src_path, "rb") as handle:
+        return _restore_from_stream(_open_restore_stream(handle), dest_path)
+
+
+def restore_sqlite_payload(data: bytes, dest_path: str) -> dict[str, Any]:
+    return _restore_from_stream(_open_restore_stream(io.BytesIO(data)), dest_path)
+
+
+def default_backup_dir() -> str:
+    """Snapshots .db.gz no volume quando SQLITE_BACKUP_DIR não foi definido."""
+    explicit = (os.getenv("SQLITE_BACKUP_DIR") or "").strip()
+    if explicit:
+        return explicit
+    vol = _volume_mount_path()
+    if vol:
+        return f"{vol}/backups"
+    return "backups"
+
+
+def _env_int(name: str, default: int, minimum: int = 1) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+class _BackupRestarted(Exception):
+    """Escritas concorrentes reiniciaram o backup incremental vezes demais."""
+
+
+def snapshot_sqlite(dest_path: str, *, src_path: str | None = None, pages: int | None = None) -> dict[str, Any]:
+    """Cópia consistente do SQLite em uso pela API de backup (``Connection.backup``).
+
+    Copia ``pages`` páginas por passo (SQLITE_BACKUP_PAGES, padrão 1024) e solta
+    o lock entre passos, então o writer segue gravando. Escrita de outra conexão
+    reinicia o backup; depois de 3 reinícios termina num passo só — uma
+    transação de leitura, que em WAL também não bloqueia o writer.
+    """
+    src = src_path or default_local_database_path()
+    if not os.path.isfile(src):
+        raise FileNotFoundError(src)
+    step = pages or _env_int("SQLITE_BACKUP_PAGES", 1024)
+    started = time.perf_counter()
+    restarts = 0
+    last_remaining: int | None = None
+
+    def _progress(_status: int, remaining: int, _total: int) -> None:
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > 3:
+                raise _BackupRestarted()
+        last_remaining = remaining
+
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    source = sqlite3.connect(src, timeout=30)
+    target = sqlite3.connect(dest_path)
+    try:
+        try:
+            source.backup(target, pages=step, progress=_progress, sleep=0.005)
+        except _BackupRestarted:
+            source.backup(target, pages=-1)
+        # Cópia autocontida: sem -wal ao lado do arquivo que vai ser baixado.
+        _ = target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+    return {
+        "bytes": os.path.getsize(dest_path),
+        "pages_per_step": step,
+        "restarts": restarts,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def iter_file_chunks(path: str, *, chunk_size: int = _BACKUP_CHUNK, remove_after: bool = False) -> Iterator[bytes]:
+    try:
+        with open(path, "rb") as handle:
+            while chunk := handle.read(chunk_size):
+                yield chunk
+    finally:
+        if remove_after:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def iter_gzip_file(path: str, *, chunk_size: int = _BACKUP_CHUNK, remove_after: bool = False) -> Iterator[bytes]:
+    """Comprime ``path`` em gzip por blocos — memória constante, qualquer tamanho."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in iter_file_chunks(path, chunk_size=chunk_size, remove_after=remove_after):
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def save_sqlite_backup(snapshot_path: str, *, backup_dir: str | None = None, keep: int | None = None) -> dict[str, Any]:
+    """Grava o snapshot como ``news-AAAAMMDD-HHMMSS.db.gz`` e mantém só os ``keep`` mais novos."""
+    folder = backup_dir or default_backup_dir()
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    dest = os.path.join(folder, f"news-{stamp}.db.gz")
+    tmp = dest + ".part"
+    with open(tmp, "wb") as handle:
+        for block in iter_gzip_file(snapshot_path):
+            handle.write(block)
+    os.replace(tmp, dest)
+
+    limit = keep or _env_int("SQLITE_BACKUP_KEEP", 7)
+    snapshots = sorted(
+        name for name in os.listdir(folder) if name.startswith("news-") and name.endswith(".db.gz")
+    )
+    removed = 0
+    for name in snapshots[:-limit]:
+        try:
+            os.remove(os.path.join(folder, name))
+            removed += 1
+        except OSError:
+            pass
+    return {"path": dest, "bytes": os.path.getsize(dest), "removed": removed}
+
+
 def fetch_turso_sql_dump(*, timeout_sec: float = 180.0) -> str:
     base = turso_http_base_url()
     token = (os.environ.get("TURSO_AUTH_TOKEN") or "").strip()
@@ -738,6 +1414,33 @@ def _should_skip_import_table(name: str) -> bool:
     return False
 
 
+def _iter_remote_rows(
+    remote: Any,
+    table: str,
+    col_list: str,
+    where: str = "",
+    params: list[Any] | None = None,
+    order_by: str = "",
+) -> Iterator[list[Any]]:
+    """Lê ``table`` do Turso em lotes de ``_COPY_BATCH_SIZE`` linhas."""
+    clause = f" WHERE {where}" if where else ""
+    order = f" ORDER BY {order_by}" if order_by else ""
+    offset = 0
+    while True:
+        sql = (
+            f'SELECT {col_list} FROM "{table}"{clause}{order} '
+            f"LIMIT {_COPY_BATCH_SIZE} OFFSET {offset}"
+        )
+        batch = remote.execute(sql, params) if params else remote.execute(sql)
+        rows = list(batch.rows or [])
+        if not rows:
+            break
+        yield rows
+        offset += _COPY_BATCH_SIZE
+        if len(rows) < _COPY_BATCH_SIZE:
+            break
+
+
 def copy_turso_tables_into_sqlite(dest_path: str) -> dict[str, Any]:
     """Copia tabelas do Turso para um SQLite novo (quando /dump falha)."""
     remote = _turso_client_for_import()
@@ -772,20 +1475,10 @@ def copy_turso_tables_into_sqlite(dest_path: str) -> dict[str, Any]:
             insert_sql = (
                 f'INSERT OR REPLACE INTO "{table}" ({col_list}) VALUES ({placeholders})'
             )
-            offset = 0
             total = 0
-            while True:
-                batch = remote.execute(
-                    f'SELECT {col_list} FROM "{table}" LIMIT {_COPY_BATCH_SIZE} OFFSET {offset}'
-                )
-                rows = list(batch.rows or [])
-                if not rows:
-                    break
+            for rows in _iter_remote_rows(remote, table, col_list):
                 local.executemany(insert_sql, rows)
                 total += len(rows)
-                offset += _COPY_BATCH_SIZE
-                if len(rows) < _COPY_BATCH_SIZE:
-                    break
             copied[table] = total
         try:
             seq = remote.execute("SELECT name, seq FROM sqlite_sequence")
@@ -876,10 +1569,15 @@ def import_turso_into_sqlite(
 
 def reset_db_client() -> None:
     """Fecha e descarta o client global (força reconexão no próximo get_db)."""
-    global _client, _schema_ready, _fts_ready
+    global _client, _schema_ready, _fts_ready, _fts_trigram_ready, _link_index
     _schema_ready = False
     _fts_ready = False
+    _fts_trigram_ready = False
+    _link_index = None
     reset_turso_circuit()
+    with _snapshot_cache_lock:
+        _snapshot_ids.clear()
+        _snapshot_payloads.clear()
     with _client_lock:
         old = _client
         _client = None
@@ -895,6 +1593,56 @@ def reset_db_client() -> None:
         pass
 
 
+def _inner_batch(inner: Any, statements: list[Statement]) -> list[QueryResult]:
+    batch = getattr(inner, "batch", None)
+    if isinstance(inner, TursoPipelineClient) and callable(batch):
+        return batch(statements)
+    return [
+        _as_query_result(inner.execute(sql) if args is None else inner.execute(sql, args))
+        for sql, args in statements
+    ]
+
+
+class _BufferedTransaction:
+    """Transação do Turso sem sessão interativa: acumula as escritas e envia
+    tudo num ``batch`` atômico ao sair do bloco.
+
+    Leituras dentro do bloco vão direto ao banco e não enxergam as escritas
+    pendentes — use para lotes de INSERT/UPDATE que não dependem entre si.
+    """
+
+    def __init__(self, client: "PooledClient"):
+        self._client = client
+        self._pending: list[Statement] = []
+
+    def __enter__(self) -> "_BufferedTransaction":
+        return self
+
+    def __exit__(self, exc_type: Any, _exc: Any, _tb: Any) -> None:
+        pending, self._pending = self._pending, []
+        if exc_type is None and pending:
+            _ = self._client.batch(pending)
+
+    def execute(self, sql: str, args: list[Any] | None = None, **kwargs: Any) -> QueryResult:
+        if _is_read_statement(sql):
+            return self._client.execute(sql, args, **kwargs)
+        self._pending.append((sql, args))
+        return QueryResult([])
+
+    def batch(self, statements: list[Statement], **_kwargs: Any) -> list[QueryResult]:
+        self._pending.extend(statements)
+        return [QueryResult([]) for _ in statements]
+
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]:
+        return self.batch([(sql, args) for args in args_list])
+
+    def transaction(self) -> "_BufferedTransaction":
+        return self
+
+    def close(self) -> None:
+        pass
+
+
 class PooledClient:
     """Proxy que reutiliza o client remoto sem fechar a cada request."""
 
@@ -928,6 +1676,37 @@ class PooledClient:
         *,
         max_attempts: int | None = None,
     ) -> QueryResult:
+        with _timed_query(sql) as rows:
+            if args is None:
+                result = self._run(lambda inner: _as_query_result(inner.execute(sql)), max_attempts)
+            else:
+                result = self._run(
+                    lambda inner: _as_query_result(inner.execute(sql, args)), max_attempts
+                )
+            rows[0] = len(result.rows)
+        return result
+
+    def batch(
+        self,
+        statements: list[Statement],
+        *,
+        max_attempts: int | None = None,
+    ) -> list[QueryResult]:
+        if not statements:
+            return []
+        label = f"BATCH[{len(statements)}] {statements[0][0]}"
+        with _timed_query(label) as rows:
+            results = self._run(lambda inner: _inner_batch(inner, statements), max_attempts)
+            rows[0] = sum(len(r.rows) for r in results)
+        return results
+
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]:
+        return self.batch([(sql, args) for args in args_list])
+
+    def transaction(self) -> "_BufferedTransaction":
+        return _BufferedTransaction(self)
+
+    def _run(self, call: Callable[[Any], _T], max_attempts: int | None) -> _T:
         # Defaults curtos: páginas de artigo fazem várias queries; backoff longo
         # (ex.: 1.5+3+6s × N queries) vira timeout de request mesmo com fail-soft.
         # Enrichment opcional deve passar max_attempts=1.
@@ -941,10 +1720,7 @@ class PooledClient:
         for attempt in range(1, attempts + 1):
             inner = self._inner
             try:
-                if args is None:
-                    result = _as_query_result(inner.execute(sql))
-                else:
-                    result = _as_query_result(inner.execute(sql, args))
+                result = call(inner)
                 _turso_circuit.success()
                 return result
             except TursoQuotaError as exc:
@@ -1006,24 +1782,322 @@ class PooledClient:
             pass
 
 
-def _create_client() -> LocalDbClient | PooledClient:
-    if _use_local_db():
-        path = default_local_database_path()
-        return LocalDbClient(path)
+_WRITE_TABLE_RE = re.compile(
+    r"^\s*(?:(INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)"
+    r"\s+[\"'`\[]?([A-Za-z_][A-Za-z0-9_]*)",
+    re.IGNORECASE,
+)
+_ISO_TS_LIKE = "____-__-__%"
+_RETURNING_RE = re.compile(r"\bRETURNING\b", re.IGNORECASE)
+# Chaves por SELECT ao reler linhas tocadas (abaixo do limite de parâmetros do SQLite).
+_REPLICA_KEY_CHUNK = 200
 
-    _configure_ssl_certs()
 
-    url = os.environ.get("TURSO_DATABASE_URL", "")
-    # Preferir HTTPS: o handshake WSS do Hrana falha em alguns ambientes
-    # (proxy/antivírus). O cliente HTTP do libsql_client é equivalente.
-    if url.startswith("libsql://"):
-        url = "https://" + url[len("libsql://") :]
-    elif url.startswith("wss://"):
-        url = "https://" + url[len("wss://") :]
-    elif url.startswith("ws://"):
-        url = "http://" + url[len("ws://") :]
+def _read_replica_enabled() -> bool:
+    return os.getenv("DB_READ_REPLICA", "").strip().lower() in ("1", "true", "yes")
 
-    token = os.environ.get("TURSO_AUTH_TOKEN")
+
+def default_replica_path() -> str:
+    """Réplica de leitura do Turso no volume quando LOCAL_REPLICA_PATH não foi definido."""
+    explicit = (os.getenv("LOCAL_REPLICA_PATH") or "").strip()
+    if explicit:
+        return explicit
+    vol = _volume_mount_path()
+    if vol:
+        return f"{vol}/replica.db"
+    return "replica.db"
+
+
+def _replica_refresh_sec() -> float:
+    try:
+        return float(os.getenv("REPLICA_REFRESH_SEC", "30"))
+    except ValueError:
+        return 30.0
+
+
+class ReplicaClient:
+    """Turso como fonte da verdade, leituras num SQLite local (réplica).
+
+    SELECTs vão para a réplica no volume — latência de disco, sem gastar cota
+    de leitura do Turso. Escritas vão para o Turso com ``RETURNING`` da chave
+    primária: as linhas tocadas (INSERT, upsert, REPLACE, UPDATE, DELETE) são
+    relidas por chave, uma vez por tabela e por lote, e as que sumiram no Turso
+    saem da réplica. DDL, ``WITH … INSERT`` e tabelas sem PK repetem o
+    statement localmente.
+
+    A cada ``REPLICA_REFRESH_SEC`` um refresh em segundo plano puxa ``id`` novos
+    e ``updated_at`` (ISO) mais recentes — cobre INSERTs e edições com
+    ``updated_at`` de outros processos. Limites: DELETE, UPDATE sem
+    ``updated_at`` e efeitos de trigger/cascata feitos fora deste client só
+    aparecem quando a linha é escrita de novo por aqui ou numa cópia nova
+    (apagar o arquivo da réplica).
+    """
+
+    def __init__(self, remote: Any, path: str):
+        self.remote = remote
+        self.path = path
+        self.local: LocalDbClient | None = None
+        self._columns: dict[str, list[str]] = {}
+        self._keys: dict[str, list[str]] = {}
+        self._refresh_lock = threading.Lock()
+        self._next_refresh = time.time() + _replica_refresh_sec()
+        self._bootstrap()
+
+    def _bootstrap(self) -> None:
+        try:
+            if not _sqlite_file_has_news(self.path):
+                print(f"   [db] réplica: cópia inicial do Turso em {self.path}", flush=True)
+                _ = copy_turso_tables_into_sqlite(self.path)
+            self.local = LocalDbClient(self.path)
+        except Exception as exc:
+            # Sem réplica o client segue funcional: leituras voltam para o Turso.
+            print(f"Aviso: réplica local indisponível ({type(exc).__name__}: {exc})", flush=True)
+            self.local = None
+
+    def _table_columns(self, table: str) -> list[str]:
+        cols = self._columns.get(table)
+        if cols is None and self.local is not None:
+            info = self.local.execute(f'PRAGMA table_info("{table}")')
+            cols = [str(row[1]) for row in info.rows if row and row[1]]
+            self._columns[table] = cols
+        return cols or []
+
+    def _table_key(self, table: str) -> list[str]:
+        """Colunas da PK de ``table`` na réplica ([] = sem chave utilizável)."""
+        key = self._keys.get(table)
+        if key is None and self.local is not None:
+            info = self.local.execute(f'PRAGMA table_info("{table}")')
+            pk = sorted((int(row[5]), str(row[1])) for row in info.rows if row and int(row[5] or 0) > 0)
+            key = [name for _, name in pk]
+            self._keys[table] = key
+        return key or []
+
+    def _pull(self, table: str, where: str, params: list[Any], order_by: str) -> int:
+        cols = self._table_columns(table)
+        if not cols or self.local is None:
+            return 0
+        col_list = ", ".join(f'"{c}"' for c in cols)
+        placeholders = ", ".join("?" for _ in cols)
+        insert_sql = f'INSERT OR REPLACE INTO "{table}" ({col_list}) VALUES ({placeholders})'
+        total = 0
+        for rows in _iter_remote_rows(self.remote, table, col_list, where, params, order_by):
+            _ = self.local.execute_many(insert_sql, [list(r) for r in rows])
+            total += len(rows)
+        return total
+
+    def refresh_table(self, table: str) -> int:
+        """Puxa do Turso as linhas acima dos watermarks locais de ``table``."""
+        if self.local is None or _should_skip_import_table(table):
+            return 0
+        cols = self._table_columns(table)
+        pulled = 0
+        if "id" in cols:
+            row = self.local.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"')
+            max_id = int(row.rows[0][0]) if row.rows else 0
+            pulled += self._pull(table, "id > ?", [max_id], "id")
+        if "updated_at" in cols:
+            row = self.local.execute(
+                f'SELECT MAX(updated_at) FROM "{table}" WHERE updated_at LIKE ?',
+                [_ISO_TS_LIKE],
+            )
+            mark = row.rows[0][0] if row.rows else None
+            if mark:
+                pulled += self._pull(
+                    table,
+                    "updated_at LIKE ? AND updated_at > ?",
+                    [_ISO_TS_LIKE, str(mark)],
+                    "id" if "id" in cols else "",
+                )
+        return pulled
+
+    def refresh(self) -> dict[str, int]:
+        """Refresh incremental de todas as tabelas copiadas."""
+        if self.local is None:
+            return {}
+        pulled: dict[str, int] = {}
+        with self._refresh_lock:
+            names = self.local.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+            )
+            for (name,) in names.rows:
+                table = str(name)
+                if _should_skip_import_table(table):
+                    continue
+                try:
+                    n = self.refresh_table(table)
+                except Exception as exc:
+                    print(f"Aviso: refresh réplica {table}: {type(exc).__name__}: {exc}", flush=True)
+                    continue
+                if n:
+                    pulled[table] = n
+        return pulled
+
+    def _maybe_schedule_refresh(self) -> None:
+        now = time.time()
+        if now < self._next_refresh or self._refresh_lock.locked():
+            return
+        self._next_refresh = now + _replica_refresh_sec()
+
+        def _run() -> None:
+            try:
+                _ = self.refresh()
+            except Exception as exc:
+                print(f"Aviso: refresh réplica falhou: {type(exc).__name__}: {exc}", flush=True)
+
+        threading.Thread(target=_run, daemon=True, name="replica-refresh").start()
+
+    def _tracked(self, sql: str) -> tuple[str, str | None, bool]:
+        """``sql`` com ``RETURNING`` da PK da tabela escrita.
+
+        Devolve ``(sql, tabela, já_tinha_returning)``; tabela ``None`` quando a
+        escrita não dá para seguir por chave e é repetida na réplica.
+        """
+        if self.local is None:
+            return sql, None, False
+        match = _WRITE_TABLE_RE.match(sql)
+        table = match.group(2) if match else None
+        if table is None or _should_skip_import_table(table):
+            return sql, None, False
+        key = self._table_key(table)
+        if not key:
+            return sql, None, False
+        body = sql.rstrip().rstrip(";").rstrip()
+        key_cols = ", ".join(f'"{c}"' for c in key)
+        if _RETURNING_RE.search(_FP_STRING_RE.sub("''", body)):
+            return f"{body}, {key_cols}", table, True
+        return f"{body} RETURNING {key_cols}", table, False
+
+    def _replay(self, sql: str, args: list[Any] | None) -> None:
+        if self.local is None:
+            return
+        try:
+            _ = self.local.execute(sql, args)
+            if not _WRITE_TABLE_RE.match(sql):
+                self._columns.clear()
+                self._keys.clear()
+        except Exception as exc:
+            print(
+                f"Aviso: réplica não aplicou escrita ({type(exc).__name__}): {sql_fingerprint(sql)[:120]}",
+                flush=True,
+            )
+
+    def _sync_keys(self, table: str, keys: set[tuple[Any, ...]]) -> None:
+        """Copia do Turso as linhas de ``keys``; as que não existem mais lá saem da réplica."""
+        cols = self._table_columns(table)
+        key = self._table_key(table)
+        if self.local is None or not keys or not cols or not key:
+            return
+        col_list = ", ".join(f'"{c}"' for c in cols)
+        if len(key) == 1:
+            key_expr, row_marks = f'"{key[0]}"', "?"
+        else:
+            key_expr = "(" + ", ".join(f'"{c}"' for c in key) + ")"
+            row_marks = "(" + ", ".join("?" for _ in key) + ")"
+        pending = list(keys)
+        rows: list[list[Any]] = []
+        for start in range(0, len(pending), _REPLICA_KEY_CHUNK):
+            chunk = pending[start : start + _REPLICA_KEY_CHUNK]
+            marks = ", ".join(row_marks for _ in chunk)
+            where = f"{key_expr} IN ({marks})" if len(key) == 1 else f"{key_expr} IN (VALUES {marks})"
+            result = self.remote.execute(
+                f'SELECT {col_list} FROM "{table}" WHERE {where}',
+                [v for k in chunk for v in k],
+            )
+            rows.extend(list(r) for r in result.rows or [])
+        positions = [cols.index(c) for c in key]
+        found = {tuple(r[i] for i in positions) for r in rows}
+        placeholders = ", ".join("?" for _ in cols)
+        insert_sql = f'INSERT OR REPLACE INTO "{table}" ({col_list}) VALUES ({placeholders})'
+        delete_sql = f'DELETE FROM "{table}" WHERE ' + " AND ".join(f'"{c}" = ?' for c in key)
+        _ = self.local.batch(
+            [
+                *((insert_sql, r) for r in rows),
+                *((delete_sql, list(k)) for k in pending if k not in found),
+            ]
+        )
+
+    def _write(
+        self,
+        statements: list[Statement],
+        run: Callable[[list[Statement]], list[QueryResult]],
+    ) -> list[QueryResult]:
+        """Grava no Turso e espelha na réplica as linhas tocadas, por chave."""
+        plan = [self._tracked(sql) for sql, _ in statements]
+        results = run([(tracked, args) for (tracked, _, _), (_, args) in zip(plan, statements)])
+        touched: dict[str, set[tuple[Any, ...]]] = {}
+        out: list[QueryResult] = []
+        for (sql, args), (_, table, had_returning), result in zip(statements, plan, results):
+            if table is None:
+                self._replay(sql, args)
+                out.append(result)
+                continue
+            width = len(self._table_key(table))
+            rows = [tuple(r) for r in result.rows or []]
+            touched.setdefault(table, set()).update(r[-width:] for r in rows)
+            # O chamador recebe só o RETURNING que pediu.
+            out.append(QueryResult([r[:-width] for r in rows] if had_returning else []))
+        for table, keys in touched.items():
+            try:
+                self._sync_keys(table, keys)
+            except Exception as exc:
+                print(f"Aviso: réplica não copiou {table} ({type(exc).__name__}: {exc})", flush=True)
+        return out
+
+    def execute(self, sql: str, args: list[Any] | None = None, **kwargs: Any) -> QueryResult:
+        if self.local is not None and _is_read_statement(sql):
+            self._maybe_schedule_refresh()
+            return self.local.execute(sql, args)
+        if _is_read_statement(sql):
+            return self.remote.execute(sql, args, **kwargs)
+        return self._write(
+            [(sql, args)],
+            lambda stmts: [self.remote.execute(stmts[0][0], stmts[0][1], **kwargs)],
+        )[0]
+
+    def batch(self, statements: list[Statement], **kwargs: Any) -> list[QueryResult]:
+        if not statements:
+            return []
+        return self._write(statements, lambda stmts: self.remote.batch(stmts, **kwargs))
+
+    def execute_many(self, sql: str, args_list: list[list[Any]]) -> list[QueryResult]:
+        return self.batch([(sql, args) for args in args_list])
+
+    def transaction(self) -> "_BufferedTransaction":
+        return _BufferedTransaction(self)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        pass
+
+    def close_hard(self) -> None:
+        try:
+            self.remote.close_hard()
+        except Exception:
+            pass
+        if self.local is not None:
+            try:
+                self.local.close_hard()
+            except Exception:
+                pass
+
+
+def _create_client() -> LocalDbClient | PooledClient:
+    if _use_local_db():
+        path = default_local_database_path()
+        return LocalDbClient(path)
+
+    _configure_ssl_certs()
+
+    url = os.environ.get("TURSO_DATABASE_URL", "")
+    # Preferir HTTPS: o handshake WSS do Hrana falha em alguns ambientes
+    # (proxy/antivírus). O cliente HTTP do libsql_client é equivalente.
+    if url.startswith("libsql://"):
+        url = "https://" + url[len("libsql://") :]
+    elif url.startswith("wss://"):
+        url = "https://" + url[len("wss://") :]
+    elif url.startswith("ws://"):
+        url = "http://" + url[len("ws://") :]
+
+    token = os.environ.get("TURSO_AUTH_TOKEN")
     if not url or not token:
         raise DatabaseConfigError(
             "Banco nao configurado. Na Railway, use USE_LOCAL_DB=true "
@@ -1033,7 +2107,7 @@ def _create_client() -> LocalDbClient | PooledClient:
     return PooledClient(TursoPipelineClient(url, token))
 
 
-def get_db() -> LocalDbClient | PooledClient:
+def get_db() -> LocalDbClient | PooledClient | ReplicaClient:
     """Reutiliza um único client global.
 
     Um client por thread vazava sessões aiohttp: as threads do pool do FastAPI
@@ -1045,237 +2119,584 @@ def get_db() -> LocalDbClient | PooledClient:
     if _client is None:
         with _client_lock:
             if _client is None:
-                _client = _create_client()
+                client = _create_client()
+                if isinstance(client, PooledClient) and _read_replica_enabled():
+                    client = ReplicaClient(client, default_replica_path())
+                _client = client
     return _client
 
 
-def ensure_schema(client: DbClient, *, force: bool = False) -> None:
-    global _schema_ready
-    if _schema_ready and not force:
+def _supports_batch(client: Any) -> bool:
+    return isinstance(client, (LocalDbClient, PooledClient, ReplicaClient, _BufferedTransaction))
+
+
+def run_batch(
+    client: Any,
+    statements: list[Statement],
+    *,
+    max_attempts: int | None = None,
+) -> list[QueryResult]:
+    """Executa ``statements`` de forma atômica quando o client suporta lote.
+
+    SQLite local: 1 BEGIN/COMMIT. Turso: 1 request ``/v2/pipeline``. Clients
+    sem ``batch`` (mocks, wrappers) caem no loop de ``execute``.
+    ``max_attempts`` vai para o retry do ``PooledClient`` (1 = fail-fast).
+    """
+    if not statements:
+        return []
+    if _supports_batch(client):
+        return client.batch(statements, max_attempts=max_attempts)
+    return [_as_query_result(client.execute(sql, args)) for sql, args in statements]
+
+
+def run_returning(client: Any, statements: list[Statement]) -> list[list[tuple[Any, ...]]]:
+    """``run_batch`` para escritas com ``RETURNING``: devolve as linhas de cada statement.
+
+    Mesmo custo do lote atômico (1 fsync local, 1 round trip no Turso), mas o
+    resultado é usado na hora — por isso não aceita a transação bufferizada do
+    Turso, que só envia o lote no fim do bloco e devolveria linhas vazias.
+    """
+    if isinstance(client, _BufferedTransaction):
+        raise RuntimeError("run_returning não roda dentro de transação bufferizada")
+    return [list(result.rows) for result in run_batch(client, statements)]
+
+
+@contextmanager
+def transaction(client: Any = None) -> Iterator[Any]:
+    """``with db.transaction(client) as tx:`` — escritas em ``tx`` viram um commit só."""
+    target = client if client is not None else get_db()
+    if not _supports_batch(target):
+        yield target
         return
+    with target.transaction() as tx:
+        yield tx
 
-    with _schema_lock:
-        if _schema_ready and not force:
-            return
 
+@contextmanager
+def turso_session(client: Any = None) -> Iterator[None]:
+    """Reaproveita um stream Hrana (baton) em todas as queries do bloco.
+
+    Uma página de artigo faz 6–8 queries; sem sessão cada uma abre e fecha
+    um stream no Turso. No SQLite local (ou ``TURSO_STREAM_REUSE=false``) é
+    no-op. Sessões aninhadas reaproveitam a externa; o stream é fechado em
+    segundo plano ao sair.
+    """
+    if _current_stream.get() is not None or not _stream_reuse_enabled():
+        yield
+        return
+    target = client if client is not None else _client
+    if isinstance(target, LocalDbClient) or (target is None and _use_local_db()):
+        yield
+        return
+    stream = _HranaStream()
+    token = _current_stream.set(stream)
+    try:
+        yield
+    finally:
+        _current_stream.reset(token)
+        with stream.lock:
+            _close_stream_async(stream.client, stream.baton, stream.base_url)
+            stream.reset()
+
+
+def _migration_baseline(client: DbClient) -> None:
+    """Schema histórico (antes do registro de versões) — tudo idempotente."""
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS news (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT,
+            resumo TEXT,
+            impacto TEXT,
+            link TEXT,
+            tag TEXT
+        )
+    """)
+    for col, col_type in [
+        ("sentimento", "TEXT"),
+        ("published_at", "TEXT"),
+        ("fonte", "TEXT"),
+        ("dados_mercado", "TEXT"),
+        ("contexto_editorial", "TEXT"),
+        ("created_at", "TEXT"),
+        ("imagem_url", "TEXT"),
+        ("conteudo_extra", "TEXT"),
+        ("updated_at", "TEXT"),
+        ("versao_analise", "INTEGER"),
+        ("home_priority", "INTEGER"),
+        ("titulo_en", "TEXT"),
+        ("resumo_en", "TEXT"),
+        ("titulo_ja", "TEXT"),
+        ("resumo_ja", "TEXT"),
+        ("author_id", "INTEGER"),
+        ("content_origin", "TEXT"),
+        ("moderation_status", "TEXT"),
+        ("boost_until", "TEXT"),
+    ]:
         try:
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS news (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    titulo TEXT,
-                    resumo TEXT,
-                    impacto TEXT,
-                    link TEXT,
-                    tag TEXT
-                )
-            """)
-            for col, col_type in [
-                ("sentimento", "TEXT"),
-                ("published_at", "TEXT"),
-                ("fonte", "TEXT"),
-                ("dados_mercado", "TEXT"),
-                ("contexto_editorial", "TEXT"),
-                ("created_at", "TEXT"),
-                ("imagem_url", "TEXT"),
-                ("conteudo_extra", "TEXT"),
-                ("updated_at", "TEXT"),
-                ("versao_analise", "INTEGER"),
-                ("home_priority", "INTEGER"),
-                ("titulo_en", "TEXT"),
-                ("resumo_en", "TEXT"),
-                ("titulo_ja", "TEXT"),
-                ("resumo_ja", "TEXT"),
-                ("author_id", "INTEGER"),
-                ("content_origin", "TEXT"),
-                ("moderation_status", "TEXT"),
-                ("boost_until", "TEXT"),
-            ]:
-                try:
-                    _ = client.execute(f"ALTER TABLE news ADD COLUMN {col} {col_type}")
-                except Exception:
-                    pass
+            _ = client.execute(f"ALTER TABLE news ADD COLUMN {col} {col_type}")
+        except Exception:
+            pass
 
-            try:
-                _ = client.execute("""
-                    UPDATE news
-                    SET created_at = published_at
-                    WHERE (created_at IS NULL OR created_at = '')
-                      AND published_at IS NOT NULL AND published_at != ''
-                """)
-            except Exception as exc:
-                print(f"Aviso: backfill created_at: {exc}", flush=True)
+    try:
+        _ = client.execute("""
+            UPDATE news
+            SET created_at = published_at
+            WHERE (created_at IS NULL OR created_at = '')
+              AND published_at IS NOT NULL AND published_at != ''
+        """)
+    except Exception as exc:
+        print(f"Aviso: backfill created_at: {exc}", flush=True)
 
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS newsletter_subscribers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    email TEXT UNIQUE NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            """)
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS newsletter_subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
 
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS newsletter_alert_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    news_id INTEGER NOT NULL UNIQUE,
-                    sent_at TEXT NOT NULL
-                )
-            """)
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS newsletter_alert_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            news_id INTEGER NOT NULL UNIQUE,
+            sent_at TEXT NOT NULL
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS macro_watch_state (
+            key TEXT PRIMARY KEY NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT,
+            google_id TEXT,
+            avatar_url TEXT,
+            created_at TEXT NOT NULL,
+            consent_at TEXT,
+            email_verified INTEGER NOT NULL DEFAULT 0,
+            email_verify_token TEXT,
+            email_verify_sent_at TEXT
+        )
+    """)
+    for col, col_type in (
+        ("google_id", "TEXT"),
+        ("avatar_url", "TEXT"),
+        ("consent_at", "TEXT"),
+        ("password_hash", "TEXT"),
+        # DEFAULT 1 no ALTER: contas já existentes ficam verificadas (grandfather).
+        ("email_verified", "INTEGER DEFAULT 1"),
+        ("email_verify_token", "TEXT"),
+        ("email_verify_sent_at", "TEXT"),
+        ("role", "TEXT"),
+        ("pix_key", "TEXT"),
+    ):
+        try:
+            _ = client.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
+        except Exception:
+            pass
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS columnist_applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            pitch TEXT NOT NULL,
+            status TEXT NOT NULL,
+            admin_note TEXT,
+            created_at TEXT NOT NULL,
+            reviewed_at TEXT
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS page_views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            news_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            viewer_hash TEXT NOT NULL,
+            viewer_user_id INTEGER,
+            day TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            UNIQUE(news_id, viewer_hash, day)
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS wallet_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount_brl REAL NOT NULL,
+            news_id INTEGER,
+            meta_json TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS payout_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount_brl REAL NOT NULL,
+            pix_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            admin_note TEXT,
+            created_at TEXT NOT NULL,
+            reviewed_at TEXT
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS boost_orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            news_id INTEGER NOT NULL,
+            plan_id TEXT NOT NULL,
+            amount_brl REAL NOT NULL,
+            status TEXT NOT NULL,
+            external_ref TEXT UNIQUE,
+            mp_payment_id TEXT,
+            boost_until TEXT,
+            created_at TEXT NOT NULL,
+            paid_at TEXT
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            news_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            consent_at TEXT,
+            ip_hash TEXT,
+            geo_country TEXT,
+            upvotes INTEGER DEFAULT 0
+        )
+    """)
+
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS comment_votes (
+            comment_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (comment_id, user_id)
+        )
+    """)
+
+    # Índices para listagens / filtros da home, relacionados e dedupe.
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_news_id_desc ON news(id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_news_tag_id ON news(tag, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_news_link ON news(link)",
+        "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)",
+        "CREATE INDEX IF NOT EXISTS idx_users_google ON users(google_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_verify_token ON users(email_verify_token)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_news ON comments(news_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_news_author ON news(author_id, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_news_moderation ON news(moderation_status, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_page_views_day ON page_views(day, author_id)",
+        "CREATE INDEX IF NOT EXISTS idx_wallet_user ON wallet_ledger(user_id, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_boost_ref ON boost_orders(external_ref)",
+    ):
+        try:
+            _ = client.execute(sql)
+        except Exception:
+            pass
 
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS macro_watch_state (
-                    key TEXT PRIMARY KEY NOT NULL,
-                    value TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT,
-                    google_id TEXT,
-                    avatar_url TEXT,
-                    created_at TEXT NOT NULL,
-                    consent_at TEXT,
-                    email_verified INTEGER NOT NULL DEFAULT 0,
-                    email_verify_token TEXT,
-                    email_verify_sent_at TEXT
-                )
-            """)
-            for col, col_type in (
-                ("google_id", "TEXT"),
-                ("avatar_url", "TEXT"),
-                ("consent_at", "TEXT"),
-                ("password_hash", "TEXT"),
-                # DEFAULT 1 no ALTER: contas já existentes ficam verificadas (grandfather).
-                ("email_verified", "INTEGER DEFAULT 1"),
-                ("email_verify_token", "TEXT"),
-                ("email_verify_sent_at", "TEXT"),
-                ("role", "TEXT"),
-                ("pix_key", "TEXT"),
-            ):
-                try:
-                    _ = client.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
-                except Exception:
-                    pass
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS columnist_applications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    pitch TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    admin_note TEXT,
-                    created_at TEXT NOT NULL,
-                    reviewed_at TEXT
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS page_views (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    news_id INTEGER NOT NULL,
-                    author_id INTEGER NOT NULL,
-                    viewer_hash TEXT NOT NULL,
-                    viewer_user_id INTEGER,
-                    day TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    UNIQUE(news_id, viewer_hash, day)
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS wallet_ledger (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    kind TEXT NOT NULL,
-                    amount_brl REAL NOT NULL,
-                    news_id INTEGER,
-                    meta_json TEXT,
-                    created_at TEXT NOT NULL
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS payout_requests (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    amount_brl REAL NOT NULL,
-                    pix_key TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    admin_note TEXT,
-                    created_at TEXT NOT NULL,
-                    reviewed_at TEXT
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS boost_orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    news_id INTEGER NOT NULL,
-                    plan_id TEXT NOT NULL,
-                    amount_brl REAL NOT NULL,
-                    status TEXT NOT NULL,
-                    external_ref TEXT UNIQUE,
-                    mp_payment_id TEXT,
-                    boost_until TEXT,
-                    created_at TEXT NOT NULL,
-                    paid_at TEXT
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS comments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    news_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    parent_id INTEGER,
-                    body TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    consent_at TEXT,
-                    ip_hash TEXT,
-                    geo_country TEXT,
-                    upvotes INTEGER DEFAULT 0
-                )
-            """)
-
-            _ = client.execute("""
-                CREATE TABLE IF NOT EXISTS comment_votes (
-                    comment_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    created_at TEXT NOT NULL,
-                    PRIMARY KEY (comment_id, user_id)
-                )
-            """)
-
-            # Índices para listagens / filtros da home, relacionados e dedupe.
-            for sql in (
-                "CREATE INDEX IF NOT EXISTS idx_news_id_desc ON news(id DESC)",
-                "CREATE INDEX IF NOT EXISTS idx_news_tag_id ON news(tag, id DESC)",
-                "CREATE INDEX IF NOT EXISTS idx_news_link ON news(link)",
-                "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)",
-                "CREATE INDEX IF NOT EXISTS idx_users_google ON users(google_id)",
-                "CREATE INDEX IF NOT EXISTS idx_users_verify_token ON users(email_verify_token)",
-                "CREATE INDEX IF NOT EXISTS idx_comments_news ON comments(news_id, id)",
-                "CREATE INDEX IF NOT EXISTS idx_news_author ON news(author_id, id DESC)",
-                "CREATE INDEX IF NOT EXISTS idx_news_moderation ON news(moderation_status, id DESC)",
-                "CREATE INDEX IF NOT EXISTS idx_page_views_day ON page_views(day, author_id)",
-                "CREATE INDEX IF NOT EXISTS idx_wallet_user ON wallet_ledger(user_id, id DESC)",
-                "CREATE INDEX IF NOT EXISTS idx_boost_ref ON boost_orders(external_ref)",
-            ):
-                try:
-                    _ = client.execute(sql)
-                except Exception:
-                    pass
 
+def _migration_news_published_ts(client: DbClient) -> None:
+    try:
+        _ = client.execute("ALTER TABLE news ADD COLUMN published_ts INTEGER")
+    except Exception:
+        pass
+    _ = client.execute(
+        "CREATE INDEX IF NOT EXISTS idx_news_published_ts ON news(published_ts DESC)"
+    )
+    backfill_published_ts(client)
+    # Lote que falhou deixa NULL: não grava a versão e o próximo boot retoma.
+    pending = client.execute("SELECT 1 FROM news WHERE published_ts IS NULL LIMIT 1")
+    if pending.rows:
+        raise RuntimeError("backfill de published_ts incompleto")
+
+
+def _migration_market_snapshots(client: DbClient) -> None:
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS market_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            digest TEXT NOT NULL UNIQUE,
+            coletado_em TEXT,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    _ = client.execute(
+        "CREATE INDEX IF NOT EXISTS idx_market_snapshots_kind ON market_snapshots(kind, coletado_em)"
+    )
+    compact_market_snapshots(client)
+
+
+def _migration_news_fts_changes(client: DbClient) -> None:
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS news_fts_changes (
+            news_id INTEGER PRIMARY KEY,
+            indexed INTEGER NOT NULL DEFAULT 0,
+            old_titulo TEXT,
+            old_resumo TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            changed_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migration_news_fts_unaccent(client: DbClient) -> None:
+    """Recria o índice com ``remove_diacritics 2``: "inflação" casa "inflacao" no próprio FTS."""
+    for trigger in _FTS_TRIGGERS:
+        try:
+            _ = client.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        except Exception:
+            pass
+    _ = client.execute("DROP TABLE IF EXISTS news_fts_vocab")
+    _ = client.execute("DROP TABLE IF EXISTS news_fts")
+    _create_news_fts(client)
+    _ = client.execute("INSERT INTO news_fts(news_fts) VALUES('rebuild')")
+    # O rebuild já indexou tudo: o log do Turso não tem mais o que aplicar.
+    _ = client.execute("DELETE FROM news_fts_changes")
+
+
+def _migration_news_tag_stats(client: DbClient) -> None:
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS news_tag_stats (
+            tag TEXT NOT NULL,
+            sentimento TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_id INTEGER,
+            PRIMARY KEY (tag, sentimento)
+        )
+    """)
+    rebuild_news_tag_stats(client)
+
+
+def _migration_page_views_daily(client: DbClient) -> None:
+    """Rollup diário de views por matéria — painel e crédito leem isso, não ``page_views``."""
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS page_views_daily (
+            news_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (news_id, day)
+        )
+    """)
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_page_views_daily_author ON page_views_daily(author_id, day)",
+        "CREATE INDEX IF NOT EXISTS idx_page_views_daily_day ON page_views_daily(day)",
+        # Recontagem (matéria, dia) a cada flush do buffer de views.
+        "CREATE INDEX IF NOT EXISTS idx_page_views_news_day ON page_views(news_id, day)",
+    ):
+        _ = client.execute(sql)
+    _ = client.execute("""
+        INSERT OR REPLACE INTO page_views_daily (news_id, author_id, day, views)
+        SELECT news_id, MAX(author_id), day, COUNT(*)
+        FROM page_views
+        GROUP BY news_id, day
+    """)
+
+
+def _migration_wallet_balances(client: DbClient) -> None:
+    """Saldo corrente por colunista, mantido no mesmo lote de cada lançamento do ledger."""
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS wallet_balances (
+            user_id INTEGER PRIMARY KEY,
+            balance_brl REAL NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    _ = client.execute("""
+        INSERT OR REPLACE INTO wallet_balances (user_id, balance_brl, updated_at)
+        SELECT user_id, SUM(amount_brl), datetime('now')
+        FROM wallet_ledger
+        GROUP BY user_id
+    """)
+
+
+def _migration_credit_runs(client: DbClient) -> None:
+    """Registro do crédito diário por dia — substitui o ``LIKE`` em ``wallet_ledger.meta_json``."""
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS credit_runs (
+            day TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            totals TEXT
+        )
+    """)
+    # Dias já creditados antes do registro.
+    _ = client.execute("""
+        INSERT OR IGNORE INTO credit_runs (day, status, started_at, finished_at, totals)
+        SELECT json_extract(meta_json, '$.day'), 'done', MIN(created_at), MAX(created_at),
+               json_object('credited', ROUND(SUM(amount_brl), 2), 'entries', COUNT(*))
+        FROM wallet_ledger
+        WHERE kind = 'daily_share' AND json_extract(meta_json, '$.day') IS NOT NULL
+        GROUP BY json_extract(meta_json, '$.day')
+    """)
+
+
+def _migration_news_boost_until(client: DbClient) -> None:
+    # Parcial: só as poucas matérias com destaque pago ativo entram no índice.
+    _ = client.execute(
+        "CREATE INDEX IF NOT EXISTS idx_news_boost_until ON news(boost_until) "
+        "WHERE boost_until IS NOT NULL AND boost_until != ''"
+    )
+
+
+def _migration_news_comment_count(client: DbClient) -> None:
+    """``news.comment_count``: matéria sem comentário não consulta ``comments`` no render."""
+    try:
+        _ = client.execute("ALTER TABLE news ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0")
+    except Exception:
+        pass
+    _ = client.execute("""
+        UPDATE news SET comment_count = (SELECT COUNT(*) FROM comments c WHERE c.news_id = news.id)
+        WHERE id IN (SELECT DISTINCT news_id FROM comments)
+    """)
+
+
+def _migration_comments_thread_index(client: DbClient) -> None:
+    # Keyset da paginação de comentários: ORDER BY (raiz da thread, id).
+    _ = client.execute(
+        "CREATE INDEX IF NOT EXISTS idx_comments_thread "
+        "ON comments(news_id, COALESCE(parent_id, id), id)"
+    )
+
+
+# (versão, nome, função). Só acrescentar no fim — nunca renumerar nem editar
+# uma migração já publicada; banco na versão N roda apenas as de número > N.
+_MIGRATIONS: list[tuple[int, str, Callable[[DbClient], None]]] = [
+    (1, "baseline", _migration_baseline),
+    (2, "news_published_ts", _migration_news_published_ts),
+    (3, "market_snapshots", _migration_market_snapshots),
+    (4, "news_fts_changes", _migration_news_fts_changes),
+    (5, "news_fts_unaccent", _migration_news_fts_unaccent),
+    (6, "news_tag_stats", _migration_news_tag_stats),
+    (7, "page_views_daily", _migration_page_views_daily),
+    (8, "wallet_balances", _migration_wallet_balances),
+    (9, "credit_runs", _migration_credit_runs),
+    (10, "news_boost_until", _migration_news_boost_until),
+    (11, "news_comment_count", _migration_news_comment_count),
+    (12, "comments_thread_index", _migration_comments_thread_index),
+]
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+_FTS_TRIGGERS = ("news_fts_ai", "news_fts_ad", "news_fts_au")
+_FTS_TRI_TRIGGERS = ("news_fts_tri_ai", "news_fts_tri_ad", "news_fts_tri_au")
+_TAG_STATS_TRIGGERS = ("news_tag_stats_ai", "news_tag_stats_ad", "news_tag_stats_au")
+
+
+def _fts_trigram_enabled() -> bool:
+    """Índice trigram (substring) opcional — só no SQLite local, mantido por triggers."""
+    if os.getenv("FTS_TRIGRAM", "").strip().lower() not in ("1", "true", "yes"):
+        return False
+    return _use_local_db()
+
+
+def _schema_state(client: DbClient) -> tuple[int, bool]:
+    """(versão aplicada, FTS/contadores íntegros) numa única query — é o custo do boot quente.
+
+    Sem ``schema_migrations`` (banco legado ou vazio) a query falha: versão 0.
+    FTS íntegro = tabela existe e triggers batem com o backend (3 no SQLite
+    local, nenhum no Turso/réplica). Restore via dump volta sem FTS e cai aqui.
+    O vocabulário (``news_fts_vocab``) e o índice trigram (``FTS_TRIGRAM``)
+    entram na mesma conta: faltando, ou com a flag trocada, roda ``_ensure_fts``.
+    Idem para os triggers de ``news_tag_stats`` (só no SQLite local).
+    """
+    triggers = _FTS_TRIGGERS + _FTS_TRI_TRIGGERS + _TAG_STATS_TRIGGERS
+    try:
+        result = client.execute(
+            f"""
+            SELECT
+                (SELECT COALESCE(MAX(version), 0) FROM schema_migrations),
+                (SELECT COUNT(*) FROM sqlite_master
+                 WHERE type = 'table' AND name IN ('news_fts', 'news_fts_vocab', 'news_fts_tri')),
+                (SELECT COUNT(*) FROM sqlite_master
+                 WHERE type = 'trigger' AND name IN ({",".join("?" * len(triggers))}))
+            """,
+            list(triggers),
+        )
+    except Exception:
+        return 0, False
+    if not result.rows:
+        return 0, False
+    version, fts_tables, fts_triggers = (int(v or 0) for v in result.rows[0])
+    trigram = _fts_trigram_enabled()
+    expected_tables = 3 if trigram else 2
+    expected_triggers = len(_FTS_TRIGGERS) + len(_TAG_STATS_TRIGGERS) if _use_local_db() else 0
+    if trigram:
+        expected_triggers += len(_FTS_TRI_TRIGGERS)
+    return version, fts_tables == expected_tables and fts_triggers == expected_triggers
+
+
+def _apply_migrations(client: DbClient, current: int) -> int:
+    """Roda as migrações pendentes em ordem; para na primeira que falhar."""
+    _ = client.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    for version, name, migrate in _MIGRATIONS:
+        if version <= current:
+            continue
+        started = time.perf_counter()
+        migrate(client)
+        _ = client.execute(
+            "INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) "
+            "VALUES (?, ?, datetime('now'))",
+            [version, name],
+        )
+        current = version
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"   [schema] migração {version} ({name}) aplicada em {elapsed_ms:.0f} ms", flush=True)
+    return current
+
+
+def ensure_schema(client: DbClient, *, force: bool = False) -> None:
+    """Leva o banco a ``SCHEMA_VERSION``. Banco já em dia custa uma query."""
+    global _schema_ready, _fts_ready, _fts_trigram_ready
+    if _schema_ready and not force:
+        return
+
+    with _schema_lock:
+        if _schema_ready and not force:
+            return
+
+        try:
+            version, fts_ok = _schema_state(client)
+            if version >= SCHEMA_VERSION and fts_ok:
+                _fts_ready = True
+                _fts_trigram_ready = _fts_trigram_enabled()
+                return
+            if version < SCHEMA_VERSION:
+                _ = _apply_migrations(client, version)
             try:
                 _ensure_fts(client)
             except Exception as exc:
                 print(f"Aviso: FTS no schema: {exc}", flush=True)
+            try:
+                _ensure_tag_stats_triggers(client)
+            except Exception as exc:
+                print(f"Aviso: contadores news_tag_stats: {exc}", flush=True)
         except Exception as exc:
             # Não deixar cada /noticia reexecutar migração completa no Turso.
             print(f"Aviso: ensure_schema parcial: {exc}", flush=True)
@@ -1283,77 +2704,362 @@ def ensure_schema(client: DbClient, *, force: bool = False) -> None:
             _schema_ready = True
 
 
-def _ensure_fts(client: DbClient) -> None:
-    """Índice full-text para busca (FTS5).
+def _create_news_fts(client: DbClient) -> None:
+    # remove_diacritics 2: documento e consulta são dobrados no tokenizer.
+    _ = client.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+            titulo,
+            resumo,
+            content='news',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    # Termos do índice (term, doc, cnt) — autocomplete sem tocar em news.
+    _ = client.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS news_fts_vocab USING fts5vocab('news_fts', 'row')"
+    )
 
-    No Turso/libSQL HTTP, triggers FTS quebram o protocolo do client
-    (KeyError: 'result' no UPDATE/INSERT). Por isso triggers só no SQLite local;
-    rebuild completo no remoto fica para ``sync_news_fts`` (ops), não no hot path.
-    """
-    global _fts_ready
+
+def _create_fts_triggers(client: DbClient, table: str) -> None:
+    for sql in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON news BEGIN
+            INSERT INTO {table}(rowid, titulo, resumo)
+            VALUES (new.id, new.titulo, new.resumo);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON news BEGIN
+            INSERT INTO {table}({table}, rowid, titulo, resumo)
+            VALUES ('delete', old.id, old.titulo, old.resumo);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF titulo, resumo ON news BEGIN
+            INSERT INTO {table}({table}, rowid, titulo, resumo)
+            VALUES ('delete', old.id, old.titulo, old.resumo);
+            INSERT INTO {table}(rowid, titulo, resumo)
+            VALUES (new.id, new.titulo, new.resumo);
+        END
+        """,
+    ):
+        _ = client.execute(sql)
+
+
+def _ensure_fts_trigram(client: DbClient) -> bool:
+    """Cria (ou remove, com a flag desligada) o índice trigram ``news_fts_tri``."""
+    for trigger in _FTS_TRI_TRIGGERS:
+        try:
+            _ = client.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        except Exception:
+            pass
+    if not _fts_trigram_enabled():
+        try:
+            _ = client.execute("DROP TABLE IF EXISTS news_fts_tri")
+        except Exception:
+            pass
+        return False
     try:
-        _ = client.execute(
-            """
-            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+        table_sql = """
+            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts_tri USING fts5(
                 titulo,
                 resumo,
                 content='news',
                 content_rowid='id',
-                tokenize='unicode61'
+                tokenize='{tokenize}'
             )
-            """
-        )
+        """
+        try:
+            _ = client.execute(table_sql.format(tokenize="trigram remove_diacritics 1"))
+        except Exception:
+            # SQLite < 3.45 não aceita remove_diacritics no trigram.
+            _ = client.execute(table_sql.format(tokenize="trigram"))
+        _create_fts_triggers(client, "news_fts_tri")
+        _rebuild_fts_if_stale(client, "news_fts_tri")
+        return True
+    except Exception as exc:
+        print(f"Aviso: índice trigram: {exc}", flush=True)
+        return False
+
+
+def _ensure_fts(client: DbClient) -> None:
+    """Índice full-text para busca (FTS5).
+
+    No Turso/libSQL HTTP, triggers FTS quebram o protocolo do client
+    (KeyError: 'result' no UPDATE/INSERT). Por isso triggers só no SQLite local;
+    no remoto o índice segue o log ``news_fts_changes`` (``sync_news_fts``).
+    """
+    global _fts_ready, _fts_trigram_ready
+    try:
+        _create_news_fts(client)
 
         # Remove triggers legados que quebram o client HTTP do Turso.
-        for trigger in ("news_fts_ai", "news_fts_ad", "news_fts_au"):
+        for trigger in _FTS_TRIGGERS:
             try:
                 _ = client.execute(f"DROP TRIGGER IF EXISTS {trigger}")
             except Exception:
                 pass
 
         if _use_local_db():
-            for sql in (
-                """
-                CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news BEGIN
-                    INSERT INTO news_fts(rowid, titulo, resumo)
-                    VALUES (new.id, new.titulo, new.resumo);
-                END
-                """,
-                """
-                CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news BEGIN
-                    INSERT INTO news_fts(news_fts, rowid, titulo, resumo)
-                    VALUES ('delete', old.id, old.titulo, old.resumo);
-                END
-                """,
-                """
-                CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE OF titulo, resumo ON news BEGIN
-                    INSERT INTO news_fts(news_fts, rowid, titulo, resumo)
-                    VALUES ('delete', old.id, old.titulo, old.resumo);
-                    INSERT INTO news_fts(rowid, titulo, resumo)
-                    VALUES (new.id, new.titulo, new.resumo);
-                END
-                """,
-            ):
-                _ = client.execute(sql)
-
-            count = client.execute("SELECT COUNT(*) FROM news_fts")
-            fts_rows = int(count.rows[0][0]) if count.rows else 0
-            news_count = client.execute("SELECT COUNT(*) FROM news")
-            news_rows = int(news_count.rows[0][0]) if news_count.rows else 0
-            if news_rows and fts_rows < max(1, int(news_rows * 0.9)):
-                _ = client.execute("INSERT INTO news_fts(news_fts) VALUES('rebuild')")
+            _create_fts_triggers(client, "news_fts")
+            _rebuild_fts_if_stale(client)
+        elif isinstance(client, ReplicaClient) and client.local is not None:
+            # Réplica: a cópia inicial não traz news_fts; reconstrói só localmente.
+            _rebuild_fts_if_stale(client.local)
         _fts_ready = True
     except Exception:
         _fts_ready = False
+    _fts_trigram_ready = _fts_ready and _ensure_fts_trigram(client)
+
+
+def _rebuild_fts_if_stale(client: DbClient, table: str = "news_fts") -> None:
+    count = client.execute(f"SELECT COUNT(*) FROM {table}")
+    fts_rows = int(count.rows[0][0]) if count.rows else 0
+    news_count = client.execute("SELECT COUNT(*) FROM news")
+    news_rows = int(news_count.rows[0][0]) if news_count.rows else 0
+    if news_rows and fts_rows < max(1, int(news_rows * 0.9)):
+        _ = client.execute(f"INSERT INTO {table}({table}) VALUES('rebuild')")
+
+
+# Log de matérias a reindexar no Turso (no SQLite local os triggers cuidam).
+# O 'delete' do FTS5 com content externo exige os valores que estão no índice:
+# o log guarda titulo/resumo de antes da primeira mudança (indexed=1) ou nada
+# para linha nova (indexed=0). ``version`` sobe a cada mudança até o sync.
+_FTS_LOG_UPSERT = """
+    INSERT INTO news_fts_changes (news_id, indexed, old_titulo, old_resumo, version, changed_at)
+    SELECT id, {indexed}, {old_cols}, 1, datetime('now') FROM news WHERE {where}
+    ON CONFLICT(news_id) DO UPDATE SET
+        version = news_fts_changes.version + 1,
+        changed_at = excluded.changed_at
+"""
 
 
-def sync_news_fts(client: DbClient | None = None) -> dict[str, Any]:
-    """Reconstrói o índice FTS quando não há triggers (Turso)."""
+def fts_change_statements(news_id: int) -> list[Statement]:
+    """Registra a matéria no log do FTS — rodar ANTES do UPDATE/DELETE (mesmo lote)."""
+    if _use_local_db():
+        return []
+    sql = _FTS_LOG_UPSERT.format(indexed=1, old_cols="titulo, resumo", where="id = ?")
+    return [(sql, [int(news_id)])]
+
+
+def fts_insert_statements(*, news_id: int | None = None, link: str | None = None) -> list[Statement]:
+    """Registra matéria recém-inserida (ainda fora do índice) — rodar DEPOIS do INSERT."""
+    if _use_local_db():
+        return []
+    if news_id is not None:
+        where, args = "id = ?", [int(news_id)]
+    elif link:
+        where, args = "link = ?", [link]
+    else:
+        return []
+    sql = _FTS_LOG_UPSERT.format(indexed=0, old_cols="NULL, NULL", where=where)
+    return [(sql, args)]
+
+
+def sync_news_fts_changes(
+    client: DbClient | None = None,
+    *,
+    batch_size: int = 200,
+    news_ids: list[int] | None = None,
+) -> dict[str, Any]:
+    """Aplica no índice só as matérias do log, em lotes (1 pipeline por lote no Turso).
+
+    ``news_ids`` restringe às matérias indicadas (ex.: o artigo que o colunista
+    acabou de salvar); o resto do log fica para o cron/robô.
+    """
     if _use_local_db():
         return {"ok": True, "skipped": "local_db"}
     db = client or get_db()
+    size = max(1, int(batch_size))
+    where, filter_args = "", []
+    if news_ids is not None:
+        ids = sorted({int(i) for i in news_ids})
+        if not ids:
+            return {"ok": True, "applied": 0}
+        where = f"WHERE c.news_id IN ({', '.join('?' for _ in ids)})"
+        filter_args = ids
+    applied = 0
+    while True:
+        try:
+            result = db.execute(
+                f"""
+                SELECT c.news_id, c.indexed, c.old_titulo, c.old_resumo, c.version,
+                       n.id, n.titulo, n.resumo
+                FROM news_fts_changes c
+                LEFT JOIN news n ON n.id = c.news_id
+                {where}
+                ORDER BY c.news_id
+                LIMIT ?
+                """,
+                [*filter_args, size],
+            )
+        except Exception as exc:
+            print(f"Aviso: sync FTS incremental: {exc}", flush=True)
+            return {"ok": False, "applied": applied, "error": str(exc)[:180]}
+        rows = result.rows or []
+        if not rows:
+            break
+        statements: list[Statement] = []
+        for news_id, indexed, old_titulo, old_resumo, version, current_id, titulo, resumo in rows:
+            if indexed:
+                statements.append(
+                    (
+                        "INSERT INTO news_fts(news_fts, rowid, titulo, resumo) VALUES('delete', ?, ?, ?)",
+                        [int(news_id), str(old_titulo or ""), str(old_resumo or "")],
+                    )
+                )
+            if current_id is not None:
+                statements.append(
+                    (
+                        "INSERT INTO news_fts(rowid, titulo, resumo) VALUES (?, ?, ?)",
+                        [int(news_id), str(titulo or ""), str(resumo or "")],
+                    )
+                )
+                # Se mudou de novo durante o sync, a linha fica com o que acabou de ser indexado.
+                statements.append(
+                    (
+                        "UPDATE news_fts_changes SET indexed = 1, old_titulo = ?, old_resumo = ? WHERE news_id = ?",
+                        [str(titulo or ""), str(resumo or ""), int(news_id)],
+                    )
+                )
+            statements.append(
+                (
+                    "DELETE FROM news_fts_changes WHERE news_id = ? AND version = ?",
+                    [int(news_id), int(version or 1)],
+                )
+            )
+        try:
+            run_batch(db, statements)
+        except Exception as exc:
+            print(f"Aviso: sync FTS incremental (lote): {exc}", flush=True)
+            return {"ok": False, "applied": applied, "error": str(exc)[:180]}
+        applied += len(rows)
+        if len(rows) < size:
+            break
+    return {"ok": True, "applied": applied}
+
+
+# Contadores (tag, sentimento) → count/max_id. SQLite local: triggers; Turso:
+# os mesmos statements entram no lote da escrita (como o log do FTS).
+_TAG_STATS_INC = """
+    INSERT INTO news_tag_stats (tag, sentimento, count, max_id)
+    SELECT COALESCE(tag, ''), COALESCE(sentimento, ''), 1, id FROM news WHERE {where}
+    ON CONFLICT(tag, sentimento) DO UPDATE SET
+        count = news_tag_stats.count + 1,
+        max_id = MAX(COALESCE(news_tag_stats.max_id, 0), excluded.max_id)
+"""
+# max_id só é recalculado quando a linha que sai era a mais recente (idx_news_tag_id).
+_TAG_STATS_DEC = """
+    UPDATE news_tag_stats SET
+        count = count - 1,
+        max_id = CASE WHEN max_id = {news_id} THEN (
+            SELECT n.id FROM news n
+            WHERE n.tag = news_tag_stats.tag AND COALESCE(n.sentimento, '') = news_tag_stats.sentimento
+              AND n.id != {news_id}
+            ORDER BY n.id DESC LIMIT 1
+        ) ELSE max_id END
+    WHERE {where}
+"""
+
+
+def tag_stats_insert_statements(*, news_id: int | None = None, link: str | None = None) -> list[Statement]:
+    """Conta a matéria recém-gravada em ``news_tag_stats`` — rodar DEPOIS do INSERT/UPDATE."""
+    if _use_local_db():
+        return []
+    if news_id is not None:
+        where, args = "id = ?", [int(news_id)]
+    elif link:
+        where, args = "link = ? ORDER BY id DESC LIMIT 1", [link]
+    else:
+        return []
+    return [(_TAG_STATS_INC.format(where=where), args)]
+
+
+def tag_stats_change_statements(news_id: int) -> list[Statement]:
+    """Desconta a matéria de ``news_tag_stats`` — rodar ANTES do UPDATE de tag/sentimento ou DELETE."""
+    if _use_local_db():
+        return []
+    sql = _TAG_STATS_DEC.format(
+        news_id="?",
+        where="(tag, sentimento) = (SELECT COALESCE(tag, ''), COALESCE(sentimento, '') FROM news WHERE id = ?)",
+    )
+    return [(sql, [int(news_id), int(news_id), int(news_id)])]
+
+
+def rebuild_news_tag_stats(client: DbClient | None = None) -> None:
+    """Recalcula os contadores do zero (migração, DELETE em massa, triggers recriados)."""
+    db = client or get_db()
+    _ = run_batch(
+        db,
+        [
+            ("DELETE FROM news_tag_stats", None),
+            (
+                """
+                INSERT INTO news_tag_stats (tag, sentimento, count, max_id)
+                SELECT COALESCE(tag, ''), COALESCE(sentimento, ''), COUNT(*), MAX(id)
+                FROM news GROUP BY 1, 2
+                """,
+                None,
+            ),
+        ],
+    )
+
+
+def _ensure_tag_stats_triggers(client: DbClient) -> None:
+    """SQLite local: triggers mantêm ``news_tag_stats``. Turso: remove (quebram o HTTP)."""
+    if not _use_local_db():
+        for trigger in _TAG_STATS_TRIGGERS:
+            try:
+                _ = client.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            except Exception:
+                pass
+        return
+    inc = _TAG_STATS_INC.replace(
+        "SELECT COALESCE(tag, ''), COALESCE(sentimento, ''), 1, id FROM news WHERE {where}",
+        "VALUES (COALESCE(new.tag, ''), COALESCE(new.sentimento, ''), 1, new.id)",
+    )
+    dec = _TAG_STATS_DEC.format(
+        news_id="old.id",
+        where="tag = COALESCE(old.tag, '') AND sentimento = COALESCE(old.sentimento, '')",
+    )
+    for sql in (
+        f"CREATE TRIGGER IF NOT EXISTS news_tag_stats_ai AFTER INSERT ON news BEGIN {inc}; END",
+        f"CREATE TRIGGER IF NOT EXISTS news_tag_stats_ad AFTER DELETE ON news BEGIN {dec}; END",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS news_tag_stats_au AFTER UPDATE OF tag, sentimento ON news
+        WHEN old.tag IS NOT new.tag OR old.sentimento IS NOT new.sentimento
+        BEGIN {dec}; {inc}; END
+        """,
+    ):
+        _ = client.execute(sql)
+    # Só se chega aqui no caminho lento do boot (migração, restore, triggers
+    # faltando): escritas sem trigger podem ter passado, recalcula do zero.
+    rebuild_news_tag_stats(client)
+
+
+def sync_news_fts(client: DbClient | None = None, *, full: bool = True) -> dict[str, Any]:
+    """Sincroniza o índice FTS quando não há triggers (Turso).
+
+    ``full=False`` aplica só o log (``sync_news_fts_changes``); ``full=True``
+    reconstrói tudo e zera o log na mesma transação — para depois de DELETE
+    em massa (tools/purge_*) ou como rede de segurança semanal.
+    """
+    if _use_local_db():
+        return {"ok": True, "skipped": "local_db"}
+    db = client or get_db()
+    if not full:
+        return sync_news_fts_changes(db)
     try:
-        _ = db.execute("INSERT INTO news_fts(news_fts) VALUES('rebuild')")
+        run_batch(
+            db,
+            [
+                ("INSERT INTO news_fts(news_fts) VALUES('rebuild')", None),
+                ("DELETE FROM news_fts_changes", None),
+            ],
+        )
         return {"ok": True, "rebuilt": True}
     except Exception as exc:
         print(f"Aviso: sync_news_fts: {exc}", flush=True)
@@ -1366,6 +3072,10 @@ def fts_available() -> bool:
     return _fts_ready
 
 
+def fts_trigram_available() -> bool:
+    return fts_available() and _fts_trigram_ready
+
+
 def _fold_fts_token(token: str) -> str:
     nfkd = unicodedata.normalize("NFKD", (token or "").lower())
     return "".join(ch for ch in nfkd if not unicodedata.combining(ch))
@@ -1386,7 +3096,10 @@ _FTS_SYNONYMS: dict[str, tuple[str, ...]] = {
 
 
 def build_fts_match_query(q: str) -> str | None:
-    """Monta expressão FTS5 segura (prefixos + sinônimos de mercado)."""
+    """Monta expressão FTS5 segura (prefixos + sinônimos de mercado).
+
+    O tokenizer já ignora acentos: cada palavra entra uma vez, dobrada.
+    """
     tokens = re.findall(r"[0-9A-Za-zÀ-ÿ]{2,}", (q or "").strip(), flags=re.UNICODE)
     if not tokens:
         return None
@@ -1395,23 +3108,18 @@ def build_fts_match_query(q: str) -> str | None:
 
     def _add_term(raw: str) -> None:
         safe = re.sub(r"[^\w]", "", raw, flags=re.UNICODE)
-        if len(safe) < 2:
+        if len(safe) < 2 or safe in seen:
             return
-        key = safe.lower()
-        if key in seen:
-            return
-        seen.add(key)
+        seen.add(safe)
         cleaned.append(f'"{safe}"*')
 
     for token in tokens[:8]:
-        _add_term(token)
         folded = _fold_fts_token(token)
-        if folded:
-            _add_term(folded)
-            for extra in _FTS_SYNONYMS.get(folded, ()):
-                if len(cleaned) >= 16:
-                    break
-                _add_term(extra)
+        _add_term(folded)
+        for extra in _FTS_SYNONYMS.get(folded, ()):
+            if len(cleaned) >= 16:
+                break
+            _add_term(extra)
         if len(cleaned) >= 16:
             break
     if not cleaned:
@@ -1419,6 +3127,37 @@ def build_fts_match_query(q: str) -> str | None:
     return " OR ".join(cleaned)
 
 
+def fts_suggest_terms(client: DbClient, prefix: str, limit: int = 6) -> list[str]:
+    """Termos do índice que começam com ``prefix``, dos mais frequentes (em matérias)."""
+    start = _fold_fts_token(prefix).strip()
+    if len(start) < 2 or not fts_available():
+        return []
+    # Faixa [prefix, prefix+1): o fts5vocab filtra por ``term`` sem varrer o vocabulário.
+    stop = start[:-1] + chr(ord(start[-1]) + 1)
+    try:
+        result = client.execute(
+            "SELECT term FROM news_fts_vocab WHERE term >= ? AND term < ? ORDER BY doc DESC, term LIMIT ?",
+            [start, stop, max(1, int(limit))],
+        )
+    except Exception as exc:
+        print(f"Aviso: fts5vocab: {exc}", flush=True)
+        return []
+    return [str(row[0]) for row in result.rows or []]
+
+
+def build_trigram_match_query(q: str) -> str | None:
+    """Substring em ``news_fts_tri``: termos de 3+ letras, todos obrigatórios."""
+    tokens = re.findall(r"[0-9A-Za-zÀ-ÿ]{3,}", (q or "").strip(), flags=re.UNICODE)
+    terms: list[str] = []
+    for token in tokens[:5]:
+        term = f'"{token.lower()}"'
+        if term not in terms:
+            terms.append(term)
+    if not terms:
+        return None
+    return " AND ".join(terms)
+
+
 def upsert_news_fts(client: DbClient | None, news_id: int, titulo: object, resumo: object) -> bool:
     """Atualiza uma linha no índice FTS (Turso sem triggers). No-op no SQLite local."""
     if _use_local_db() or not news_id:
@@ -1479,12 +3218,376 @@ def index_news_by_link(client: DbClient | None, link: str) -> bool:
     return upsert_news_fts(db, int(row[0]), row[1], row[2])
 
 
+# Formatos de data gravados em published_at/created_at (BR do robô, ISO dos colunistas).
+_ARTICLE_DT_FORMATS = (
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d",
+)
+_PUBLISHED_TS_BATCH = 500
+
+
+def _portal_tz():
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo("America/Sao_Paulo")
+    except Exception:
+        return None
+
+
+def article_timestamp(*candidates: object) -> int | None:
+    """Epoch (segundos) da primeira data válida — valor de ``news.published_ts``.
+
+    Datas sem fuso são horário de Brasília (é o que o robô grava); sufixo ``Z``
+    é UTC (colunistas). Mesmas regras de ``core.parse_article_datetime``.
+    """
+    from datetime import datetime, timezone
+
+    for raw in candidates:
+        if raw is None:
+            continue
+        text = str(raw).strip()
+        if not text:
+            continue
+        tz = None
+        if text.endswith("Z"):
+            text = text[:-1]
+            tz = timezone.utc
+        if "." in text and "T" in text:
+            text = text.split(".", 1)[0]
+        for fmt in _ARTICLE_DT_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            parsed = parsed.replace(tzinfo=tz or _portal_tz())
+            return int(parsed.timestamp())
+    return None
+
+
+def backfill_published_ts(client: DbClient | None = None, *, batch_size: int = _PUBLISHED_TS_BATCH) -> int:
+    """Preenche ``published_ts`` nas matérias antigas, em lotes por id.
+
+    Sem data legível grava 0 — a linha sai do filtro ``IS NULL`` e o boot
+    seguinte não a relê. Retorna quantas linhas foram atualizadas.
+    """
+    db = client or get_db()
+    size = max(1, int(batch_size))
+    last_id = 0
+    updated = 0
+    while True:
+        try:
+            result = db.execute(
+                """
+                SELECT id, published_at, created_at FROM news
+                WHERE published_ts IS NULL AND id > ?
+                ORDER BY id LIMIT ?
+                """,
+                [last_id, size],
+            )
+        except Exception as exc:
+            print(f"   [published_ts] backfill ignorado: {exc}", flush=True)
+            break
+        rows = result.rows or []
+        if not rows:
+            break
+        statements: list[Statement] = [
+            (
+                "UPDATE news SET published_ts = ? WHERE id = ?",
+                [article_timestamp(row[1], row[2]) or 0, int(row[0])],
+            )
+            for row in rows
+        ]
+        try:
+            run_batch(db, statements)
+        except Exception as exc:
+            print(f"   [published_ts] lote falhou: {exc}", flush=True)
+            break
+        updated += len(statements)
+        last_id = int(rows[-1][0])
+        if len(rows) < size:
+            break
+    if updated:
+        print(f"   [published_ts] backfill: {updated} matéria(s).", flush=True)
+    return updated
+
+
+# Partes de dados_mercado que são a mesma coleta para várias matérias
+# (cotações, BCB, séries 30d/90d). Vão uma vez para market_snapshots e a
+# matéria guarda só ``snapshot_refs: {chave: id}``.
+_MARKET_SNAPSHOT_KEYS: dict[str, str] = {
+    "cotacoes": "cotacoes",
+    "cotacoes_publicacao": "cotacoes",
+    "cotacoes_atuais": "cotacoes",
+    "bcb": "bcb",
+    "bcb_publicacao": "bcb",
+    "bcb_atuais": "bcb",
+    "historico": "historico",
+    "historico_publicacao": "historico",
+}
+_SNAPSHOT_CACHE_MAX = 512
+# Chave inclui id(client): ids de snapshot só valem para o banco que os gerou.
+_snapshot_ids: OrderedDict[tuple[int, str], int] = OrderedDict()
+_snapshot_payloads: OrderedDict[tuple[int, int], Any] = OrderedDict()
+_snapshot_cache_lock = threading.Lock()
+
+
+def _snapshot_cache_put(cache: OrderedDict, key: Any, value: Any) -> None:
+    with _snapshot_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _SNAPSHOT_CACHE_MAX:
+            cache.popitem(last=False)
+
+
+def _market_snapshot_id(client: DbClient, kind: str, value: dict[str, Any]) -> int:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha256(f"{kind}\n{text}".encode("utf-8")).hexdigest()
+    with _snapshot_cache_lock:
+        cached = _snapshot_ids.get((id(client), digest))
+    if cached is not None:
+        return cached
+    # INSERT OR IGNORE + SELECT no mesmo lote: 1 round trip no Turso.
+    results = run_batch(
+        client,
+        [
+            (
+                "INSERT OR IGNORE INTO market_snapshots (kind, digest, coletado_em, payload, created_at) "
+                "VALUES (?, ?, ?, ?, datetime('now'))",
+                [kind, digest, str(value.get("coletado_em") or ""), text],
+            ),
+            ("SELECT id FROM market_snapshots WHERE digest = ?", [digest]),
+        ],
+    )
+    rows = results[-1].rows if results else []
+    if not rows:
+        raise RuntimeError(f"market_snapshots sem linha para {kind}")
+    snapshot_id = int(rows[0][0])
+    _snapshot_cache_put(_snapshot_ids, (id(client), digest), snapshot_id)
+    _snapshot_cache_put(_snapshot_payloads, (id(client), snapshot_id), json.loads(text))
+    return snapshot_id
+
+
+def pack_market_snapshots(client: DbClient | None, dados: dict[str, Any]) -> dict[str, Any]:
+    """Troca cotações/BCB/histórico de ``dados_mercado`` por referências deduplicadas.
+
+    Sem a tabela (schema antigo) ou com erro no banco, a parte fica inline —
+    ``unpack_market_snapshots`` lida com os dois formatos.
+    """
+    db = client or get_db()
+    out = dict(dados)
+    refs = dict(out.get("snapshot_refs") or {})
+    for key, kind in _MARKET_SNAPSHOT_KEYS.items():
+        value = out.get(key)
+        if not isinstance(value, dict) or not value:
+            continue
+        try:
+            refs[key] = _market_snapshot_id(db, kind, value)
+        except Exception as exc:
+            print(f"Aviso: market_snapshots ({kind}) inline: {type(exc).__name__}", flush=True)
+            continue
+        del out[key]
+    if refs:
+        out["snapshot_refs"] = refs
+    return out
+
+
+def unpack_market_snapshots(client: DbClient | None, dados: dict[str, Any]) -> dict[str, Any]:
+    """Remonta ``dados_mercado`` a partir de ``snapshot_refs`` (1 query para o que não está em cache).
+
+    Os snapshots em cache são compartilhados entre requests: tratar como somente leitura.
+    """
+    refs = dados.get("snapshot_refs")
+    if not isinstance(refs, dict) or not refs:
+        return dados
+    db = client or get_db()
+    out = dict(dados)
+    wanted = {int(sid) for sid in refs.values() if str(sid).isdigit()}
+    found: dict[int, Any] = {}
+    with _snapshot_cache_lock:
+        for sid in wanted:
+            key = (id(db), sid)
+            if key in _snapshot_payloads:
+                found[sid] = _snapshot_payloads[key]
+                _snapshot_payloads.move_to_end(key)
+    missing = sorted(wanted - found.keys())
+    if missing:
+        try:
+            result = db.execute(
+                f"SELECT id, payload FROM market_snapshots WHERE id IN ({','.join('?' * len(missing))})",
+                missing,
+            )
+            for row in result.rows or []:
+                try:
+                    value = json.loads(row[1])
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                found[int(row[0])] = value
+                _snapshot_cache_put(_snapshot_payloads, (id(db), int(row[0])), value)
+        except Exception as exc:
+            print(f"Aviso: market_snapshots indisponível: {type(exc).__name__}", flush=True)
+    for key, sid in refs.items():
+        value = found.get(int(sid)) if str(sid).isdigit() else None
+        if value is not None and key not in out:
+            out[key] = value
+    return out
+
+
+def compact_market_snapshots(client: DbClient | None = None, *, batch_size: int = 200) -> int:
+    """Migra ``dados_mercado`` inline antigos para market_snapshots, em lotes por id."""
+    db = client or get_db()
+    size = max(1, int(batch_size))
+    last_id = 0
+    compacted = 0
+    while True:
+        result = db.execute(
+            """
+            SELECT id, dados_mercado FROM news
+            WHERE id > ? AND dados_mercado IS NOT NULL AND dados_mercado != ''
+            ORDER BY id LIMIT ?
+            """,
+            [last_id, size],
+        )
+        rows = result.rows or []
+        if not rows:
+            break
+        statements: list[Statement] = []
+        for row in rows:
+            try:
+                dados = json.loads(row[1])
+            except (TypeError, json.JSONDecodeError):
+                continue
+            if not isinstance(dados, dict) or not any(
+                isinstance(dados.get(key), dict) and dados.get(key) for key in _MARKET_SNAPSHOT_KEYS
+            ):
+                continue
+            packed = pack_market_snapshots(db, dados)
+            if packed.get("snapshot_refs") == dados.get("snapshot_refs"):
+                continue
+            statements.append(
+                (
+                    "UPDATE news SET dados_mercado = ? WHERE id = ?",
+                    [json.dumps(packed, ensure_ascii=False), int(row[0])],
+                )
+            )
+        if statements:
+            run_batch(db, statements)
+            compacted += len(statements)
+        last_id = int(rows[-1][0])
+        if len(rows) < size:
+            break
+    if compacted:
+        print(f"   [market_snapshots] {compacted} matéria(s) compactada(s).", flush=True)
+    return compacted
+
+
+_LINK_INDEX_BATCH = 5000
+
+
+def _link_index_refresh_sec() -> float:
+    try:
+        return max(0.0, float(os.getenv("LINK_INDEX_REFRESH_SEC", "60")))
+    except ValueError:
+        return 60.0
+
+
+def _link_key(link: str) -> int:
+    return int.from_bytes(hashlib.blake2b(link.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class _NewsLinkIndex:
+    """Hashes de 64 bits dos links de ``news``, em memória no processo.
+
+    Link fora do índice = novo, sem ida ao banco. Presença pode ser colisão ou
+    linha já apagada, então é confirmada com SELECT. Linhas gravadas por outro
+    processo entram no refresh incremental (``id > max_id``).
+    """
+
+    def __init__(self, client_id: int):
+        self.client_id = client_id
+        self.keys: set[int] = set()
+        self.max_id = 0
+        self.refreshed_at = 0.0
+
+    def load(self, client: DbClient) -> None:
+        while True:
+            result = client.execute(
+                "SELECT id, link FROM news WHERE id > ? ORDER BY id LIMIT ?",
+                [self.max_id, _LINK_INDEX_BATCH],
+            )
+            rows = result.rows or []
+            for row in rows:
+                if row[1]:
+                    self.keys.add(_link_key(str(row[1])))
+            if rows:
+                self.max_id = int(rows[-1][0])
+            if len(rows) < _LINK_INDEX_BATCH:
+                break
+        self.refreshed_at = time.monotonic()
+
+    def might_contain(self, link: str) -> bool:
+        return _link_key(link) in self.keys
+
+
+_link_index: _NewsLinkIndex | None = None
+_link_index_lock = threading.Lock()
+
+
+def _news_link_index(client: DbClient) -> _NewsLinkIndex | None:
+    """Índice do client atual (carrega na 1ª vez); None se o banco falhar."""
+    global _link_index
+    with _link_index_lock:
+        index = _link_index
+        try:
+            if index is None or index.client_id != id(client):
+                index = _NewsLinkIndex(id(client))
+                index.load(client)
+                _link_index = index
+                print(f"   [db] índice de links: {len(index.keys)} matérias", flush=True)
+            elif time.monotonic() - index.refreshed_at >= _link_index_refresh_sec():
+                index.load(client)
+        except Exception as exc:
+            print(f"Aviso: índice de links indisponível: {exc}", flush=True)
+            return None
+        return index
+
+
+def warm_news_link_index(client: DbClient | None = None) -> None:
+    """Carrega o índice de links no boot (o robô não paga a carga na 1ª rodada)."""
+    _ = _news_link_index(client or get_db())
+
+
+def note_news_links(links: Iterable[str]) -> None:
+    """Acrescenta links recém-gravados ao índice (sem esperar o refresh)."""
+    with _link_index_lock:
+        index = _link_index
+        if index is None:
+            return
+        for link in links:
+            href = str(link or "").strip()
+            if href:
+                index.keys.add(_link_key(href))
+
+
 def existing_news_links(links: list[str]) -> set[str]:
-    """Retorna o subconjunto de links já publicados (1 query por lote)."""
+    """Retorna o subconjunto de links já publicados.
+
+    Só os links que o índice em memória acusa vão ao banco (1 query por lote);
+    feed sem nada repetido não faz nenhuma query.
+    """
     cleaned = [str(link).strip() for link in links if link and str(link).strip()]
     if not cleaned:
         return set()
     client = get_db()
+    index = _news_link_index(client)
+    if index is not None:
+        cleaned = [link for link in cleaned if index.might_contain(link)]
+        if not cleaned:
+            return set()
     found: set[str] = set()
     for i in range(0, len(cleaned), _LINK_IN_CHUNK):
         chunk = cleaned[i : i + _LINK_IN_CHUNK]
@@ -1559,14 +3662,16 @@ def client_sentiment_summary(tag_hint=None):
 
     try:
         client = get_db()
+        # news_tag_stats: poucas linhas por tag, sem varrer news.
         if tag_hint:
             result = client.execute(
-                "SELECT sentimento, COUNT(*) FROM news WHERE tag = ? GROUP BY sentimento",
+                "SELECT sentimento, count FROM news_tag_stats WHERE tag = ? AND count > 0 ORDER BY sentimento",
                 [tag_hint],
             )
         else:
             result = client.execute(
-                "SELECT sentimento, COUNT(*) FROM news GROUP BY sentimento",
+                "SELECT sentimento, SUM(count) FROM news_tag_stats WHERE count > 0 "
+                "GROUP BY sentimento ORDER BY sentimento",
             )
         rows = result.rows
 
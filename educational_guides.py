@@ -13,7 +13,18 @@ import json
 from datetime import datetime
 from typing import Any
 
-from db import DbClient
+from db import (
+    DbClient,
+    article_timestamp,
+    fts_change_statements,
+    fts_insert_statements,
+    note_news_links,
+    pack_market_snapshots,
+    run_batch,
+    sync_news_fts,
+    tag_stats_change_statements,
+    tag_stats_insert_statements,
+)
 
 GUIDE_LINK_PREFIX = "internal://artigo/"
 GUIDE_FONTE = "Clareza Capital"
@@ -399,7 +410,11 @@ def _live_macro_snapshot() -> dict[str, Any]:
         return {}
 
 
-def _dados_mercado_payload(guide: dict[str, Any], live: dict[str, Any] | None = None) -> str:
+def _dados_mercado_payload(
+    client: DbClient,
+    guide: dict[str, Any],
+    live: dict[str, Any] | None = None,
+) -> str:
     live = live or {}
     bcb = live.get("bcb") or {}
     bits = []
@@ -414,21 +429,19 @@ def _dados_mercado_payload(guide: dict[str, Any], live: dict[str, Any] | None =
     if bits:
         atualizacao = " · ".join(bits) + " — " + atualizacao
 
-    return json.dumps(
-        {
-            "contexto_mercado": guide["contexto_mercado"],
-            "pontos_chave": guide["pontos_chave"],
-            "glossario": guide["glossario"],
-            "faq": guide["faq"],
-            "dados_citados": ["Selic", "IPCA", "câmbio", "renda fixa"],
-            "bcb": bcb,
-            "cotacoes": live.get("cotacoes") or {},
-            "historico": live.get("historico") or {},
-            "atualizacao": atualizacao,
-            "guia_nucleo": True,
-        },
-        ensure_ascii=False,
-    )
+    payload = {
+        "contexto_mercado": guide["contexto_mercado"],
+        "pontos_chave": guide["pontos_chave"],
+        "glossario": guide["glossario"],
+        "faq": guide["faq"],
+        "dados_citados": ["Selic", "IPCA", "câmbio", "renda fixa"],
+        "bcb": bcb,
+        "cotacoes": live.get("cotacoes") or {},
+        "historico": live.get("historico") or {},
+        "atualizacao": atualizacao,
+        "guia_nucleo": True,
+    }
+    return json.dumps(pack_market_snapshots(client, payload), ensure_ascii=False)
 
 
 def ensure_educational_guides(client: DbClient, *, refresh: bool = False) -> int:
@@ -445,7 +458,7 @@ def ensure_educational_guides(client: DbClient, *, refresh: bool = False) -> int
         if guide["slug"] not in GUIDE_SLUGS:
             continue
         link = guide_link(guide["slug"])
-        dados = _dados_mercado_payload(guide, live)
+        dados = _dados_mercado_payload(client, guide, live)
         contexto = guide["contexto_mercado"]
         if live.get("bcb"):
             nums = []
@@ -463,59 +476,41 @@ def ensure_educational_guides(client: DbClient, *, refresh: bool = False) -> int
         if existing.rows:
             if not refresh:
                 continue
+            news_id = int(existing.rows[0][0])
             try:
-                client.execute(
-                    """
-                    UPDATE news
-                    SET titulo = ?, resumo = ?, impacto = ?, tag = ?, sentimento = ?,
-                        fonte = ?, dados_mercado = ?, contexto_editorial = ?,
-                        updated_at = ?, versao_analise = ?
-                    WHERE link = ?
-                    """,
+                # Turso (sem triggers): log do FTS e contadores por tag no mesmo lote.
+                run_batch(
+                    client,
                     [
-                        guide["titulo"],
-                        guide["resumo"],
-                        guide["impacto"],
-                        guide["tag"],
-                        guide["sentimento"],
-                        GUIDE_FONTE,
-                        dados,
-                        contexto,
-                        agora,
-                        1,
-                        link,
+                        *fts_change_statements(news_id),
+                        *tag_stats_change_statements(news_id),
+                        (
+                            """
+                            UPDATE news
+                            SET titulo = ?, resumo = ?, impacto = ?, tag = ?, sentimento = ?,
+                                fonte = ?, dados_mercado = ?, contexto_editorial = ?,
+                                updated_at = ?, versao_analise = ?
+                            WHERE id = ?
+                            """,
+                            [
+                                guide["titulo"],
+                                guide["resumo"],
+                                guide["impacto"],
+                                guide["tag"],
+                                guide["sentimento"],
+                                GUIDE_FONTE,
+                                dados,
+                                contexto,
+                                agora,
+                                1,
+                                news_id,
+                            ],
+                        ),
+                        *tag_stats_insert_statements(news_id=news_id),
                     ],
                     max_attempts=1,
                 )
-            except TypeError:
-                try:
-                    client.execute(
-                        """
-                        UPDATE news
-                        SET titulo = ?, resumo = ?, impacto = ?, tag = ?, sentimento = ?,
-                            fonte = ?, dados_mercado = ?, contexto_editorial = ?,
-                            updated_at = ?, versao_analise = ?
-                        WHERE link = ?
-                        """,
-                        [
-                            guide["titulo"],
-                            guide["resumo"],
-                            guide["impacto"],
-                            guide["tag"],
-                            guide["sentimento"],
-                            GUIDE_FONTE,
-                            dados,
-                            contexto,
-                            agora,
-                            1,
-                            link,
-                        ],
-                    )
-                except Exception as exc:
-                    print(f"Aviso: falha ao atualizar guia {guide['slug']}: {exc}")
-                    continue
             except Exception as exc:
-                # Triggers FTS legados no Turso podem falhar o protocolo HTTP.
                 print(f"Aviso: falha ao atualizar guia {guide['slug']}: {exc}")
                 continue
         else:
@@ -525,8 +520,8 @@ def ensure_educational_guides(client: DbClient, *, refresh: bool = False) -> int
                     INSERT INTO news (
                         titulo, resumo, impacto, link, tag, sentimento,
                         published_at, fonte, dados_mercado, contexto_editorial,
-                        created_at, imagem_url, versao_analise
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        created_at, imagem_url, versao_analise, published_ts
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """,
                     [
                         guide["titulo"],
@@ -542,12 +537,23 @@ def ensure_educational_guides(client: DbClient, *, refresh: bool = False) -> int
                         published_at,
                         None,
                         1,
+                        article_timestamp(published_at),
                     ],
                 )
             except Exception as exc:
                 print(f"Aviso: falha ao inserir guia {guide['slug']}: {exc}")
                 continue
+            note_news_links([link])
+            try:
+                run_batch(
+                    client,
+                    [*fts_insert_statements(link=link), *tag_stats_insert_statements(link=link)],
+                )
+            except Exception as exc:
+                print(f"Aviso: log FTS do guia {guide['slug']}: {exc}")
         written += 1
+    if written:
+        sync_news_fts(client, full=False)
     return written
 
 
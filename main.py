@@ -1,10 +1,12 @@
 import os
+import base64
 import json
 import hmac
 import re
 import threading
 import time
 import traceback
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
@@ -12,11 +14,13 @@ from typing import Any
 from urllib.parse import quote_plus
 from fastapi import FastAPI, Request, Response, HTTPException, Form, File, UploadFile
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.staticfiles import StaticFiles as StarletteStaticFiles
 import uvicorn
 from dotenv import load_dotenv
+from markupsafe import Markup, escape
 
 import core
 from db import (
@@ -24,24 +28,42 @@ from db import (
     DatabaseConfigError,
     DatabaseUnavailableError,
     TursoQuotaError,
+    _fold_fts_token,
     _is_transient_db_error,
     activate_local_sqlite,
+    article_timestamp,
     build_fts_match_query,
+    build_trigram_match_query,
     db_backend_label,
     default_article_images_dir,
     default_local_database_path,
     ensure_schema,
     existing_news_links,
     fts_available,
+    fts_insert_statements,
+    fts_suggest_terms,
+    fts_trigram_available,
     get_db,
     import_turso_into_sqlite,
-    index_news_by_link,
     invalidate_sentiment_cache,
+    iter_file_chunks,
+    iter_gzip_file,
     log_runtime_config_checklist,
+    note_news_links,
+    pack_market_snapshots,
+    query_stats,
     reset_db_client,
-    restore_sqlite_payload,
+    reset_query_stats,
+    restore_sqlite_file,
+    run_batch,
+    save_sqlite_backup,
+    snapshot_sqlite,
     sqlite_table_counts,
     sync_news_fts,
+    tag_stats_insert_statements,
+    turso_session,
+    using_local_sqlite,
+    warm_news_link_index,
     RESTORE_MAX_BYTES,
 )
 from educational_guides import (
@@ -155,6 +177,9 @@ async def _lifespan(_app: FastAPI):
             print(f"   [db] backend={db_backend_label()}", flush=True)
             client = get_db()
             ensure_schema(client)
+            warm_news_link_index(client)
+            # Destaques pagos vencem em background; a home não faz essa conta.
+            columnists.start_boost_expiry_worker(on_expire=lambda _n: _invalidate_home_cache())
             n = ensure_educational_guides(client)
             if n:
                 print(f"Guias educativos sincronizados: {n}")
@@ -171,6 +196,11 @@ async def _lifespan(_app: FastAPI):
     # Background: não bloqueia o worker no reload (Turso remoto pode demorar).
     threading.Thread(target=_boot, daemon=True, name="startup-boot").start()
     yield
+    # Views de colunistas ainda no buffer (flush periódico em thread daemon).
+    try:
+        columnists.flush_page_views()
+    except Exception as exc:
+        print(f"Aviso: flush de page_views no shutdown: {exc}")
 
 
 app = FastAPI(lifespan=_lifespan)
@@ -246,8 +276,11 @@ def _current_user(request: Request):
     if not uid:
         return None
     try:
-        user = community.find_user_by_id(get_db(), int(uid))
-        return columnists.enrich_user_role(get_db(), user)
+        client = get_db()
+        return community.cached_session_user(
+            int(uid),
+            lambda user_id: columnists.enrich_user_role(client, community.find_user_by_id(client, user_id)),
+        )
     except Exception:
         return None
 
@@ -353,7 +386,13 @@ def _request_headers_map(request: Request) -> dict[str, str]:
 
 @app.middleware("http")
 async def security_and_cache_headers(request: Request, call_next):
-    response = await call_next(request)
+    path = request.url.path or ""
+    if path.startswith(("/static/", "/media/")):
+        response = await call_next(request)
+    else:
+        # Todas as queries da request (Turso) compartilham um stream Hrana.
+        with turso_session():
+            response = await call_next(request)
     response.headers.setdefault("X-Content-Type-Options", "nosniff")
     response.headers.setdefault("Referrer-Policy", "strict-origin-when-cross-origin")
     response.headers.setdefault("X-Frame-Options", "SAMEORIGIN")
@@ -363,7 +402,6 @@ async def security_and_cache_headers(request: Request, call_next):
             "Strict-Transport-Security",
             "max-age=31536000; includeSubDomains",
         )
-    path = request.url.path or ""
     if path.startswith("/media/default/") and response.status_code == 200:
         response.headers["Cache-Control"] = "public, max-age=604800, stale-while-revalidate=86400"
     return response
@@ -408,6 +446,14 @@ _HOME_CACHE: dict[str, tuple[float, dict[str, object]]] = {}
 _HOME_CACHE_LOCK = threading.Lock()
 _HOME_CACHE_TTL = float(os.getenv("HOME_CACHE_TTL", "20"))
 
+# Autocomplete da busca: LRU por prefixo normalizado (digitação repete prefixos).
+_SUGGEST_CACHE: OrderedDict[str, tuple[float, dict[str, object]]] = OrderedDict()
+_SUGGEST_CACHE_LOCK = threading.Lock()
+_SUGGEST_CACHE_MAX = 512
+_SUGGEST_CACHE_TTL = float(os.getenv("SEARCH_SUGGEST_TTL", "120"))
+SUGGEST_TERMS = 6
+SUGGEST_TITLES = 5
+
 DEFAULT_CATEGORY_IMAGES = {
     "Cripto": {"slug": "cripto", "label": "Cripto", "from": "#0b1220", "to": "#14532d", "accent": "#4ade80", "icon": "₿"},
     "Economia": {"slug": "economia", "label": "Economia", "from": "#0f172a", "to": "#0e7490", "accent": "#67e8f9", "icon": "∑"},
@@ -570,23 +616,66 @@ NEWS_LIST_SELECT = """
 """
 
 # JOIN com news_fts exige prefixo: titulo/resumo existem nas duas tabelas.
+# ``{fts}`` = news_fts ou news_fts_tri. Colunas 16/17: título destacado e trecho
+# do resumo, com os termos entre FTS_MARK_OPEN/FTS_MARK_CLOSE (ver ``fts_mark``).
+FTS_MARK_OPEN = "\x02"
+FTS_MARK_CLOSE = "\x03"
 FTS_NEWS_LIST_SELECT = """
     SELECT news.id, news.titulo, news.resumo, news.impacto, news.link, news.tag, news.sentimento,
            COALESCE(NULLIF(news.published_at, ''), news.created_at) AS data_publicacao,
            news.fonte, NULL AS dados_mercado, NULL AS contexto_editorial, news.imagem_url,
            NULL AS conteudo_extra, news.updated_at, news.versao_analise,
-           COALESCE(news.home_priority, 0) AS home_priority
+           COALESCE(news.home_priority, 0) AS home_priority,
+           highlight({fts}, 0, char(2), char(3)) AS titulo_destaque,
+           snippet({fts}, 1, char(2), char(3), '…', 24) AS trecho
     FROM news
 """
 
 
+def fts_mark(text: object) -> Markup:
+    """Escapa o fragmento do FTS e troca os marcadores por ``<mark>``."""
+    escaped = str(escape(str(text or "")))
+    return Markup(escaped.replace(FTS_MARK_OPEN, "<mark>").replace(FTS_MARK_CLOSE, "</mark>"))
+
+
+templates.env.globals["fts_mark"] = fts_mark
+
+
 def _invalidate_home_cache() -> None:
     with _HOME_CACHE_LOCK:
         _HOME_CACHE.clear()
+    with _SUGGEST_CACHE_LOCK:
+        _SUGGEST_CACHE.clear()
+
+
+def _home_cache_key(
+    categoria: str | None,
+    offset: int,
+    limit: int,
+    q: str | None,
+    before: int | None = None,
+) -> str:
+    page = f"c{before}" if before else str(offset)
+    return f"{categoria or ''}|{page}|{limit}|{(q or '').strip().lower()}"
+
+
+def _encode_feed_cursor(news_id: int) -> str:
+    """Cursor opaco do feed (keyset em ``id DESC``)."""
+    return base64.urlsafe_b64encode(f"n{int(news_id)}".encode("ascii")).decode("ascii").rstrip("=")
 
 
-def _home_cache_key(categoria: str | None, offset: int, limit: int, q: str | None) -> str:
-    return f"{categoria or ''}|{offset}|{limit}|{(q or '').strip().lower()}"
+def _decode_feed_cursor(raw: str | None) -> int | None:
+    value = (raw or "").strip()
+    if not value or len(value) > 32:
+        return None
+    try:
+        decoded = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("ascii")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not decoded.startswith("n") or not decoded[1:].isdigit():
+        return None
+    news_id = int(decoded[1:])
+    return news_id if news_id > 0 else None
 
 
 def _home_cache_stale(cache_key: str) -> dict[str, object] | None:
@@ -611,10 +700,13 @@ def _execute_fts_listing(
     categoria: str | None,
     fetch_limit: int,
     offset: int,
+    *,
+    table: str = "news_fts",
 ) -> QueryResult:
     """Busca FTS com ranking bm25 (título pesa mais que resumo). Fallback sem bm25."""
     params: list[Any] = [fts_q]
-    where = " JOIN news_fts ON news_fts.rowid = news.id WHERE news_fts MATCH ?"
+    select = FTS_NEWS_LIST_SELECT.format(fts=table)
+    where = f" JOIN {table} ON {table}.rowid = news.id WHERE {table} MATCH ?"
     if categoria:
         where += " AND news.tag = ?"
         params.append(categoria)
@@ -623,29 +715,131 @@ def _execute_fts_listing(
         " OR news.moderation_status = 'published')"
     )
     params.extend([fetch_limit, offset])
-    ranked_sql = (
-        FTS_NEWS_LIST_SELECT
-        + where
-        + " ORDER BY bm25(news_fts, 10.0, 2.5), news.id DESC LIMIT ? OFFSET ?"
-    )
-    plain_sql = FTS_NEWS_LIST_SELECT + where + " ORDER BY news.id DESC LIMIT ? OFFSET ?"
+    ranked_sql = select + where + f" ORDER BY bm25({table}, 10.0, 2.5), news.id DESC LIMIT ? OFFSET ?"
+    plain_sql = select + where + " ORDER BY news.id DESC LIMIT ? OFFSET ?"
     try:
         return client.execute(ranked_sql, params)
     except Exception:
         return client.execute(plain_sql, params)
 
 
+def _search_listing(
+    client,
+    q: str,
+    categoria: str | None,
+    fetch_limit: int,
+    offset: int,
+) -> QueryResult:
+    """Busca só pelo índice: FTS por palavra e, sem nenhum acerto, trigram (substring).
+
+    Sem FTS disponível não há varredura ``LIKE`` — volta vazio e a página
+    mostra as sugestões.
+    """
+    if not fts_available():
+        return QueryResult([])
+    fts_q = build_fts_match_query(q)
+    if fts_q:
+        try:
+            result = _execute_fts_listing(client, fts_q, categoria, fetch_limit, offset)
+        except Exception as exc:
+            print(f"   [busca] FTS falhou ({type(exc).__name__})", flush=True)
+            return QueryResult([])
+        if result.rows:
+            return result
+        if offset and _fts_has_match(client, fts_q):
+            return result  # fim da paginação por palavra, não "nenhum acerto"
+    tri_q = build_trigram_match_query(q) if fts_trigram_available() else None
+    if not tri_q:
+        return QueryResult([])
+    try:
+        return _execute_fts_listing(client, tri_q, categoria, fetch_limit, offset, table="news_fts_tri")
+    except Exception as exc:
+        print(f"   [busca] trigram falhou ({type(exc).__name__})", flush=True)
+        return QueryResult([])
+
+
+def _fts_has_match(client, fts_q: str) -> bool:
+    try:
+        result = client.execute("SELECT 1 FROM news_fts WHERE news_fts MATCH ? LIMIT 1", [fts_q])
+    except Exception:
+        return False
+    return bool(result.rows)
+
+
+def _normalize_suggest_prefix(q: str | None) -> str:
+    """Chave do autocomplete: palavras dobradas (sem acento, minúsculas), no máx. 5."""
+    tokens = re.findall(r"[0-9A-Za-zÀ-ÿ]+", (q or "")[:80], flags=re.UNICODE)
+    return " ".join(_fold_fts_token(t) for t in tokens[-5:])
+
+
+def _search_suggest_titles(client, prefix: str) -> list[dict[str, object]]:
+    """Matérias publicadas com todas as palavras (a última como prefixo), por bm25."""
+    words = prefix.split()
+    match = " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+    result = client.execute(
+        """
+        SELECT news.id, news.titulo FROM news_fts
+        JOIN news ON news.id = news_fts.rowid
+        WHERE news_fts MATCH ?
+          AND (news.moderation_status IS NULL OR news.moderation_status = ''
+               OR news.moderation_status = 'published')
+        ORDER BY bm25(news_fts, 10.0, 2.5), news.id DESC
+        LIMIT ?
+        """,
+        [match.strip(), SUGGEST_TITLES],
+    )
+    return [{"id": int(row[0]), "titulo": str(row[1] or "")} for row in result.rows or []]
+
+
+def _load_search_suggest(prefix: str) -> dict[str, object]:
+    now = time.time()
+    with _SUGGEST_CACHE_LOCK:
+        cached = _SUGGEST_CACHE.get(prefix)
+        if cached and now < cached[0]:
+            _SUGGEST_CACHE.move_to_end(prefix)
+            return cached[1]
+
+    payload: dict[str, object] = {"q": prefix, "terms": [], "titles": []}
+    if fts_available():
+        client = get_db()
+        last = prefix.split()[-1]
+        head = prefix[: len(prefix) - len(last)]
+        try:
+            payload["terms"] = [head + term for term in fts_suggest_terms(client, last, SUGGEST_TERMS)]
+            payload["titles"] = _search_suggest_titles(client, prefix)
+        except Exception as exc:
+            print(f"   [busca] sugestão falhou ({type(exc).__name__})", flush=True)
+            return payload
+
+    with _SUGGEST_CACHE_LOCK:
+        _SUGGEST_CACHE[prefix] = (now + _SUGGEST_CACHE_TTL, payload)
+        _SUGGEST_CACHE.move_to_end(prefix)
+        while len(_SUGGEST_CACHE) > _SUGGEST_CACHE_MAX:
+            _SUGGEST_CACHE.popitem(last=False)
+    return payload
+
+
 def _load_home_listing(
     categoria: str | None,
     offset: int,
     limit: int,
     q: str | None,
     *,
+    before: int | None = None,
     include_suggestions: bool = True,
 ) -> dict[str, object]:
+    """Listagem da home/categoria/busca.
+
+    Sem busca, ``before`` (id do último card já exibido) pagina por keyset em
+    ``id DESC`` — custo constante em qualquer profundidade do scroll. A busca
+    ordena por relevância (bm25) e segue com ``offset``.
+    """
     offset = max(0, offset)
     limit = max(1, min(limit, 40))
-    cache_key = _home_cache_key(categoria, offset, limit, q)
+    q_clean = (q or "").strip() or None
+    if q_clean or (before is not None and before <= 0):
+        before = None
+    cache_key = _home_cache_key(categoria, offset, limit, q, before)
     now = time.time()
     with _HOME_CACHE_LOCK:
         cached = _HOME_CACHE.get(cache_key)
@@ -655,48 +849,26 @@ def _load_home_listing(
     client = get_db()
     # Busca limit+1 para saber has_more sem COUNT(*) extra.
     fetch_limit = limit + 1
-    q_clean = (q or "").strip() or None
     result: QueryResult | None = None
 
     try:
         if q_clean:
-            fts_q = build_fts_match_query(q_clean) if fts_available() else None
-            if fts_q:
-                try:
-                    result = _execute_fts_listing(client, fts_q, categoria, fetch_limit, offset)
-                except Exception:
-                    result = None
-
-            if result is None:
-                # Fallback: tokens AND em título/resumo (mais seletivo que um único LIKE).
-                tokens = [t for t in re.findall(r"[0-9A-Za-zÀ-ÿ]{2,}", q_clean, flags=re.UNICODE)][:5]
-                if not tokens:
-                    tokens = [q_clean]
-                where_parts: list[str] = []
-                params: list[Any] = []
-                for token in tokens:
-                    where_parts.append("(titulo LIKE ? OR resumo LIKE ?)")
-                    like = f"%{token}%"
-                    params.extend([like, like])
-                where_sql = " AND ".join(where_parts)
-                if categoria:
-                    where_sql = f"({where_sql}) AND tag = ?"
-                    params.append(categoria)
-                params.extend([fetch_limit, offset])
-                result = client.execute(
-                    NEWS_LIST_SELECT + f" WHERE {where_sql}" + _and_published(True) + " ORDER BY id DESC LIMIT ? OFFSET ?",
-                    params,
-                )
-        elif categoria:
-            result = client.execute(
-                NEWS_LIST_SELECT + " WHERE tag = ?" + _and_published(True) + " ORDER BY id DESC LIMIT ? OFFSET ?",
-                [categoria, fetch_limit, offset],
-            )
+            result = _search_listing(client, q_clean, categoria, fetch_limit, offset)
         else:
-            result = client.execute(
-                NEWS_LIST_SELECT + " WHERE " + columnists.PUBLISHED_SQL + " ORDER BY id DESC LIMIT ? OFFSET ?",
-                [fetch_limit, offset],
-            )
+            where = " WHERE " + columnists.PUBLISHED_SQL
+            params = []
+            if categoria:
+                where += " AND tag = ?"
+                params.append(categoria)
+            if before:
+                where += " AND id < ?"
+                params.append(before)
+                page_sql = " ORDER BY id DESC LIMIT ?"
+                params.append(fetch_limit)
+            else:
+                page_sql = " ORDER BY id DESC LIMIT ? OFFSET ?"
+                params.extend([fetch_limit, offset])
+            result = client.execute(NEWS_LIST_SELECT + where + page_sql, params)
     except Exception as exc:
         stale = _home_cache_stale(cache_key)
         if stale:
@@ -730,6 +902,7 @@ def _load_home_listing(
 
     next_offset = offset + len(news)
     total_news = next_offset + (1 if has_more else 0)
+    next_cursor = _encode_feed_cursor(news[-1][0]) if has_more and news and not q_clean else None
 
     payload: dict[str, object] = {
         "news": news,
@@ -738,6 +911,7 @@ def _load_home_listing(
         "limit": limit,
         "offset": offset,
         "next_offset": next_offset,
+        "next_cursor": next_cursor,
         "has_more": has_more,
     }
     with _HOME_CACHE_LOCK:
@@ -748,10 +922,6 @@ def _load_home_listing(
 def _load_headline_news(categoria: str | None) -> list[Any]:
     """Manchetes importantes (urgência Alta) para o hero da home."""
     client = get_db()
-    try:
-        columnists.expire_boosts(client)
-    except Exception:
-        pass
     where = "WHERE COALESCE(home_priority, 0) >= ?" + _and_published(True)
     params: list[Any] = [core.HOME_HEADLINE_MIN_PRIORITY]
     if categoria:
@@ -826,6 +996,7 @@ def index(request: Request, categoria: str | None = None, q: str | None = None):
         "q": q,
         "has_more": listing["has_more"],
         "next_offset": listing["next_offset"],
+        "next_cursor": listing.get("next_cursor"),
         "feed_batch": FEED_BATCH,
         "featured_count": FEATURED_COUNT,
         "home_top_count": HOME_TOP_COUNT,
@@ -851,12 +1022,15 @@ def api_feed(
     offset: int = 0,
     categoria: str | None = None,
     q: str | None = None,
+    before: str | None = None,
 ):
+    cursor_id = _decode_feed_cursor(before)
     listing = _load_home_listing(
         categoria,
         max(0, offset),
         FEED_BATCH,
         q,
+        before=cursor_id,
         include_suggestions=False,
     )
     sparklines = core.fetch_sparkline_data(blocking=False)
@@ -870,19 +1044,38 @@ def api_feed(
             **i18n,
         }
     )
-    response = HTMLResponse(
-        content=html,
-        headers={
-            "X-Has-More": "1" if listing["has_more"] else "0",
-            "X-Next-Offset": str(listing["next_offset"]),
-            "Cache-Control": "public, max-age=15, stale-while-revalidate=30",
-        },
-    )
+    headers = {
+        "X-Has-More": "1" if listing["has_more"] else "0",
+        "X-Next-Offset": str(listing["next_offset"]),
+        # Página por cursor é estável (ids abaixo do cursor não mudam de posição).
+        "Cache-Control": (
+            "public, max-age=120, stale-while-revalidate=600"
+            if cursor_id
+            else "public, max-age=15, stale-while-revalidate=30"
+        ),
+    }
+    if listing.get("next_cursor"):
+        headers["X-Next-Cursor"] = str(listing["next_cursor"])
+    response = HTMLResponse(content=html, headers=headers)
     if request.query_params.get("lang"):
         _set_lang_cookie(response, resolve_lang(request))
     return response
 
 
+@app.get("/api/search-suggest")
+def api_search_suggest(q: str | None = None):
+    """Autocomplete da caixa de busca: termos do índice (fts5vocab) + títulos."""
+    prefix = _normalize_suggest_prefix(q)
+    if len(prefix.split()[-1] if prefix else "") < 2:
+        payload: dict[str, object] = {"q": prefix, "terms": [], "titles": []}
+    else:
+        payload = _load_search_suggest(prefix)
+    return JSONResponse(
+        payload,
+        headers={"Cache-Control": "public, max-age=60, stale-while-revalidate=120"},
+    )
+
+
 def _render_noticia_page(
     request: Request,
     noticia_id: int,
@@ -970,18 +1163,20 @@ def _render_noticia_page(
 
     user = _current_user(request)
 
+    comment_count: int | None = None
     columnist_author = None
     columnist_body = None
     is_columnist_article = False
     try:
         meta = client.execute(
             """
-            SELECT author_id, content_origin, moderation_status, conteudo_extra
+            SELECT author_id, content_origin, moderation_status, conteudo_extra, comment_count
             FROM news WHERE id = ? LIMIT 1
             """,
             [int(noticia_id)],
         )
         if meta.rows:
+            comment_count = meta.rows[0][4]
             author_id = meta.rows[0][0]
             origin = str(meta.rows[0][1] or "")
             mod_status = str(meta.rows[0][2] or columnists.STATUS_PUBLISHED)
@@ -1016,12 +1211,19 @@ def _render_noticia_page(
         print(f"Aviso: meta colunista /noticia/{noticia_id}: {exc}", flush=True)
 
     comments: list[dict[str, Any]] = []
+    comments_next_cursor: str | None = None
+    comments_total = 0
     try:
-        comments = community.list_comments(
+        # Só a 1ª página vai no HTML; o resto vem de /api/noticia/{id}/comentarios.
+        page = community.list_comments_page(
             get_db(),
             int(noticia_id),
             include_pending_for_user=int(user["id"]) if user else None,
+            comment_count=comment_count,
         )
+        comments = page["comments"]
+        comments_next_cursor = page["next_cursor"]
+        comments_total = int(page["total"] or 0)
     except Exception as exc:
         print(f"   [comments] listagem falhou id={noticia_id}: {exc}")
 
@@ -1049,6 +1251,8 @@ def _render_noticia_page(
             "updated_iso": updated_iso,
             "content_translated": lang != "pt" and _article_has_translation(noticia, lang),
             "comments": comments,
+            "comments_next_cursor": comments_next_cursor,
+            "comments_total": comments_total,
             "comment_flash": request.query_params.get("comment_msg"),
             "comment_flash_ok": request.query_params.get("comment_ok") == "1",
             "columnist_author": columnist_author,
@@ -1524,6 +1728,7 @@ async def perfil_avatar(request: Request, avatar: UploadFile = File(...)):
     try:
         url = community.save_avatar_upload(int(user["id"]), avatar.filename or "avatar.jpg", data)
         get_db().execute("UPDATE users SET avatar_url = ? WHERE id = ?", [url, int(user["id"])])
+        community.invalidate_user_cache(int(user["id"]))
     except ValueError as exc:
         if _wants_json(request):
             return JSONResponse({"ok": False, "error": str(exc)}, status_code=400)
@@ -1642,12 +1847,13 @@ async def post_comment(
         }
         count = 0
         try:
-            count = len(
-                community.list_comments(
+            count = int(
+                community.list_comments_page(
                     get_db(),
                     noticia_id,
                     include_pending_for_user=int(user["id"]),
-                )
+                )["total"]
+                or 0
             )
         except Exception:
             count = 0
@@ -1666,6 +1872,25 @@ async def post_comment(
     )
 
 
+@app.get("/api/noticia/{noticia_id}/comentarios")
+def api_comments_page(request: Request, noticia_id: int, after: str | None = None):
+    """Páginas seguintes da thread (keyset ``(raiz, id)``); a 1ª já vem no HTML da matéria."""
+    cursor = community.decode_comment_cursor(after) if after else None
+    if after and cursor is None:
+        return JSONResponse({"ok": False, "error": "cursor inválido"}, status_code=400)
+    user = _current_user(request)
+    page = community.list_comments_page(
+        get_db(),
+        noticia_id,
+        after=cursor,
+        include_pending_for_user=int(user["id"]) if user else None,
+    )
+    response = JSONResponse({"ok": True, **page})
+    # Pendentes do próprio usuário entram na página: não compartilhar em cache.
+    response.headers["Cache-Control"] = "private, max-age=15" if user else "public, max-age=30"
+    return response
+
+
 @app.post("/comentarios/{comment_id}/upvote")
 async def upvote_comment_route(
     request: Request,
@@ -1715,12 +1940,13 @@ async def delete_comment_route(
     if _wants_json(request):
         count = 0
         try:
-            count = len(
-                community.list_comments(
+            count = int(
+                community.list_comments_page(
                     get_db(),
                     int(result["news_id"]),
                     include_pending_for_user=int(user["id"]),
-                )
+                )["total"]
+                or 0
             )
         except Exception:
             count = 0
@@ -2056,6 +2282,16 @@ def require_robo_auth(request: Request, token: str | None = None) -> None:
         raise HTTPException(status_code=401, detail="Nao autorizado")
 
 
+_NEWS_INSERT_SQL = """
+    INSERT INTO news (
+        titulo, resumo, impacto, link, tag, sentimento, published_at,
+        fonte, dados_mercado, contexto_editorial, created_at, imagem_url, versao_analise,
+        home_priority, published_ts
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
 def _persist_generated_news(noticias_geradas: list[dict[str, Any]]) -> int:
     """Insere no banco o lote gerado pela IA. Retorna quantas linhas novas."""
     if not noticias_geradas:
@@ -2064,6 +2300,7 @@ def _persist_generated_news(noticias_geradas: list[dict[str, Any]]) -> int:
     client = get_db()
     salvas = 0
     existing = existing_news_links([n.get("original_link", "") for n in noticias_geradas])
+    pending: list[tuple[dict[str, Any], str, int, list[Any]]] = []
 
     for n in noticias_geradas:
         link = n.get("original_link") or ""
@@ -2078,21 +2315,18 @@ def _persist_generated_news(noticias_geradas: list[dict[str, Any]]) -> int:
                 refs = dados_obj.get("referencias_internas") or []
                 if refs:
                     dados_obj["referencias_internas"] = resolve_referencias_internas(client, refs)
-                    dados_raw = json.dumps(dados_obj, ensure_ascii=False)
+                # Cotações/BCB/séries do lote são as mesmas: gravadas uma vez só.
+                dados_obj = pack_market_snapshots(client, dados_obj)
+                dados_raw = json.dumps(dados_obj, ensure_ascii=False)
             except json.JSONDecodeError:
                 pass
 
         priority = core.compute_home_priority(n)
-        try:
-            client.execute(
-                """
-                INSERT INTO news (
-                    titulo, resumo, impacto, link, tag, sentimento, published_at,
-                    fonte, dados_mercado, contexto_editorial, created_at, imagem_url, versao_analise,
-                    home_priority
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
+        pending.append(
+            (
+                n,
+                link,
+                priority,
                 [
                     n["titulo_viral"],
                     n["resumo_simples"],
@@ -2108,21 +2342,49 @@ def _persist_generated_news(noticias_geradas: list[dict[str, Any]]) -> int:
                     n.get("imagem_url"),
                     n.get("versao_analise", 1),
                     priority,
+                    article_timestamp(agora),
                 ],
             )
-        except Exception as exc:
-            print(
-                f"   [db] INSERT news falhou ({type(exc).__name__})",
-                flush=True,
-            )
-            continue
+        )
         existing.add(link)
+
+    if not pending:
+        return 0
+
+    # Lote inteiro num commit (SQLite) / num pipeline (Turso); se algo falhar,
+    # cai para INSERT individual e só a linha ruim fica de fora.
+    inserted: list[tuple[dict[str, Any], str, int]] = []
+    try:
+        statements: list[tuple[str, list[Any] | None]] = []
+        for _, link, _, params in pending:
+            statements.append((_NEWS_INSERT_SQL, params))
+            statements.extend(fts_insert_statements(link=link))
+            statements.extend(tag_stats_insert_statements(link=link))
+        run_batch(client, statements)
+        inserted = [(n, link, priority) for n, link, priority, _ in pending]
+    except Exception as exc:
+        print(f"   [db] lote INSERT news falhou ({type(exc).__name__}); gravando 1 a 1", flush=True)
+        for n, link, priority, params in pending:
+            try:
+                run_batch(
+                    client,
+                    [
+                        (_NEWS_INSERT_SQL, params),
+                        *fts_insert_statements(link=link),
+                        *tag_stats_insert_statements(link=link),
+                    ],
+                )
+            except Exception as row_exc:
+                print(
+                    f"   [db] INSERT news falhou ({type(row_exc).__name__})",
+                    flush=True,
+                )
+                continue
+            inserted.append((n, link, priority))
+
+    for n, link, priority in inserted:
         salvas += 1
         print("   [db] gravou noticia no banco", flush=True)
-        try:
-            index_news_by_link(client, link)
-        except Exception:
-            pass
 
         if priority >= core.HOME_HEADLINE_MIN_PRIORITY:
             try:
@@ -2140,18 +2402,45 @@ def _persist_generated_news(noticias_geradas: list[dict[str, Any]]) -> int:
             except Exception as exc:
                 print(f"   [newsletter] fila alerta urgencia ignorada: {exc}")
 
+    if inserted:
+        note_news_links(link for _, link, _ in inserted)
+        # Turso: indexa só as linhas do log (no SQLite local os triggers já indexaram).
+        sync_news_fts(client, full=False)
+
     return salvas
 
 
 @app.get("/api/sync-news-fts")
-def api_sync_news_fts(request: Request, token: str | None = None):
-    """Rebuild do índice FTS (cron). No SQLite local os triggers já cobrem INSERT/UPDATE."""
+def api_sync_news_fts(request: Request, token: str | None = None, full: int = 0):
+    """Sync do índice FTS (cron): incremental pelo log; ``full=1`` faz rebuild.
+
+    No SQLite local os triggers já cobrem INSERT/UPDATE/DELETE.
+    """
     require_robo_auth(request, token)
-    result = sync_news_fts()
+    result = sync_news_fts(full=bool(full))
     _invalidate_home_cache()
     return {"status": "Sucesso" if result.get("ok") else "Falha", **result}
 
 
+@app.get("/api/db-stats")
+def api_db_stats(
+    request: Request,
+    token: str | None = None,
+    sort: str = "total_ms",
+    limit: int = 30,
+    reset: int = 0,
+):
+    """Latência por fingerprint de SQL (p50/p95/p99) desde o boot ou o último reset."""
+    require_robo_auth(request, token)
+    stats = query_stats(sort=sort, limit=max(1, min(int(limit), 200)))
+    if reset:
+        reset_query_stats()
+    return JSONResponse(
+        {"ok": True, "backend": db_backend_label(), **stats},
+        headers={"Cache-Control": "no-store"},
+    )
+
+
 @app.api_route("/api/import-from-turso", methods=["GET", "POST"])
 def api_import_from_turso(
     request: Request,
@@ -2186,6 +2475,61 @@ def api_import_from_turso(
     return {"status": "Sucesso", **result}
 
 
+@app.api_route("/api/backup-sqlite", methods=["GET", "POST"])
+def api_backup_sqlite(
+    request: Request,
+    token: str | None = None,
+    save: int = 0,
+    download: int = 1,
+):
+    """Backup online do SQLite do volume (.db.gz em stream). Auth: ROBO_TOKEN.
+
+    ``save=1`` também grava em SQLITE_BACKUP_DIR (rotaciona); ``download=0``
+    só grava e responde JSON — é o modo do cron.
+    """
+    require_robo_auth(request, token)
+    if not using_local_sqlite():
+        raise HTTPException(status_code=409, detail="backup online so com USE_LOCAL_DB (SQLite no volume)")
+    src = default_local_database_path()
+    tmp = f"{src}.backup-{os.getpid()}-{threading.get_ident()}"
+    try:
+        info = snapshot_sqlite(tmp, src_path=src)
+        saved = save_sqlite_backup(tmp) if save else None
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="news.db nao encontrado no volume") from exc
+    except Exception as exc:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        print(f"   [backup] falhou: {type(exc).__name__}: {exc}", flush=True)
+        raise HTTPException(status_code=500, detail="Falha ao gerar o backup do SQLite.") from exc
+    print(f"   [backup] snapshot {info['bytes']} bytes em {info['ms']} ms", flush=True)
+
+    if not download:
+        os.remove(tmp)
+        return {"status": "Sucesso", **info, "saved": saved}
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if saved:
+        # Já comprimido no disco: só repassa o arquivo.
+        os.remove(tmp)
+        body = iter_file_chunks(saved["path"])
+    else:
+        body = iter_gzip_file(tmp, remove_after=True)
+    return StreamingResponse(
+        body,
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="news-{stamp}.db.gz"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+RESTORE_CHUNK_BYTES = 1024 * 1024
+
+
 @app.post("/api/restore-sqlite")
 async def api_restore_sqlite(
     request: Request,
@@ -2202,23 +2546,37 @@ async def api_restore_sqlite(
             status_code=400,
             detail="arquivo deve ser .db, .sqlite, .sql ou .gz",
         )
-    data = await file.read()
-    if not data:
-        raise HTTPException(status_code=400, detail="arquivo vazio")
-    if len(data) > RESTORE_MAX_BYTES:
-        raise HTTPException(status_code=413, detail="arquivo excede 150 MB")
     dest = default_local_database_path()
-    reset_db_client()
+    dest_dir = os.path.dirname(dest) or "."
+    os.makedirs(dest_dir, exist_ok=True)
+    # Upload vai em blocos para um temporário no volume: RAM constante.
+    upload_path = os.path.join(dest_dir, f".restore-upload-{os.getpid()}-{id(file)}")
+    received = 0
     try:
-        result = restore_sqlite_payload(data, dest)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-    except Exception as exc:
-        print(f"   [migrate] restore falhou: {type(exc).__name__}", flush=True)
-        raise HTTPException(
-            status_code=400,
-            detail="Nao foi possivel restaurar o arquivo enviado.",
-        ) from exc
+        with open(upload_path, "wb") as handle:
+            while chunk := await file.read(RESTORE_CHUNK_BYTES):
+                received += len(chunk)
+                if received > RESTORE_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="arquivo excede 150 MB")
+                handle.write(chunk)
+        if not received:
+            raise HTTPException(status_code=400, detail="arquivo vazio")
+        reset_db_client()
+        try:
+            result = await run_in_threadpool(restore_sqlite_file, upload_path, dest)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except Exception as exc:
+            print(f"   [migrate] restore falhou: {type(exc).__name__}", flush=True)
+            raise HTTPException(
+                status_code=400,
+                detail="Nao foi possivel restaurar o arquivo enviado.",
+            ) from exc
+    finally:
+        try:
+            os.remove(upload_path)
+        except OSError:
+            pass
     if not sqlite_table_counts(dest).get("news"):
         raise HTTPException(
             status_code=400,
@@ -2423,7 +2781,8 @@ def rodar_robo(request: Request, token: str | None = None):
 
         def _job() -> None:
             try:
-                _execute_robot_pipeline()
+                with turso_session():
+                    _execute_robot_pipeline()
             except Exception as exc:
                 print(f"   [robo] falha em background: {type(exc).__name__}: {exc}", flush=True)
                 traceback.print_exc()
@@ -2986,6 +3345,19 @@ def api_columnists_credit_daily(request: Request, token: str | None = None, day:
     return result
 
 
+@app.post("/api/columnists/prune-page-views")
+def api_columnists_prune_page_views(request: Request, token: str | None = None, keep_days: int | None = None):
+    require_admin_or_robo(request, token)
+    removed = columnists.prune_page_views(get_db(), keep_days=keep_days)
+    return {"ok": True, "removed": removed}
+
+
+@app.post("/api/columnists/reconcile-wallets")
+def api_columnists_reconcile_wallets(request: Request, token: str | None = None, fix: int = 1):
+    require_admin_or_robo(request, token)
+    return columnists.reconcile_wallet_balances(get_db(), fix=bool(fix))
+
+
 @app.post("/api/columnists/expire-boosts")
 def api_columnists_expire_boosts(request: Request, token: str | None = None):
     require_admin_or_robo(request, token)
@@ -5,6 +5,7 @@ import json
 import os
 import smtplib
 import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from html import escape
@@ -291,17 +292,6 @@ def datetime_hour_local() -> int:
         return datetime.now().hour
 
 
-def _now_local():
-    from datetime import datetime
-
-    try:
-        from zoneinfo import ZoneInfo
-
-        return datetime.now(ZoneInfo("America/Sao_Paulo")).replace(tzinfo=None)
-    except Exception:
-        return datetime.now()
-
-
 def _privacy_url() -> str:
     return f"{site_origin()}/privacidade"
 
@@ -313,37 +303,39 @@ def _fetch_important_news(
     min_priority: int = DIGEST_MIN_PRIORITY,
     lookback_hours: int,
 ) -> list[dict[str, str]]:
-    """Seleciona até max_items matérias Alta (home_priority) na janela recente."""
-    import core
-
-    limit = max(20, max_items * 10)
+    """Seleciona até max_items matérias Alta (home_priority) na janela recente.
+
+    A janela é um range em ``published_ts`` (índice) — sem varrer o acervo
+    e reparsear datas em Python. Matérias sem data legível (``published_ts =
+    0``) continuam entrando, como antes, se forem mais novas (por id) que a
+    primeira da janela.
+    """
+    cutoff = int(time.time()) - max(1, lookback_hours) * 3600
     try:
         result = client.execute(
             """
-            SELECT id, titulo, resumo, tag,
-                   COALESCE(home_priority, 0) AS prio,
-                   COALESCE(NULLIF(published_at, ''), created_at) AS data_publicacao
+            SELECT id, titulo, resumo, tag, COALESCE(home_priority, 0) AS prio
             FROM news
-            WHERE COALESCE(home_priority, 0) >= ?
+            WHERE (
+                published_ts >= ?
+                OR (published_ts = 0 AND id >= (SELECT MIN(id) FROM news WHERE published_ts >= ?))
+            )
+              AND COALESCE(home_priority, 0) >= ?
               AND LENGTH(COALESCE(resumo, '')) >= 200
             ORDER BY COALESCE(home_priority, 0) DESC, id DESC
             LIMIT ?
             """,
-            [min_priority, limit],
+            [cutoff, cutoff, min_priority, max(1, max_items) + 5],
         )
     except Exception:
         return []
 
-    cutoff = _now_local().timestamp() - max(1, lookback_hours) * 3600
     items: list[dict[str, str]] = []
     origin = site_origin()
     for row in result.rows or []:
         prio = int(row[4] or 0)
         if prio < min_priority:
             continue
-        published = core.parse_article_datetime(row[5] if len(row) > 5 else None)
-        if published is not None and published.timestamp() < cutoff:
-            continue
         nid = int(row[0])
         titulo = str(row[1] or "").strip()
         if not titulo:
@@ -0,0 +1,66 @@
+/**
+ * Autocomplete da busca: inputs com data-search-suggest consultam
+ * /api/search-suggest (termos do índice + títulos) e preenchem o datalist.
+ * Escolher um título abre a matéria direto, sem passar pela listagem.
+ */
+(function () {
+  var list = document.getElementById("search-suggest-list");
+  if (!list) return;
+  var cache = {};
+  var titles = {};
+  var timer = null;
+  var pending = null;
+
+  function render(data) {
+    list.textContent = "";
+    titles = {};
+    (data.terms || []).forEach(function (term) {
+      var opt = document.createElement("option");
+      opt.value = term;
+      list.appendChild(opt);
+    });
+    (data.titles || []).forEach(function (item) {
+      var opt = document.createElement("option");
+      opt.value = item.titulo;
+      titles[item.titulo] = item.id;
+      list.appendChild(opt);
+    });
+  }
+
+  function lookup(value) {
+    var key = value.trim().toLowerCase();
+    if (key.length < 2) return;
+    if (cache[key]) {
+      render(cache[key]);
+      return;
+    }
+    if (pending) pending.abort();
+    pending = new AbortController();
+    fetch("/api/search-suggest?q=" + encodeURIComponent(key), { signal: pending.signal })
+      .then(function (resp) {
+        return resp.ok ? resp.json() : null;
+      })
+      .then(function (data) {
+        if (!data) return;
+        cache[key] = data;
+        render(data);
+      })
+      .catch(function () {});
+  }
+
+  document.querySelectorAll("input[data-search-suggest]").forEach(function (input) {
+    input.setAttribute("list", "search-suggest-list");
+    input.setAttribute("autocomplete", "off");
+    input.addEventListener("input", function () {
+      var id = titles[input.value];
+      if (id) {
+        window.location.href = "/noticia/" + id;
+        return;
+      }
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        lookup(input.value);
+      }, 150);
+    });
+  });
+})();
@@ -1,8 +1,8 @@
-"""Testes do programa de colunistas (schema lógico via mocks)."""
+"""Testes do programa de colunistas (schema lógico via mocks; SQLite real via ``sqlite_db``)."""
 from __future__ import annotations
 
 import os
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 os.environ.setdefault("SESSION_SECRET", "test-session-secret")
 os.environ.setdefault("IP_HASH_SALT", "test-ip-salt")
@@ -10,6 +10,7 @@ os.environ.setdefault("COLUMNIST_SHARE_RATE", "0.35")
 os.environ.setdefault("COLUMNIST_SITE_RPM_BRL", "10")
 
 import columnists
+from db import get_db, reset_db_client, run_batch
 
 
 class FakeResult:
@@ -23,6 +24,9 @@ class FakeDb:
         self.applications = []
         self.news = []
         self.views = []
+        self.daily = {}
+        self.balances = {}
+        self.credit_runs = {}
         self.ledger = []
         self.payouts = []
         self.boosts = []
@@ -32,6 +36,10 @@ class FakeDb:
         params = list(params or [])
         s = " ".join(sql.split()).lower()
 
+        # Derivados mantidos no mesmo batch no Turso (log FTS, contadores por tag).
+        if "news_fts_changes" in s or "news_tag_stats" in s:
+            return FakeResult()
+
         if "insert into columnist_applications" in s:
             row = {
                 "id": self._id,
@@ -157,33 +165,57 @@ class FakeDb:
                     n["published_at"] = params[1]
             return FakeResult()
 
-        if "insert into page_views" in s:
+        if "insert or ignore into page_views" in s:
             key = (params[0], params[2], params[4])
-            if any((v[0], v[2], v[4]) == key for v in self.views):
-                raise Exception("unique")
-            self.views.append(params)
+            if not any((v[0], v[2], v[4]) == key for v in self.views):
+                self.views.append(params)
+            return FakeResult()
+
+        if "insert into page_views_daily" in s:
+            news_id, author_id, day = params[0], params[1], params[2]
+            views = sum(1 for v in self.views if v[0] == news_id and v[4] == day)
+            self.daily[(news_id, day)] = (author_id, views)
             return FakeResult()
 
-        if "select count(*) from page_views where author_id" in s:
-            return FakeResult([[sum(1 for v in self.views if v[1] == params[0])]])
+        if "from page_views_daily where author_id" in s:
+            return FakeResult([[sum(c for a, c in self.daily.values() if a == params[0])]])
 
-        if "select count(*) from page_views where news_id" in s:
-            return FakeResult([[sum(1 for v in self.views if v[0] == params[0])]])
+        if "from page_views_daily where news_id" in s:
+            return FakeResult([[sum(c for (n, _), (_, c) in self.daily.items() if n == params[0])]])
 
-        if "from page_views where day" in s and "group by" in s:
-            buckets: dict[tuple, int] = {}
-            for v in self.views:
-                if v[4] == params[0]:
-                    buckets[(v[1], v[0])] = buckets.get((v[1], v[0]), 0) + 1
-            return FakeResult([[a, n, c] for (a, n), c in buckets.items()])
+        if "from page_views_daily where day" in s:
+            return FakeResult([[a, n, c] for (n, d), (a, c) in self.daily.items() if d == params[0]])
 
-        if "from wallet_ledger where kind" in s:
+        if "insert into credit_runs" in s:
+            run = self.credit_runs.get(params[0])
+            if not run or run[0] != "done":
+                self.credit_runs[params[0]] = ("running", params[1])
             return FakeResult()
 
+        if "select status, started_at from credit_runs" in s:
+            run = self.credit_runs.get(params[0])
+            return FakeResult([list(run)] if run else [])
+
+        if "update credit_runs set status = 'done'" in s:
+            if self.credit_runs.get(params[2]) == ("running", params[3]):
+                self.credit_runs[params[2]] = ("done", params[3])
+            return FakeResult()
+
+        if "from credit_runs where" in s and self.credit_runs.get(params[-2]) != ("done", params[-1]):
+            return FakeResult()  # guarda do run dono do dia
+
         if "insert into wallet_ledger" in s:
-            self.ledger.append(params)
+            self.ledger.append(params[:6])
             return FakeResult()
 
+        if "insert into wallet_balances" in s:
+            self.balances[params[0]] = self.balances.get(params[0], 0.0) + float(params[1])
+            return FakeResult()
+
+        if "from wallet_balances where user_id" in s:
+            uid = params[0]
+            return FakeResult([[self.balances[uid]]] if uid in self.balances else [])
+
         if "sum(amount_brl)" in s:
             uid = params[0]
             total = sum(float(e[2]) for e in self.ledger if e[0] == uid)
@@ -309,13 +341,165 @@ def test_pageview_dedupe_and_credit():
     )
     assert columnists.record_page_view(db, 10, author_id=5, ip="1.1.1.1", user_agent="ua")
     assert not columnists.record_page_view(db, 10, author_id=5, ip="1.1.1.1", user_agent="ua")
+    assert db.views == []  # nada gravado no request
+    assert columnists.flush_page_views(db) == 1
     # força day no registro
     day = db.views[0][4]
     result = columnists.credit_daily_shares(db, day=day)
     assert result["ok"] is True
     assert result["entries"] >= 1
     assert columnists.wallet_balance(db, 5) > 0
+    assert columnists.wallet_balance(db, 5) == sum(float(e[2]) for e in db.ledger if e[0] == 5)
+    assert columnists.credit_daily_shares(db, day=day)["skipped"] is True
+    assert len(db.ledger) == result["entries"]
+
 
+def test_credit_daily_resumes_crashed_run():
+    db = FakeDb()
+    columnists.record_page_view(db, 11, author_id=6, ip="3.3.3.3", user_agent="ua")
+    columnists.flush_page_views(db)
+    day = db.views[0][4]
+    db.credit_runs[day] = ("running", "2000-01-01T00:00:00.000000Z")  # run que caiu
+    result = columnists.credit_daily_shares(db, day=day)
+    assert result.get("skipped") is None and result["entries"] == 1
+    assert db.credit_runs[day][0] == "done"
+    assert len(db.ledger) == 1
+
+
+def test_pageview_buffer_requeues_on_flush_error():
+    class Down(FakeDb):
+        def execute(self, sql: str, params=None):
+            raise RuntimeError("turso fora")
+
+    down, db = Down(), FakeDb()
+    for i in range(3):
+        assert columnists.record_page_view(down, 30, author_id=7, ip=f"10.0.0.{i}", user_agent="ua")
+    assert columnists.flush_page_views(down) == 0
+    assert columnists.flush_page_views(db) == 3
+    assert {v[0] for v in db.views} == {30}
+    assert columnists.flush_page_views(db) == 0
+
+
+def test_page_views_daily_rollup_and_prune(sqlite_db) -> None:
+    client = sqlite_db
+    old = [7, 3, "h-old", None, "2020-01-01", "2020-01-01T00:00:00Z"]
+    client.execute(columnists._PAGE_VIEW_INSERT_SQL, old)
+    client.execute(columnists._PAGE_VIEW_ROLLUP_SQL, [7, 3, "2020-01-01", 7, "2020-01-01"])
+
+    for ip in ("1.1.1.1", "2.2.2.2", "1.1.1.1"):
+        columnists.record_page_view(client, 7, author_id=3, ip=ip, user_agent="ua")
+    assert columnists.flush_page_views(client) == 2
+    # View já gravada (outro processo) é ignorada e não infla o rollup.
+    columnists._PAGE_VIEWS.seen.clear()
+    columnists.record_page_view(client, 7, author_id=3, ip="2.2.2.2", user_agent="ua")
+    assert columnists.flush_page_views(client) == 1
+    assert columnists.count_views(client, news_id=7) == 3
+    assert columnists.count_views(client, author_id=3) == 3
+
+    assert columnists.prune_page_views(client, keep_days=30, batch_size=1) == 1
+    assert client.execute("SELECT COUNT(*) FROM page_views").rows[0][0] == 2
+    assert columnists.count_views(client, news_id=7) == 3
+
+
+def test_wallet_balances_follow_ledger_and_reconcile(sqlite_db) -> None:
+    client = sqlite_db
+    now = columnists.utc_now_iso()
+    client.execute(
+        "INSERT INTO users (name, email, created_at, pix_key) VALUES ('Ana', 'a@x.com', ?, 'pix-ana')",
+        [now],
+    )
+    run_batch(client, columnists._ledger_statements(1, "daily_share", 80.0, now=now))
+    assert columnists.wallet_balance(client, 1) == 80.0
+
+    with patch.object(columnists, "payout_min_brl", return_value=10.0):
+        columnists.request_payout(client, 1, 50.0)
+    assert columnists.wallet_balance(client, 1) == 30.0
+    columnists.settle_payout(client, 1, paid=False)
+    assert columnists.wallet_balance(client, 1) == 80.0
+    assert columnists.reconcile_wallet_balances(client)["mismatches"] == []
+
+    # Lançamento fora do helper: o job acusa e corrige pelo ledger.
+    client.execute(columnists._LEDGER_INSERT_SQL, [1, "adjust", -5.0, None, None, now])
+    client.execute("INSERT INTO wallet_balances (user_id, balance_brl, updated_at) VALUES (9, 3, ?)", [now])
+    out = columnists.reconcile_wallet_balances(client)
+    assert sorted(m["user_id"] for m in out["mismatches"]) == [1, 9]
+    assert columnists.wallet_balance(client, 1) == 75.0
+    assert columnists.wallet_balance(client, 9) == 0.0
+    assert columnists.reconcile_wallet_balances(client)["mismatches"] == []
+
+    # Crédito diário: registro em credit_runs, lançamentos e saldo no mesmo lote.
+    client.execute(
+        "INSERT INTO page_views_daily (news_id, author_id, day, views) VALUES (4, 1, '2026-03-01', 2000)"
+    )
+    client.execute(
+        "INSERT INTO credit_runs (day, status, started_at) VALUES ('2026-03-01', 'running', 'x')"
+    )
+    with patch.object(columnists, "site_rpm_brl", return_value=10.0), patch.object(
+        columnists, "columnist_share_rate", return_value=0.5
+    ):
+        out = columnists.credit_daily_shares(client, day="2026-03-01")
+        assert out["entries"] == 1 and out["credited"] == 10.0
+        assert columnists.credit_daily_shares(client, day="2026-03-01")["skipped"] is True
+    assert columnists.wallet_balance(client, 1) == 85.0
+    assert client.execute("SELECT status FROM credit_runs WHERE day = '2026-03-01'").rows[0][0] == "done"
+    assert columnists.reconcile_wallet_balances(client)["mismatches"] == []
+
+
+def test_boost_expiry_uses_partial_index_and_schedule(sqlite_db) -> None:
+    client = sqlite_db
+    try:
+        insert = "INSERT INTO news (titulo, link, home_priority, boost_until) VALUES (?, ?, ?, ?)"
+        client.execute(insert, ["velho", "l1", 90, "2020-01-01T00:00:00Z"])
+        client.execute(insert, ["futuro", "l2", 90, "2999-01-01T00:00:00Z"])
+        client.execute(insert, ["sem", "l3", 10, None])
+
+        plan = client.execute(
+            "EXPLAIN QUERY PLAN SELECT MIN(boost_until) FROM news "
+            "WHERE boost_until IS NOT NULL AND boost_until != ''"
+        ).rows
+        assert any("idx_news_boost_until" in str(r[-1]) for r in plan)
+
+        assert columnists.expire_boosts(client) == 1
+        assert columnists._BOOST_EXPIRY.next_at == "2999-01-01T00:00:00Z"
+        assert client.execute("SELECT home_priority, boost_until FROM news WHERE id = 1").rows[0] == (50, None)
+        assert columnists._BOOST_EXPIRY._seconds_until_next() == columnists._boost_expiry_recheck_sec()
+        columnists._BOOST_EXPIRY.schedule("2000-01-01T00:00:00Z")
+        assert columnists._BOOST_EXPIRY._seconds_until_next() == 0.0
+    finally:
+        columnists._BOOST_EXPIRY.next_at = None
+        columnists._BOOST_EXPIRY.wake.clear()
+
+
+def test_boost_expiry_worker_follows_client_reset(sqlite_db) -> None:
+    insert = "INSERT INTO news (titulo, link, home_priority, boost_until) VALUES (?, ?, ?, ?)"
+    sqlite_db.execute(insert, ["velho", "l1", 90, "2020-01-01T00:00:00Z"])
+    expired: list[int] = []
+    try:
+        assert columnists._BOOST_EXPIRY.tick(expired.append) == 1
+        # Restore/reset fecha o client do boot; a volta seguinte usa o novo.
+        reset_db_client()
+        get_db().execute(insert, ["vencido", "l2", 90, "2020-01-02T00:00:00Z"])
+        assert columnists._BOOST_EXPIRY.tick(expired.append) == 1
+        assert expired == [1, 1]
+        assert get_db().execute("SELECT COUNT(*) FROM news WHERE boost_until IS NULL").rows[0][0] == 2
+    finally:
+        columnists._BOOST_EXPIRY.next_at = None
+        columnists._BOOST_EXPIRY.wake.clear()
+
+
+def test_boost_expiry_clears_unparseable_until(sqlite_db) -> None:
+    insert = "INSERT INTO news (titulo, link, home_priority, boost_until) VALUES (?, ?, ?, ?)"
+    sqlite_db.execute(insert, ["torto", "l1", 90, "0000-lixo"])
+    sqlite_db.execute(insert, ["futuro", "l2", 90, "2999-01-01T00:00:00Z"])
+    try:
+        assert columnists.next_boost_expiry(sqlite_db) == "2999-01-01T00:00:00Z"
+        assert sqlite_db.execute("SELECT home_priority, boost_until FROM news WHERE id = 1").rows[0] == (50, None)
+        # Valor ilegível no agendamento: espera o recheck, sem laço quente.
+        columnists._BOOST_EXPIRY.next_at = "lixo"
+        assert columnists._BOOST_EXPIRY._seconds_until_next() == columnists._boost_expiry_recheck_sec()
+    finally:
+        columnists._BOOST_EXPIRY.next_at = None
+        columnists._BOOST_EXPIRY.wake.clear()
 
 def test_boost_activate_caps_priority():
     db = FakeDb()
@@ -11,15 +11,23 @@ os.environ.setdefault("IP_HASH_SALT", "test-ip-salt")
 
 from community_auth import (
     authenticate_local,
+    COMMENT_PAGE_SIZE,
+    cached_session_user,
     can_resend_verification,
     create_comment,
     create_user,
+    decode_comment_cursor,
     delete_own_comment,
     generate_verify_token,
     hash_password,
+    invalidate_comment_cache,
+    invalidate_user_cache,
+    list_comments,
+    list_comments_page,
     is_verify_token_expired,
     issue_email_verification,
     parse_consent_cookie,
+    upvote_comment,
     verify_email_token,
     verify_password,
 )
@@ -342,6 +350,7 @@ def test_delete_own_comment_ok():
         MagicMock(rows=[]),  # DELETE votes
         MagicMock(rows=[]),  # DELETE replies
         MagicMock(rows=[]),  # DELETE comment
+        MagicMock(rows=[]),  # UPDATE news.comment_count
     ]
     result = delete_own_comment(client, 10, 5)
     assert result["ok"] is True
@@ -394,8 +403,8 @@ def test_avatar_upload_uses_railway_volume_path():
 def test_create_comment_json_payload_includes_user_id():
     client = MagicMock()
     client.execute.side_effect = [
-        MagicMock(rows=[]),  # INSERT
-        MagicMock(rows=[(42,)]),  # SELECT id
+        MagicMock(rows=[(42,)]),  # INSERT … RETURNING id
+        MagicMock(rows=[]),  # UPDATE news.comment_count
     ]
     result = create_comment(
         client,
@@ -412,6 +421,110 @@ def test_create_comment_json_payload_includes_user_id():
     assert result["status"] == "published"
 
 
+def test_comment_returning_and_single_vote(sqlite_db):
+    client = sqlite_db
+    invalidate_comment_cache()
+    client.execute("INSERT INTO news (titulo, link) VALUES (?, ?)", ["n", "l1"])
+    client.execute(
+        "INSERT INTO users (name, email, created_at) VALUES (?, ?, ?)",
+        ["Ana", "ana@example.com", "2026-01-01T00:00:00Z"],
+    )
+    consent = {"necessary": True, "analytics": False, "preferences": False}
+    out = create_comment(
+        client, news_id=1, user_id=1, body="Boa análise.", parent_id=None,
+        ip=None, headers={}, consent=consent,
+    )
+    assert out["id"] == 1
+    assert client.execute("SELECT comment_count FROM news WHERE id = 1").rows[0][0] == 1
+
+    assert upvote_comment(client, 1, 7) is True
+    assert upvote_comment(client, 1, 7) is False
+    assert upvote_comment(client, 99, 7) is False
+    assert client.execute("SELECT upvotes FROM comments WHERE id = 1").rows[0][0] == 1
+    assert client.execute("SELECT COUNT(*) FROM comment_votes").rows[0][0] == 1
+
+
+def test_comment_pages_skip_hidden_rows_and_merge_own_pending(sqlite_db):
+    client = sqlite_db
+    invalidate_comment_cache()
+    client.execute("INSERT INTO news (titulo, link) VALUES (?, ?)", ["n", "l1"])
+    for name in ("Ana", "Bia"):
+        client.execute(
+            "INSERT INTO users (name, email, created_at) VALUES (?, ?, '2026-01-01T00:00:00Z')",
+            [name, f"{name.lower()}@example.com"],
+        )
+    insert = (
+        "INSERT INTO comments (news_id, user_id, body, status, created_at) "
+        "VALUES (1, ?, ?, ?, '2026-01-01T00:00:00Z')"
+    )
+    size = COMMENT_PAGE_SIZE
+    # Thread começa com ocultos de outra pessoa: a página não pode vir vazia.
+    for i in range(size + 1):
+        client.execute(insert, [2, f"oculto {i}", "blocked"])
+    for i in range(size + 2):
+        client.execute(insert, [1, f"pub {i}", "published"])
+    client.execute(insert, [1, "meu pendente", "pending"])
+
+    first = list_comments_page(client, 1)
+    assert [c["body"] for c in first["comments"]] == [f"pub {i}" for i in range(size)]
+    assert first["total"] == size + 2 and first["next_cursor"]
+    assert len(list_comments_page(client, 1, include_pending_for_user=2)["comments"]) == 2 * size
+
+    after = decode_comment_cursor(first["next_cursor"])
+    viewer = list_comments_page(client, 1, after=after, include_pending_for_user=1)
+    assert [c["body"] for c in viewer["comments"]] == [f"pub {size}", f"pub {size + 1}", "meu pendente"]
+    assert viewer["next_cursor"] is None
+    assert list_comments_page(client, 1, include_pending_for_user=1)["total"] == size + 3
+
+
+def test_session_user_cache_hits_and_invalidates():
+    import columnists
+
+    loads: list[int] = []
+
+    def load(uid: int):
+        loads.append(uid)
+        return {"id": uid, "name": f"U{len(loads)}", "role": "user"}
+
+    invalidate_user_cache()
+    first = cached_session_user(41, load)
+    first["name"] = "mutado"  # cópia: não contamina o cache
+    assert cached_session_user(41, load)["name"] == "U1"
+    assert loads == [41]
+
+    columnists.set_user_pix_key(MagicMock(), 41, "pix")
+    assert cached_session_user(41, load)["name"] == "U2"
+    invalidate_user_cache()
+    assert cached_session_user(41, load)["name"] == "U3"
+    assert loads == [41, 41, 41]
+
+
+def test_comment_thread_cache_filters_viewer_and_invalidates():
+    rows = [(1, 9, 5, None, "publicado", "published", "2026-01-01T00:00:00Z", None, 0, "Ana", None)]
+    own = [(2, 9, 6, None, "bloqueado", "blocked", "2026-01-01T00:01:00Z", None, 0, "Bia", None)]
+    client = MagicMock()
+    client.execute.return_value = MagicMock(rows=rows)
+    invalidate_comment_cache()
+
+    assert list_comments(client, 9, comment_count=0) == []
+    assert client.execute.call_count == 0
+    assert [c["id"] for c in list_comments(client, 9)] == [1]
+    assert [c["id"] for c in list_comments(client, 9)] == [1]
+    assert client.execute.call_count == 1
+
+    # Pendentes do visitante: consulta própria, fora do cache compartilhado.
+    client.execute.return_value = MagicMock(rows=own)
+    assert [c["id"] for c in list_comments(client, 9, include_pending_for_user=6)] == [1, 2]
+    assert client.execute.call_count == 2
+    assert client.execute.call_args.args[1] == [9, 6, COMMENT_PAGE_SIZE]
+
+    client.execute.return_value = MagicMock(rows=[(9,)])  # UPDATE … RETURNING news_id
+    assert upvote_comment(client, 1, 7) is True
+    client.execute.return_value = MagicMock(rows=rows)
+    list_comments(client, 9)
+    assert "FROM comments c" in client.execute.call_args.args[0]
+
+
 if __name__ == "__main__":
     test_profanity_blocks_common_terms()
     test_profanity_allows_clean_finance_text()
@@ -434,4 +547,6 @@ if __name__ == "__main__":
     test_delete_own_comment_not_found()
     test_avatar_upload_uses_railway_volume_path()
     test_create_comment_json_payload_includes_user_id()
+    test_session_user_cache_hits_and_invalidates()
+    test_comment_thread_cache_filters_viewer_and_invalidates()
     print("OK test_community")
@@ -133,6 +133,23 @@ def test_exhausted_keyerror_becomes_unavailable():
     raise AssertionError("KeyError persistente deveria virar 503 DatabaseUnavailableError")
 
 
+def test_run_batch_forwards_max_attempts():
+    db.reset_turso_circuit()
+    env = {"TURSO_RETRY_BASE_SEC": "0.01", "TURSO_EXECUTE_RETRIES": "3", "TURSO_CIRCUIT_FAILURES": "99"}
+    stmts = [("UPDATE news SET titulo = ? WHERE id = ?", ["x", 1])]
+    with (
+        patch.dict("os.environ", env, clear=False),
+        patch.object(db, "_create_client", lambda: db.PooledClient(FakeInner())),
+    ):
+        # Retry padrão: a falha transitória se resolve na reconexão.
+        assert len(db.run_batch(db.PooledClient(FakeInner(fail_times=1)), stmts)) == 1
+        try:
+            db.run_batch(db.PooledClient(FakeInner(fail_times=1)), stmts, max_attempts=1)
+        except db.DatabaseUnavailableError:
+            return
+    raise AssertionError("max_attempts=1 deveria falhar na 1ª tentativa")
+
+
 def test_circuit_fail_fast_after_threshold():
     db.reset_turso_circuit()
     pooled = db.PooledClient(FakeInner(fail_times=99))
@@ -265,16 +282,273 @@ def test_pipeline_blocked_quota_error():
     raise AssertionError("BLOCKED deveria virar TursoQuotaError")
 
 
+def test_local_reads_use_pool_while_writer_busy(tmp_path):
+    """SELECT não pode esperar o lock do escritor (leitores WAL independentes)."""
+    local = db.LocalDbClient(str(tmp_path / "pool.db"), readers=2)
+    try:
+        local.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        local.execute("INSERT INTO t (v) VALUES (?)", ["a"])
+        assert local.execute("SELECT v FROM t").rows == [("a",)]
+
+        done = threading.Event()
+        with local._lock:
+            # Escritor ocupado: leitura em outra thread deve concluir mesmo assim.
+            worker = threading.Thread(
+                target=lambda: (local.execute("SELECT COUNT(*) FROM t"), done.set())
+            )
+            worker.start()
+            assert done.wait(2.0), "leitura ficou presa no lock de escrita"
+        worker.join()
+
+        try:
+            local._execute_read("DELETE FROM t", None)
+        except Exception as exc:
+            assert "readonly" in str(exc).lower()
+        else:
+            raise AssertionError("conexão de leitura deveria ser query_only")
+        assert local.execute("SELECT COUNT(*) FROM t").rows == [(1,)]
+    finally:
+        local.close_hard()
+
+
+def test_cte_write_goes_to_writer(tmp_path):
+    local = db.LocalDbClient(str(tmp_path / "cte.db"), readers=2)
+    try:
+        local.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        local.execute("WITH src(v) AS (SELECT ?) INSERT INTO t (v) SELECT v FROM src", ["a"])
+        local.execute("WITH alvo AS (SELECT id FROM t) UPDATE t SET v = 'b' WHERE id IN alvo")
+        assert local.execute("WITH x AS (SELECT v FROM t) SELECT v FROM x").rows == [("b",)]
+        assert db._is_read_statement("WITH x AS (SELECT 'update' AS v) SELECT v FROM x")
+        assert not db._is_read_statement("with x as (select 1) delete from t")
+    finally:
+        local.close_hard()
+
+
+def test_local_batch_is_atomic(tmp_path):
+    local = db.LocalDbClient(str(tmp_path / "batch.db"), readers=1)
+    try:
+        local.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+        db.run_batch(local, [("INSERT INTO t (v) VALUES (?)", ["a"]), ("INSERT INTO t (v) VALUES (?)", ["b"])])
+        try:
+            local.execute_many("INSERT INTO t (v) VALUES (?)", [["c"], ["a"]])
+        except Exception:
+            pass
+        else:
+            raise AssertionError("UNIQUE deveria falhar o lote")
+        assert local.execute("SELECT v FROM t ORDER BY v").rows == [("a",), ("b",)]
+
+        with db.transaction(local) as tx:
+            tx.execute("INSERT INTO t (v) VALUES (?)", ["d"])
+            assert tx.execute("SELECT COUNT(*) FROM t").rows == [(3,)]
+        assert local.execute("SELECT COUNT(*) FROM t").rows == [(3,)]
+    finally:
+        local.close_hard()
+
+
+def test_pipeline_batch_single_request():
+    client = db.TursoPipelineClient("https://example.turso.io", "token-teste")
+    ok = {"cols": [], "rows": [], "affected_row_count": 1}
+    mock_resp = MagicMock()
+    mock_resp.status_code = 200
+    mock_resp.ok = True
+    mock_resp.json.return_value = {
+        "results": [
+            {
+                "type": "ok",
+                "response": {
+                    "type": "batch",
+                    "result": {
+                        "step_results": [ok, ok, ok, ok, None],
+                        "step_errors": [None, None, None, None, None],
+                    },
+                },
+            },
+            {"type": "ok", "response": {"type": "close"}},
+        ]
+    }
+    with patch.object(client._session, "post", return_value=mock_resp) as post:
+        results = client.batch(
+            [("INSERT INTO t (v) VALUES (?)", ["a"]), ("UPDATE t SET v = ?", ["b"])]
+        )
+    assert len(results) == 2
+    assert post.call_count == 1
+    steps = post.call_args.kwargs["json"]["requests"][0]["batch"]["steps"]
+    assert [s["stmt"]["sql"] for s in steps][0] == "BEGIN"
+    assert steps[-2]["stmt"]["sql"] == "COMMIT"
+    assert steps[-1]["stmt"]["sql"] == "ROLLBACK"
+
+
+def test_run_returning_refuses_buffered_transaction():
+    tx = db._BufferedTransaction(MagicMock())
+    try:
+        db.run_returning(tx, [("INSERT INTO t (v) VALUES (?) RETURNING id", ["a"])])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("transação bufferizada não devolve RETURNING")
+    assert tx._pending == []
+
+
+def test_pipeline_batch_step_error_raises():
+    client = db.TursoPipelineClient("https://example.turso.io", "token-teste")
+    mock_resp = MagicMock()
+    mock_resp.status_code = 200
+    mock_resp.ok = True
+    mock_resp.json.return_value = {
+        "results": [
+            {
+                "type": "ok",
+                "response": {
+                    "type": "batch",
+                    "result": {
+                        "step_results": [{"cols": [], "rows": []}, None, None, {"cols": [], "rows": []}],
+                        "step_errors": [None, {"message": "UNIQUE constraint failed: t.v"}, None, None],
+                    },
+                },
+            }
+        ]
+    }
+    with patch.object(client._session, "post", return_value=mock_resp):
+        try:
+            client.batch([("INSERT INTO t (v) VALUES (?)", ["a"])])
+        except RuntimeError as exc:
+            assert "unique" in str(exc).lower()
+            return
+    raise AssertionError("erro de passo deveria abortar o batch")
+
+
+def test_query_stats_fingerprint_and_percentiles(tmp_path):
+    assert db.sql_fingerprint("SELECT * FROM news WHERE id = 5 AND tag = 'Juros'") == (
+        "SELECT * FROM news WHERE id = ? AND tag = ?"
+    )
+    assert db.sql_fingerprint("SELECT link FROM news WHERE link IN (?, ?,?)") == (
+        "SELECT link FROM news WHERE link IN (?+)"
+    )
+    db.reset_query_stats()
+    local = db.LocalDbClient(str(tmp_path / "stats.db"), readers=1)
+    try:
+        local.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+        local.execute_many("INSERT INTO t (id) VALUES (?)", [[1], [2], [3]])
+        for i in range(1, 4):
+            local.execute(f"SELECT id FROM t WHERE id <= {i}")
+    finally:
+        local.close_hard()
+    stats = db.query_stats(sort="count")
+    by_fp = {q["fingerprint"]: q for q in stats["queries"]}
+    select = by_fp["SELECT id FROM t WHERE id <= ?"]
+    assert select["count"] == 3
+    assert select["rows"] == 6
+    assert select["p50_ms"] <= select["p99_ms"] <= select["max_ms"]
+    assert by_fp["INSERT INTO t (id) VALUES (?)"]["count"] == 3
+
+
+def _pipeline_resp(baton=None, *, error=None, code="STREAM_EXPIRED"):
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.ok = True
+    if error:
+        item = {"type": "error", "error": {"message": error, "code": code}}
+    else:
+        item = {
+            "type": "ok",
+            "response": {"type": "execute", "result": {"cols": [], "rows": [[{"type": "integer", "value": "1"}]]}},
+        }
+    resp.json.return_value = {"baton": baton, "base_url": None, "results": [item]}
+    return resp
+
+
+def test_session_reuses_baton_and_recovers_expired_stream():
+    client = db.TursoPipelineClient("https://example.turso.io", "token-teste")
+    responses = [
+        _pipeline_resp("b1"),
+        _pipeline_resp("b2"),
+        _pipeline_resp(None, error="stream expired (baton invalido)"),
+        _pipeline_resp("b3"),
+    ]
+    with (
+        patch.object(client._session, "post", side_effect=responses) as post,
+        patch.object(db, "_close_stream_async") as closer,
+    ):
+        with db.turso_session(client):
+            assert client.execute("SELECT 1").rows == [(1,)]
+            assert client.execute("SELECT 1").rows == [(1,)]
+            assert client.execute("SELECT 1").rows == [(1,)]
+        bodies = [c.kwargs["json"] for c in post.call_args_list]
+    assert bodies[0]["baton"] is None
+    assert bodies[1]["baton"] == "b1"
+    assert bodies[2]["baton"] == "b2"
+    # Baton expirado: refaz uma vez num stream novo.
+    assert bodies[3]["baton"] is None
+    assert all(r["type"] != "close" for b in bodies for r in b["requests"])
+    closer.assert_called_once_with(client, "b3", None)
+
+
+def test_session_does_not_replay_sql_errors_mentioning_stream():
+    client = db.TursoPipelineClient("https://example.turso.io", "token-teste")
+    responses = [
+        _pipeline_resp("b1"),
+        _pipeline_resp("b2", error="no such table: stream_events", code="SQLITE_ERROR"),
+    ]
+    with (
+        patch.object(client._session, "post", side_effect=responses) as post,
+        patch.object(db, "_close_stream_async"),
+    ):
+        with db.turso_session(client):
+            client.execute("SELECT 1")
+            try:
+                client.execute("SELECT * FROM stream_events")
+            except RuntimeError as exc:
+                assert "stream_events" in str(exc)
+            else:
+                raise AssertionError("erro de SQL deveria subir")
+    assert post.call_count == 2
+    assert not db._is_stream_error(RuntimeError("Turso HTTP 400: {\"message\": \"bad stream arg\"}"))
+    assert db._is_stream_error(RuntimeError('Turso HTTP 400: {"code": "BATON_INVALID"}'))
+
+
+def test_session_closes_stream_with_the_client_that_opened_it():
+    first = db.TursoPipelineClient("https://a.turso.io", "token-a")
+    second = db.TursoPipelineClient("https://b.turso.io", "token-b")
+    with (
+        patch.object(first._session, "post", return_value=_pipeline_resp("a1")),
+        patch.object(second._session, "post", return_value=_pipeline_resp("b1")) as post_b,
+        patch.object(db, "_close_stream_async") as closer,
+    ):
+        with db.turso_session(first):
+            first.execute("SELECT 1")
+            # Outro cliente no mesmo bloco não herda o baton do primeiro.
+            second.execute("SELECT 1")
+    assert post_b.call_args.kwargs["json"]["baton"] is None
+    assert [c.args for c in closer.call_args_list] == [(first, "a1", None), (second, "b1", None)]
+
+
+def test_without_session_each_execute_closes_stream():
+    client = db.TursoPipelineClient("https://example.turso.io", "token-teste")
+    with patch.object(client._session, "post", return_value=_pipeline_resp(None)) as post:
+        client.execute("SELECT 1")
+    body = post.call_args.kwargs["json"]
+    assert "baton" not in body
+    assert body["requests"][-1] == {"type": "close"}
+
+
 if __name__ == "__main__":
     test_client_closed_is_transient()
     test_reconnect_swaps_inner_only_once()
     test_concurrent_execute_survives_reconnect()
     test_execute_reraises_non_transient()
     test_exhausted_keyerror_becomes_unavailable()
+    test_run_batch_forwards_max_attempts()
     test_circuit_fail_fast_after_threshold()
     test_quota_block_is_not_transient()
     test_quota_block_trips_circuit_without_retry()
     test_pipeline_parses_execute_result()
     test_pipeline_error_body_is_protocol_error()
     test_pipeline_blocked_quota_error()
+    test_pipeline_batch_single_request()
+    test_run_returning_refuses_buffered_transaction()
+    test_pipeline_batch_step_error_raises()
+    test_session_reuses_baton_and_recovers_expired_stream()
+    test_session_does_not_replay_sql_errors_mentioning_stream()
+    test_session_closes_stream_with_the_client_that_opened_it()
+    test_without_session_each_execute_closes_stream()
     print("PASS: test_db_pool")
@@ -164,6 +164,53 @@ def test_daily_digest_caps_at_two_alta_and_skips_empty():
     assert sent.get("ok") is True
 
 
+def test_published_ts_backfill_and_digest_window(tmp_path=None):
+    import tempfile
+
+    import db
+
+    folder = tmp_path or tempfile.mkdtemp()
+    client = db.LocalDbClient(os.path.join(str(folder), "ts.db"), readers=0)
+    try:
+        db.ensure_schema(client, force=True)
+        now = datetime.now()
+        recent = (now - timedelta(hours=3)).strftime("%d/%m/%Y %H:%M")
+        old = (now - timedelta(days=10)).strftime("%d/%m/%Y %H:%M")
+        resumo = "r" * 220
+        client.execute_many(
+            "INSERT INTO news (titulo, resumo, link, tag, published_at, home_priority) "
+            "VALUES (?, ?, ?, 'Juros', ?, 100)",
+            [
+                ["Sem data antiga", resumo, "https://x.test/0", "outro dia"],
+                ["Recente", resumo, "https://x.test/1", recent],
+                ["Antiga", resumo, "https://x.test/2", old],
+                ["Sem data", resumo, "https://x.test/3", "ontem"],
+            ],
+        )
+        assert db.backfill_published_ts(client, batch_size=2) == 4
+        assert db.backfill_published_ts(client) == 0
+        rows = client.execute("SELECT titulo, published_ts FROM news ORDER BY id").rows
+        assert rows[1][1] == db.article_timestamp(recent)
+        assert rows[3][1] == 0
+
+        # Sem data legível entra se for mais nova (por id) que a 1ª da janela.
+        items = ns._fetch_important_news(client, max_items=5, lookback_hours=24)
+        assert [item["titulo"] for item in items] == ["Sem data", "Recente"]
+    finally:
+        client.close_hard()
+        db._schema_ready = False
+
+
+def test_article_timestamp_formats():
+    import db
+
+    assert db.article_timestamp("2026-08-18T12:00:00Z") == 1787054400
+    # Sem fuso = horário de Brasília (UTC-3).
+    assert db.article_timestamp("18/08/2026 09:00") == 1787054400
+    assert db.article_timestamp(None, "", "18/08/2026") == db.article_timestamp("2026-08-18")
+    assert db.article_timestamp("lixo") is None
+
+
 def test_urgency_alert_branding():
     payload = ns.build_urgency_alert(9, "Copom eleva Selic", "Juros", "Resumo curto.", 100)
     assert payload["subject"].startswith("Clareza Capital:")
@@ -201,6 +248,8 @@ if __name__ == "__main__":
         test_newsletter_digest_send_mocked,
         test_newsletter_from_uses_clareza_display_name,
         test_daily_digest_caps_at_two_alta_and_skips_empty,
+        test_published_ts_backfill_and_digest_window,
+        test_article_timestamp_formats,
         test_urgency_alert_branding,
         test_csp_header_present,
     ]
@@ -18,6 +18,7 @@ os.environ.setdefault("COLUMNIST_PAYOUT_MIN_BRL", "1")
 
 from fastapi.testclient import TestClient
 
+import community_auth
 import core
 import db as dbmod
 import main
@@ -87,6 +88,9 @@ def _qa_db(tmp_path):
     dbmod._client = None
     dbmod._schema_ready = False
     dbmod._fts_ready = False
+    # Ids de usuário/matéria se repetem entre bancos de teste.
+    community_auth.invalidate_user_cache()
+    community_auth.invalidate_comment_cache()
     local = dbmod.LocalDbClient(path)
     dbmod.ensure_schema(local)
     dbmod._client = local
@@ -313,6 +317,37 @@ def test_comments_guest_publish_upvote_delete_moderation(tmp_path):
         assert "Selic e crédito imobiliário" not in page3.text
 
 
+def test_comments_keyset_pages_api(tmp_path):
+    import community_auth as community
+
+    db_client, news_id = _qa_db(tmp_path)
+    db_client.execute(
+        "INSERT INTO users (name, email, created_at, email_verified) VALUES ('Leitor', 'pg@clareza.test', '2026-01-01', 1)"
+    )
+    insert = (
+        "INSERT INTO comments (news_id, user_id, parent_id, body, status, created_at) "
+        "VALUES (?, 1, ?, ?, 'published', '2026-01-01T00:00:00Z')"
+    )
+    size = community.COMMENT_PAGE_SIZE
+    for i in range(size + 5):
+        db_client.execute(insert, [news_id, None, f"raiz {i}"])
+    db_client.execute(insert, [news_id, 1, "resposta na primeira thread"])
+    db_client.execute(f"UPDATE news SET comment_count = {size + 6} WHERE id = ?", [news_id])
+    with patch.object(core, "warmup_market_caches", return_value=None):
+        c = _client()
+        page = c.get(f"/noticia/{news_id}")
+        assert page.status_code == 200
+        assert 'id="fn-comments-more"' in page.text
+        assert f"({size + 6})" in page.text
+        cursor = page.text.split('id="fn-comments-more" data-cursor="', 1)[1].split('"', 1)[0]
+
+        nxt = c.get(f"/api/noticia/{news_id}/comentarios", params={"after": cursor}).json()
+        bodies = [item["body"] for item in nxt["comments"]]
+        assert nxt["next_cursor"] is None
+        assert bodies == [f"raiz {i}" for i in range(size - 1, size + 5)]
+        assert c.get(f"/api/noticia/{news_id}/comentarios", params={"after": "x!"}).status_code == 400
+
+
 def test_columnist_apply_admin_cms_boost(tmp_path):
     db_client, _news_id = _qa_db(tmp_path)
     user_email = f"col-{uuid.uuid4().hex[:8]}@clareza.test"
@@ -108,6 +108,34 @@ def test_home_listing_serves_stale_on_turso_error():
     assert out["news"][0][0] == 1
 
 
+def test_feed_cursor_roundtrip_and_keyset_query():
+    cursor = main._encode_feed_cursor(1234)
+    assert main._decode_feed_cursor(cursor) == 1234
+    assert main._decode_feed_cursor("lixo!!") is None
+    assert main._decode_feed_cursor(None) is None
+
+    calls: list[tuple[str, list]] = []
+
+    class Fake:
+        def execute(self, sql: str, args=None):
+            calls.append((sql, list(args or [])))
+            from db import QueryResult
+
+            return QueryResult([_row(i) for i in (1233, 1232, 1231)])
+
+    from unittest.mock import patch
+
+    main._HOME_CACHE.clear()
+    with patch.object(main, "get_db", return_value=Fake()):
+        out = main._load_home_listing("Juros", 16, 2, None, before=1234)
+    sql, args = calls[0]
+    assert "id < ?" in sql and "OFFSET" not in sql
+    assert args == ["Juros", 1234, 3]
+    assert out["has_more"] is True
+    assert main._decode_feed_cursor(out["next_cursor"]) == 1232
+    assert out["next_offset"] == 18
+
+
 if __name__ == "__main__":
     test_compute_home_priority_urgencia()
     test_compute_home_priority_cap_com_imagem()
@@ -115,5 +143,6 @@ if __name__ == "__main__":
     test_split_home_editorial_fallback_primeira_noticia()
     test_fetch_news_by_id_does_not_fallback_on_keyerror()
     test_home_listing_serves_stale_on_turso_error()
+    test_feed_cursor_roundtrip_and_keyset_query()
     print("PASS: test_home_headline")
 
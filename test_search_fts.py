@@ -43,6 +43,14 @@ def test_fts_query_caps_terms():
     assert q.count(" OR ") <= 15
 
 
+def test_fts_query_folds_accents_once():
+    q = dbmod.build_fts_match_query("inflação Câmbio")
+    assert q is not None
+    assert "ç" not in q and "â" not in q.lower()
+    assert q.count('"inflacao"*') == 1 and q.count('"cambio"*') == 1
+    assert dbmod.build_trigram_match_query("obras de") == '"obras"'
+
+
 def test_upsert_news_fts_noop_on_local(monkeypatch):
     monkeypatch.setenv("USE_LOCAL_DB", "1")
     client = MagicMock()
@@ -113,6 +121,115 @@ def test_sync_news_fts_bearer_ok():
         assert body.get("status") == "Sucesso"
 
 
+def test_sync_news_fts_changes_applies_only_logged_rows(monkeypatch):
+    # Emula o Turso: FTS sem triggers, índice mantido pelo log news_fts_changes.
+    monkeypatch.setenv("USE_LOCAL_DB", "0")
+    local = dbmod.LocalDbClient(":memory:")
+    try:
+        local.execute("CREATE TABLE news (id INTEGER PRIMARY KEY, titulo TEXT, resumo TEXT, link TEXT)")
+        local.execute(
+            "CREATE VIRTUAL TABLE news_fts USING fts5("
+            "titulo, resumo, content='news', content_rowid='id', tokenize='unicode61')"
+        )
+        dbmod._migration_news_fts_changes(local)
+
+        def matches(term: str) -> list[int]:
+            rows = local.execute("SELECT rowid FROM news_fts WHERE news_fts MATCH ? ORDER BY rowid", [term]).rows
+            return [int(r[0]) for r in rows]
+
+        for i, titulo in ((1, "Selic sobe"), (2, "Dolar cai")):
+            dbmod.run_batch(
+                local,
+                [
+                    ("INSERT INTO news (id, titulo, resumo, link) VALUES (?, ?, 'r', ?)", [i, titulo, f"l{i}"]),
+                    *dbmod.fts_insert_statements(link=f"l{i}"),
+                ],
+            )
+        assert dbmod.sync_news_fts(local, full=False) == {"ok": True, "applied": 2}
+        assert matches("selic") == [1]
+
+        # Duas edições antes do sync: o 'delete' usa o título que estava indexado.
+        for titulo in ("Copom corta", "Copom mantem"):
+            dbmod.run_batch(
+                local,
+                [
+                    *dbmod.fts_change_statements(1),
+                    ("UPDATE news SET titulo = ? WHERE id = 1", [titulo]),
+                ],
+            )
+        dbmod.run_batch(local, [*dbmod.fts_change_statements(2), ("DELETE FROM news WHERE id = 2", None)])
+        assert local.execute("SELECT version FROM news_fts_changes WHERE news_id = 1").rows[0][0] == 2
+        # Escopo por matéria (salvar do colunista): o resto do log fica para o cron.
+        assert dbmod.sync_news_fts_changes(local, news_ids=[2]) == {"ok": True, "applied": 1}
+        assert local.execute("SELECT news_id FROM news_fts_changes").rows == [(1,)]
+        assert dbmod.sync_news_fts_changes(local, batch_size=1) == {"ok": True, "applied": 1}
+        assert matches("selic") == [] and matches("dolar") == []
+        assert matches("mantem") == [1]
+        assert local.execute("SELECT COUNT(*) FROM news_fts_changes").rows[0][0] == 0
+        local.execute("INSERT INTO news_fts(news_fts) VALUES('integrity-check')")  # levanta se divergir
+
+        monkeypatch.setenv("USE_LOCAL_DB", "1")
+        assert dbmod.fts_change_statements(1) == []
+        assert dbmod.sync_news_fts(local, full=False)["skipped"] == "local_db"
+    finally:
+        local.close_hard()
+
+
+def test_search_unaccented_snippet_and_trigram(sqlite_db, monkeypatch):
+    local = sqlite_db
+    monkeypatch.setenv("FTS_TRIGRAM", "1")
+    dbmod.ensure_schema(local, force=True)
+    assert dbmod.fts_trigram_available()
+    local.execute(
+        "INSERT INTO news (titulo, resumo, link, tag, moderation_status) VALUES (?, ?, ?, ?, 'published')",
+        ["Inflação desacelera", "IPCA recua com <combustíveis> e Petrobras corta preço.", "l1", "Economia"],
+    )
+
+    rows = main._search_listing(local, "inflacao", None, 10, 0).rows
+    assert [r[1] for r in rows] == ["Inflação desacelera"]
+    assert str(main.fts_mark(rows[0][16])) == "<mark>Inflação</mark> desacelera"
+    assert "&lt;combustíveis&gt;" in str(main.fts_mark(rows[0][17]))
+
+    # "obras" não é prefixo de palavra nenhuma: só o trigram acha dentro de "Petrobras".
+    rows = main._search_listing(local, "obras", None, 10, 0).rows
+    assert len(rows) == 1 and "<mark>" in str(main.fts_mark(rows[0][17]))
+
+    monkeypatch.setenv("FTS_TRIGRAM", "0")
+    assert dbmod._schema_state(local)[1] is False  # flag desligada: _ensure_fts remove o índice
+    dbmod.ensure_schema(local, force=True)
+    assert dbmod._schema_state(local) == (dbmod.SCHEMA_VERSION, True)
+    assert main._search_listing(local, "obras", None, 10, 0).rows == []
+
+
+def test_search_suggest_uses_vocab_and_lru(sqlite_db):
+    for i, titulo in enumerate(("Inflação de setembro", "Inflação e juros", "Infraestrutura portuária")):
+        sqlite_db.execute(
+            "INSERT INTO news (titulo, resumo, link, tag, moderation_status) VALUES (?, 'r', ?, 'Economia', ?)",
+            [titulo, f"s{i}", "draft" if i == 1 else "published"],
+        )
+    main._invalidate_home_cache()
+    client = TestClient(main.app)
+    try:
+        r = client.get("/api/search-suggest", params={"q": "Infla"})
+        assert r.status_code == 200
+        assert "max-age=60" in r.headers["cache-control"]
+        body = r.json()
+        assert body["q"] == "infla"
+        assert body["terms"] == ["inflacao"]
+        assert [t["titulo"] for t in body["titles"]] == ["Inflação de setembro"]  # rascunho fica de fora
+
+        # Mesmo prefixo normalizado: sai do LRU, sem tocar no banco.
+        with patch.object(main, "get_db", side_effect=AssertionError("sem query")):
+            again = client.get("/api/search-suggest", params={"q": "  INFLA "}).json()
+        assert again == body
+        assert client.get("/api/search-suggest", params={"q": "i"}).json()["terms"] == []
+        assert client.get("/api/search-suggest", params={"q": "setembro in"}).json()["titles"] == [
+            {"id": 1, "titulo": "Inflação de setembro"}
+        ]
+    finally:
+        main._invalidate_home_cache()
+
+
 def test_search_synonym_and_relevance(tmp_path, monkeypatch):
     path = str(tmp_path / "fts_qa.db")
     monkeypatch.setenv("USE_LOCAL_DB", "1")
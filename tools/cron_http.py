@@ -22,8 +22,12 @@ JOBS: dict[str, tuple[str, str]] = {
     "newsletter-digest": ("GET", "/api/newsletter-digest"),
     "radar-semanal": ("GET", "/api/radar-semanal"),
     "sync-news-fts": ("GET", "/api/sync-news-fts"),
+    "sync-news-fts-full": ("GET", "/api/sync-news-fts?full=1"),
     "columnists-credit-daily": ("POST", "/api/columnists/credit-daily"),
+    "columnists-prune-page-views": ("POST", "/api/columnists/prune-page-views"),
+    "columnists-reconcile-wallets": ("POST", "/api/columnists/reconcile-wallets"),
     "columnists-expire-boosts": ("POST", "/api/columnists/expire-boosts"),
+    "backup-sqlite": ("POST", "/api/backup-sqlite?save=1&download=0"),
 }
 
 
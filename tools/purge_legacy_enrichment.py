@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 
 load_dotenv(ROOT / ".env")
 
-from db import get_db, sync_news_fts  # noqa: E402
+from db import get_db, rebuild_news_tag_stats, sync_news_fts  # noqa: E402
 
 LEGACY_WHERE = """
 (link IS NULL OR link NOT LIKE 'internal://artigo/%')
@@ -99,6 +99,11 @@ def main() -> int:
     except Exception as exc:
         print(f"FTS warning: {exc}", flush=True)
 
+    try:
+        rebuild_news_tag_stats(client)
+    except Exception as exc:
+        print(f"tag stats warning: {exc}", flush=True)
+
     total2 = int(client.execute("SELECT COUNT(*) FROM news").rows[0][0])
     legacy2 = int(client.execute(f"SELECT COUNT(*) FROM news WHERE {LEGACY_WHERE}").rows[0][0])
     print(f"DONE total={total2} legacy_left={legacy2} removed~={total - total2}", flush=True)
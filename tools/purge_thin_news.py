@@ -17,7 +17,7 @@ from dotenv import load_dotenv
 
 _ = load_dotenv(ROOT / ".env")
 
-from db import get_db, sync_news_fts  # noqa: E402
+from db import get_db, rebuild_news_tag_stats, sync_news_fts  # noqa: E402
 from educational_guides import EDUCATIONAL_GUIDES, find_guide_noticia_id  # noqa: E402
 
 # Alinhado ao filtro do sitemap (>= 800). Artigos abaixo disso são thin para indexação.
@@ -96,6 +96,12 @@ def main() -> int:
     except Exception as exc:
         print(f"Aviso FTS rebuild: {exc}")
 
+    try:
+        # SQLite local já desconta via trigger; no Turso recalcula os contadores.
+        rebuild_news_tag_stats(client)
+    except Exception as exc:
+        print(f"Aviso news_tag_stats: {exc}")
+
     left = client.execute(
         "SELECT COUNT(*) FROM news WHERE LENGTH(COALESCE(resumo, '')) < ?",
         [args.min_resumo],